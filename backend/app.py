@@ -1,8 +1,11 @@
 from flask import Flask
 from flask_cors import CORS
 from config import config
+import multiprocessing
 import os
 
+_job_worker_pool = None
+
 def create_app(config_name='default'):
     app = Flask(__name__)
     
@@ -23,11 +26,42 @@ def create_app(config_name='default'):
     from routes.health import health_bp
     app.register_blueprint(health_bp)
     
+    from routes.jobs import jobs_bp
+    app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
+    
+    from routes.sessions import sessions_bp
+    app.register_blueprint(sessions_bp, url_prefix='/api/sessions')
+    
+    start_job_workers(app)
+    
     return app
 
+def start_job_workers(app):
+    """Start the background job worker pool once per server process, if JOB_EMBEDDED_WORKERS is set"""
+    global _job_worker_pool
+    
+    if _job_worker_pool is not None or not app.config['JOB_EMBEDDED_WORKERS'] or app.config['JOB_WORKERS'] < 1:
+        return
+    # Job worker processes load the app themselves and must not start their own pool
+    if os.environ.get('JOB_WORKER_PROCESS') or multiprocessing.parent_process() is not None:
+        return
+    
+    from services.job_queue import JobWorkerPool
+    _job_worker_pool = JobWorkerPool(
+        app.config['JOB_DB_PATH'],
+        'routes.jobs:load_job_handlers',
+        workers=app.config['JOB_WORKERS'],
+        result_ttl=app.config['JOB_RESULT_TTL']
+    )
+    _job_worker_pool.start()
+    _job_worker_pool.start_monitor()
+
 # Create app instance for gunicorn
 env = os.environ.get('FLASK_ENV', 'development')
-app = create_app(env)
+# Spawned child processes (process pool and job workers) re-import the main
+# script as __mp_main__; they must not build the app and load its models
+if __name__ != '__mp_main__':
+    app = create_app(env)
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Fuzz benchmark for CodeAnalyzer latency on pathological inputs.
+
+Each case generates adversarial code (minified one-liners, unbalanced
+brackets and comments, huge identifiers and whitespace runs, random token
+soup) and times CodeAnalyzer.analyze on it in a child process, so a run
+that never finishes is reported as a timeout instead of hanging the
+benchmark.
+
+Usage:
+    python benchmark_analyzer.py --size 100000 --runs 5
+    python benchmark_analyzer.py --cases dict_braces long_identifier --budget 2
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def _repeat(unit, size):
+    return (unit * (size // len(unit) + 1))[:size]
+
+def _random_tokens(size, seed):
+    rng = random.Random(seed)
+    alphabet = [
+        'def ', 'class ', 'create', 'Factory', 'for ', 'range', 'if ', '{', '}', '[', ']', '(', ')',
+        ':', ',', '=', '"', "'", '/*', '*/', '//', '#', '\n', ' ', '    ', 'x', 'node', 'next',
+        'push', 'pop', 'import ', 'from ', 'function ', '=>', '12', 'self.', ';'
+    ]
+    parts, length = [], 0
+    while length < size:
+        token = rng.choice(alphabet)
+        parts.append(token)
+        length += len(token)
+    return ''.join(parts)[:size]
+
+# name -> (language, generator(size, seed))
+CASES = {
+    'minified_js': ('javascript', lambda size, seed: _repeat('var a=function(b,c){return b[c]||{k:(d,e)}};', size)),
+    'open_brackets': ('python', lambda size, seed: _repeat('[', size)),
+    'dict_braces': ('python', lambda size, seed: _repeat('{a:', size)),
+    'tuple_parens': ('python', lambda size, seed: _repeat('(a,', size)),
+    'factory_words': ('auto', lambda size, seed: _repeat('class def create ', size)),
+    'for_without_range': ('python', lambda size, seed: _repeat('for x ', size)),
+    'long_identifier': ('python', lambda size, seed: 'x' * size),
+    'whitespace_run': ('python', lambda size, seed: ' ' * (size - 1) + 'x'),
+    'unclosed_comments': ('javascript', lambda size, seed: _repeat('/* ', size)),
+    'unclosed_calls': ('java', lambda size, seed: _repeat('foo (a ', size)),
+    'broken_python_defs': ('python', lambda size, seed: _repeat('def f(a, b\n    x = 1\n', size)),
+    'import_without_from': ('javascript', lambda size, seed: _repeat('import a, ', size)),
+    'random_tokens': ('auto', _random_tokens)
+}
+
+def _run_case(queue, name, size, runs, seed, budget):
+    from services.code_analyzer import CodeAnalyzer
+
+    analyzer = CodeAnalyzer()
+    language, generate = CASES[name]
+    timings, truncated = [], 0
+    for run in range(runs):
+        code = generate(size, seed + run)
+        started = time.perf_counter()
+        result = analyzer.analyze(code, language, time_budget=budget)
+        timings.append(time.perf_counter() - started)
+        truncated += bool(result.get('truncated'))
+    queue.put((timings, truncated))
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def run_case(name, size, runs, seed, budget, timeout):
+    """
+    Time one case in a child process.
+    Returns (timings, truncated_runs), or an error string on timeout or crash.
+    """
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run_case, args=(queue, name, size, runs, seed, budget))
+    process.start()
+    process.join(timeout)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+        return f'timeout after {timeout}s'
+    if process.exitcode != 0 or queue.empty():
+        return f'crashed (exit code {process.exitcode})'
+    return queue.get()
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure CodeAnalyzer latency on pathological inputs')
+    parser.add_argument('--size', type=int, default=100000, help='Characters per generated input')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per case (each with a different seed)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--budget', type=float, default=None, help='Analysis time budget in seconds')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Seconds before a case is reported as a timeout')
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=sorted(CASES))
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    print(f"{'case':<22}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'truncated':>11}")
+    results, all_timings = {}, []
+    for name in args.cases:
+        outcome = run_case(name, args.size, args.runs, args.seed, args.budget, args.timeout)
+        if isinstance(outcome, str):
+            results[name] = {'error': outcome}
+            print(f"{name:<22}{outcome:>41}")
+            continue
+
+        timings, truncated = outcome
+        all_timings.extend(timings)
+        results[name] = {
+            'p50_ms': _percentile(timings, 0.5) * 1000,
+            'p99_ms': _percentile(timings, 0.99) * 1000,
+            'max_ms': max(timings) * 1000,
+            'truncated_runs': truncated
+        }
+        row = results[name]
+        print(f"{name:<22}{row['p50_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}{truncated:>11}")
+
+    if all_timings:
+        print(f"\nOverall p99: {_percentile(all_timings, 0.99) * 1000:.1f} ms over {len(all_timings)} runs")
+    failures = [name for name, row in results.items() if 'error' in row]
+    if failures:
+        print(f"Failed: {', '.join(failures)}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'size': args.size, 'runs': args.runs, 'budget': args.budget, 'cases': results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
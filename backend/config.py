@@ -3,6 +3,9 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Default locations of runtime data files, independent of the working directory
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
@@ -13,6 +16,33 @@ class Config:
     MODEL_NAME = 'microsoft/codebert-base'
     CACHE_DIR = 'model_cache'
     
+    # Batch analysis settings
+    BATCH_MAX_SNIPPETS = int(os.environ.get('BATCH_MAX_SNIPPETS', 500))
+    SIMILARITY_WORKERS = int(os.environ.get('SIMILARITY_WORKERS', os.cpu_count() or 1))
+    COHORT_MAX_SUBMISSIONS = int(os.environ.get('COHORT_MAX_SUBMISSIONS', 2000))
+    
+    # Content-addressed cache for /api/analyze and /api/compare responses
+    RESULT_CACHE_ENABLED = os.environ.get('RESULT_CACHE_ENABLED', 'true').lower() == 'true'
+    RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 1024))
+    RESULT_CACHE_PATH = os.environ.get('RESULT_CACHE_PATH')  # optional SQLite file shared across workers
+    
+    # Background job queue (SQLite-backed, no external broker)
+    JOB_DB_PATH = os.environ.get('JOB_DB_PATH', os.path.join(BACKEND_DIR, 'job_data', 'jobs.sqlite3'))
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', 3600))  # seconds
+    # Run the worker pool inside the web server (one pool per server process, each
+    # worker loading the models); off by default, run job_worker.py instead
+    JOB_EMBEDDED_WORKERS = os.environ.get('JOB_EMBEDDED_WORKERS', 'false').lower() == 'true'
+    
+    # Seconds CodeAnalyzer may spend on one snippet before skipping the remaining
+    # fields and marking the result truncated; 0 disables the limit
+    ANALYSIS_TIME_BUDGET = float(os.environ.get('ANALYSIS_TIME_BUDGET', 5))
+    
+    # Incremental analysis sessions for live editors (kept in memory per server process)
+    ANALYSIS_SESSION_MAX = int(os.environ.get('ANALYSIS_SESSION_MAX', 500))
+    ANALYSIS_SESSION_TTL = int(os.environ.get('ANALYSIS_SESSION_TTL', 1800))  # idle seconds
+    ANALYSIS_SESSION_MAX_CODE_SIZE = int(os.environ.get('ANALYSIS_SESSION_MAX_CODE_SIZE', 500000))
+    
     # Alternative free models for different use cases
     CODE_MODELS = {
         'codebert': 'microsoft/codebert-base',           # Good for general code understanding
@@ -31,7 +61,47 @@ class Config:
     
     # API Keys (should be set in environment variables for production)
     COHERE_API_KEY = os.environ.get('COHERE_API_KEY')
+    # Cohere endpoint (point at a local fake server for testing) and client-side limits
+    COHERE_API_URL = os.environ.get('COHERE_API_URL', 'https://api.cohere.ai')
+    COHERE_EMBED_CONCURRENCY = int(os.environ.get('COHERE_EMBED_CONCURRENCY', 4))
+    COHERE_ASYNC_CONCURRENCY = int(os.environ.get('COHERE_ASYNC_CONCURRENCY', 64))  # requests in flight in bulk async jobs
+    # Per process: with job workers running, give each process its share of the API limit
+    COHERE_REQUESTS_PER_MINUTE = float(os.environ.get('COHERE_REQUESTS_PER_MINUTE', 100))
+    # Requests that may start back to back before the per-minute rate spaces them;
+    # without it, 100/min allows one request in flight at a time (one every 0.6s)
+    COHERE_RATE_LIMIT_BURST = float(os.environ.get('COHERE_RATE_LIMIT_BURST', 4))
+    COHERE_MAX_RETRIES = int(os.environ.get('COHERE_MAX_RETRIES', 5))
+    COHERE_REQUEST_TIMEOUT = float(os.environ.get('COHERE_REQUEST_TIMEOUT', 10))  # seconds per HTTP attempt
+    COHERE_HTTP_POOL_SIZE = int(os.environ.get('COHERE_HTTP_POOL_SIZE', 20))  # keep-alive connections shared by all Cohere calls
+    COHERE_CALL_DEADLINE = float(os.environ.get('COHERE_CALL_DEADLINE', 15))  # seconds per call, retries included
+    # Circuit breaker: opens when, of the last WINDOW calls (at least MIN_CALLS), FAILURE_RATE
+    # failed or SLOW_CALL_RATE took SLOW_CALL_SECONDS or more; Cohere is then skipped for OPEN_SECONDS
+    COHERE_BREAKER_WINDOW = int(os.environ.get('COHERE_BREAKER_WINDOW', 20))
+    COHERE_BREAKER_MIN_CALLS = int(os.environ.get('COHERE_BREAKER_MIN_CALLS', 5))
+    COHERE_BREAKER_FAILURE_RATE = float(os.environ.get('COHERE_BREAKER_FAILURE_RATE', 0.5))
+    COHERE_BREAKER_SLOW_CALL_SECONDS = float(os.environ.get('COHERE_BREAKER_SLOW_CALL_SECONDS', 5))
+    COHERE_BREAKER_SLOW_CALL_RATE = float(os.environ.get('COHERE_BREAKER_SLOW_CALL_RATE', 0.8))
+    COHERE_BREAKER_OPEN_SECONDS = float(os.environ.get('COHERE_BREAKER_OPEN_SECONDS', 30))
+    # Disk cache of Cohere generations shared by all workers (empty path disables it)
+    COHERE_GENERATION_CACHE_PATH = os.environ.get(
+        'COHERE_GENERATION_CACHE_PATH', os.path.join(BACKEND_DIR, 'model_cache', 'cohere_generations.sqlite3')
+    )
+    COHERE_GENERATION_CACHE_TTL = float(os.environ.get('COHERE_GENERATION_CACHE_TTL', 7 * 24 * 3600))  # seconds, 0 = no expiry
+    COHERE_GENERATION_CACHE_MAX_ENTRIES = int(os.environ.get('COHERE_GENERATION_CACHE_MAX_ENTRIES', 5000))
+    # Local store of Cohere embeddings for database entries (empty to keep them in memory only)
+    COHERE_EMBEDDING_STORE_PATH = os.environ.get(
+        'COHERE_EMBEDDING_STORE_PATH', os.path.join(BACKEND_DIR, 'model_cache', 'cohere_embeddings.sqlite3')
+    )
     HUGGINGFACE_TOKEN = os.environ.get('HUGGINGFACE_API_KEY')
+    # Padded tokens per GraphCodeBERT forward pass when embedding many snippets
+    HF_EMBED_BATCH_TOKENS = int(os.environ.get('HF_EMBED_BATCH_TOKENS', 8192))
+    # Memory budget for loaded HuggingFace models; least recently used ones are evicted past it
+    HF_MODEL_MEMORY_MB = float(os.environ.get('HF_MODEL_MEMORY_MB', 2048))
+    # Comma-separated models that are never evicted (model names, or code_generation,
+    # classification, semantic_search for the pipelines)
+    HF_PINNED_MODELS = os.environ.get('HF_PINNED_MODELS', '')
+    # Where named semantic search indexes are saved and loaded from
+    HF_SEMANTIC_INDEX_DIR = os.environ.get('HF_SEMANTIC_INDEX_DIR', os.path.join(BACKEND_DIR, 'model_cache', 'semantic_indexes'))
     
     # Advanced model configurations
     ADVANCED_MODELS = {
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Standalone job worker pool.
+
+Runs queued /api/jobs work in separate processes so it can be scaled
+independently of the web server. This is the default way to run the
+workers; leave JOB_EMBEDDED_WORKERS off on the web server.
+"""
+import argparse
+import os
+import sys
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import config
+from services.job_queue import JobWorkerPool
+
+def main():
+    app_config = config[os.environ.get('FLASK_ENV', 'development')]
+
+    parser = argparse.ArgumentParser(description='Run background job workers')
+    parser.add_argument('--workers', type=int, default=app_config.JOB_WORKERS, help='Number of worker processes')
+    args = parser.parse_args()
+
+    pool = JobWorkerPool(
+        app_config.JOB_DB_PATH,
+        'routes.jobs:load_job_handlers',
+        workers=args.workers,
+        result_ttl=app_config.JOB_RESULT_TTL
+    )
+    print(f"Starting {args.workers} job workers on {app_config.JOB_DB_PATH}")
+    pool.run_forever()
+
+if __name__ == '__main__':
+    main()
@@ -3,11 +3,14 @@ from werkzeug.utils import secure_filename
 import os
 import json
 from datetime import datetime
-from services.code_analyzer import CodeAnalyzer
+from services.code_analyzer import CodeAnalyzer, ANALYZER_VERSION, resolve_fields
 from services.similarity_detector import SimilarityDetector
+from services.cohort_sweep import CohortSweep
+from services.result_cache import ResultCache
 from services.free_ai_service import FreeAIService, LocalLLMService
 from utils.validators import validate_code_input, allowed_file
 from utils.json_utils import convert_numpy_types
+from utils.streaming import get_stream_format, stream_records
 
 api_bp = Blueprint('api', __name__)
 
@@ -38,33 +41,154 @@ def analyze_code():
         language = data.get('language', 'auto')
         check_database = data.get('checkDatabase', True)
         
-        # Analyze code structure and extract features
-        analysis_result = code_analyzer.analyze(code_content, language)
-        
-        # Perform similarity detection
-        similarity_results = similarity_detector.find_similar_code(
-            code_content, 
-            language, 
-            check_database=check_database
-        )
-        
-        # Prepare response
-        response = {
-            'analysis': analysis_result,
-            'similarity': similarity_results,
-            'timestamp': datetime.utcnow().isoformat(),
-            'language': analysis_result.get('detected_language', language)
-        }
+        fields, error = get_analysis_fields(data)
+        if error:
+            return jsonify({'error': error}), 400
+        time_budget = get_analysis_time_budget()
         
-        # Convert numpy types to JSON-serializable types
-        response = convert_numpy_types(response)
+        def compute():
+            # Analyze code structure and extract features
+            analysis_result = code_analyzer.analyze(code_content, language, fields, time_budget)
+            
+            # Perform similarity detection
+            similarity_results = similarity_detector.find_similar_code(
+                code_content, 
+                language, 
+                check_database=check_database
+            )
+            
+            # Prepare response
+            response = {
+                'analysis': analysis_result,
+                'similarity': similarity_results,
+                'timestamp': datetime.utcnow().isoformat(),
+                'language': analysis_result.get('detected_language', language)
+            }
+            if analysis_result.get('truncated'):
+                response['truncated'] = True
+            
+            # Convert numpy types to JSON-serializable types
+            return convert_numpy_types(response)
         
-        return jsonify(response)
+        return _cached_response(
+            'analyze', data, compute,
+            code=code_content, language=language, fields=fields,
+            options={'checkDatabase': check_database}
+        )
         
     except Exception as e:
         current_app.logger.error(f"Error in analyze_code: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def get_analysis_fields(data):
+    """
+    Read the optional 'fields' projection from a request body, as a list or
+    a comma-separated string. Returns (fields, error); fields is None when
+    the full analysis is wanted.
+    """
+    fields = data.get('fields')
+    if fields is None:
+        return None, None
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+    if not isinstance(fields, list) or not all(isinstance(field, str) for field in fields):
+        return None, 'fields must be a list of analysis field names'
+    try:
+        resolve_fields(fields)
+    except ValueError as e:
+        return None, str(e)
+    return sorted(set(fields)), None
+
+def get_sweep_threshold(data):
+    """
+    Read the optional similarity 'threshold' of a cohort sweep from a request
+    body. Returns (threshold, error); the configured SIMILARITY_THRESHOLD is
+    used when it is absent.
+    """
+    threshold = data.get('threshold')
+    if threshold is None:
+        return current_app.config.get('SIMILARITY_THRESHOLD', 0.7), None
+    if isinstance(threshold, bool) or not isinstance(threshold, (int, float, str)):
+        return None, 'threshold must be a number between 0 and 1'
+    try:
+        threshold = float(threshold)
+    except ValueError:
+        return None, 'threshold must be a number between 0 and 1'
+    # NaN fails both comparisons, so it is rejected here too
+    if not 0.0 <= threshold <= 1.0:
+        return None, 'threshold must be a number between 0 and 1'
+    return threshold, None
+
+def get_sweep_template(data):
+    """
+    Read the optional starter code of a cohort sweep from a request body, as
+    one string or a list of strings. Returns (template_codes, error).
+    """
+    template = data.get('template')
+    if template is None:
+        return [], None
+    if isinstance(template, str):
+        return [template], None
+    if not isinstance(template, list) or not all(isinstance(code, str) for code in template):
+        return None, 'template must be a string or a list of strings'
+    return template, None
+
+def get_analysis_time_budget():
+    """Configured per-snippet analysis time budget in seconds, or None for no limit"""
+    return current_app.config.get('ANALYSIS_TIME_BUDGET') or None
+
+def get_result_cache():
+    """Result cache configured for the current app"""
+    cache = current_app.extensions.get('result_cache')
+    if cache is None:
+        cache = ResultCache(
+            max_entries=current_app.config.get('RESULT_CACHE_MAX_ENTRIES', 1024),
+            disk_path=current_app.config.get('RESULT_CACHE_PATH')
+        )
+        current_app.extensions['result_cache'] = cache
+    return cache
+
+def _cached_response(endpoint, data, compute, **key_parts):
+    """
+    Serve a response from the result cache, computing and storing it on a miss.
+    Truncated results (analysis stopped by the time budget) are not stored.
+    A hit carries a fresh timestamp and the original one as cached_at.
+    The X-Cache header reports HIT, MISS or BYPASS.
+    """
+    bypass = (
+        not current_app.config.get('RESULT_CACHE_ENABLED', True)
+        or data.get('cache') is False
+        or 'no-cache' in request.headers.get('Cache-Control', '')
+    )
+    if bypass:
+        response = jsonify(compute())
+        response.headers['X-Cache'] = 'BYPASS'
+        return response
+    
+    cache = get_result_cache()
+    key = cache.make_key(
+        endpoint,
+        database_fingerprint=similarity_detector.database_fingerprint,
+        model_version=f"{ANALYZER_VERSION}|{similarity_detector.model_version}",
+        **key_parts
+    )
+    
+    result = cache.get(key)
+    status = 'HIT'
+    if result is not None and 'timestamp' in result:
+        # The stored timestamp is when the result was computed, not this response
+        result = {**result, 'cached_at': result['timestamp'], 'timestamp': datetime.utcnow().isoformat()}
+    if result is None:
+        result = compute()
+        if not result.get('truncated'):
+            cache.set(key, result)
+        status = 'MISS'
+    
+    response = jsonify(result)
+    response.headers['X-Cache'] = status
+    response.headers['X-Cache-Key'] = key[:16]
+    return response
+
 @api_bp.route('/upload', methods=['POST'])
 def upload_file():
     """
@@ -122,25 +246,36 @@ def compare_codes():
         code2 = data['code2']
         language = data.get('language', 'auto')
         
-        # Analyze both codes
-        analysis1 = code_analyzer.analyze(code1, language)
-        analysis2 = code_analyzer.analyze(code2, language)
-        
-        # Calculate similarity
-        similarity_score = similarity_detector.calculate_similarity(code1, code2, language)
+        fields, error = get_analysis_fields(data)
+        if error:
+            return jsonify({'error': error}), 400
+        time_budget = get_analysis_time_budget()
         
-        # Detailed comparison
-        detailed_comparison = similarity_detector.detailed_comparison(code1, code2, language)
-        
-        response = {
-            'similarity_score': similarity_score,
-            'analysis1': analysis1,
-            'analysis2': analysis2,
-            'detailed_comparison': detailed_comparison,
-            'timestamp': datetime.utcnow().isoformat()
-        }
+        def compute():
+            # Analyze both codes
+            analysis1 = code_analyzer.analyze(code1, language, fields, time_budget)
+            analysis2 = code_analyzer.analyze(code2, language, fields, time_budget)
+            
+            # Calculate similarity
+            similarity_score = similarity_detector.calculate_similarity(code1, code2, language)
+            
+            # Detailed comparison
+            detailed_comparison = similarity_detector.detailed_comparison(code1, code2, language)
+            
+            response = {
+                'similarity_score': similarity_score,
+                'analysis1': analysis1,
+                'analysis2': analysis2,
+                'detailed_comparison': detailed_comparison,
+                'timestamp': datetime.utcnow().isoformat()
+            }
+            if analysis1.get('truncated') or analysis2.get('truncated'):
+                response['truncated'] = True
+            return convert_numpy_types(response)
         
-        return jsonify(response)
+        return _cached_response(
+            'compare', data, compute, code1=code1, code2=code2, language=language, fields=fields
+        )
         
     except Exception as e:
         current_app.logger.error(f"Error in compare_codes: {str(e)}")
@@ -283,60 +418,99 @@ def analyze_code_enhanced():
         check_database = data.get('checkDatabase', True)
         use_cohere = data.get('useCohere', True)
         
+        stream_format = get_stream_format(request, data)
+        sections = _iter_enhanced_sections(code_content, language, check_database, use_cohere)
+        
+        if stream_format:
+            def records():
+                results = {}
+                for key, value in sections:
+                    results[key] = value
+                    yield {'type': key, key: convert_numpy_types(value)}
+                summary = _enhanced_summary(results, language, use_cohere)
+                summary['type'] = 'summary'
+                yield summary
+            
+            return stream_records(records(), stream_format)
+        
+        response = dict(sections)
+        response.update(_enhanced_summary(response, language, use_cohere))
+        
+        # Convert numpy types to JSON-serializable types
+        response = convert_numpy_types(response)
+        
+        return jsonify(response)
+        
+    except Exception as e:
+        current_app.logger.error(f"Error in analyze_code_enhanced: {str(e)}")
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+
+def _iter_enhanced_sections(code_content, language, check_database, use_cohere):
+    """
+    Yield (section, result) pairs of the enhanced analysis as each one completes
+    """
+    if not use_cohere:
         # Analyze code structure and extract features
-        analysis_result = code_analyzer.analyze(code_content, language)
+        yield 'analysis', code_analyzer.analyze(code_content, language)
         
-        # Perform enhanced similarity detection with timeout handling
+        # Fallback to traditional similarity detection
+        yield 'similarity', similarity_detector.find_similar_code(
+            code_content, 
+            language, 
+            check_database=check_database
+        )
+        yield 'cohere_analysis', {'note': 'Cohere analysis disabled for this request'}
+        return
+    
+    # Every Cohere generate call of the request starts now, concurrently and
+    # overlapping the local analysis; each distinct prompt is sent once
+    with similarity_detector.cohere_service.generation_scope() as scope:
+        similarity_detector.cohere_service.prefetch_code_insights(code_content, scope)
+        
+        # Analyze code structure and extract features
+        yield 'analysis', code_analyzer.analyze(code_content, language)
+        
+        # Perform enhanced similarity detection, falling back if the AI analysis fails
         try:
-            if use_cohere:
-                similarity_results = similarity_detector.find_similar_code_with_cohere(
-                    code_content, 
-                    language, 
-                    check_database=check_database
-                )
-                
-                # Get comprehensive Cohere analysis with timeout
-                cohere_analysis = similarity_detector.get_cohere_code_analysis(code_content)
-            else:
-                # Fallback to traditional similarity detection
-                similarity_results = similarity_detector.find_similar_code(
-                    code_content, 
-                    language, 
-                    check_database=check_database
-                )
-                cohere_analysis = {'note': 'Cohere analysis disabled for this request'}
+            similarity_results = similarity_detector.find_similar_code_with_cohere(
+                code_content, 
+                language, 
+                check_database=check_database,
+                scope=scope
+            )
         except Exception as analysis_error:
-            # Fallback if AI analysis fails
             current_app.logger.warning(f"AI analysis failed, falling back: {analysis_error}")
-            similarity_results = similarity_detector.find_similar_code(
+            yield 'similarity', similarity_detector.find_similar_code(
                 code_content, 
                 language, 
                 check_database=check_database
             )
-            cohere_analysis = {'error': f'AI analysis failed: {str(analysis_error)}', 'fallback_used': True}
+            yield 'cohere_analysis', {'error': f'AI analysis failed: {str(analysis_error)}', 'fallback_used': True}
+            return
+        yield 'similarity', similarity_results
         
-        # Prepare enhanced response
-        response = {
-            'analysis': analysis_result,
-            'similarity': similarity_results,
-            'cohere_analysis': cohere_analysis,
-            'timestamp': datetime.utcnow().isoformat(),
-            'language': analysis_result.get('detected_language', language),
-            'enhanced_features': {
-                'semantic_understanding': use_cohere and 'error' not in cohere_analysis,
-                'ai_powered_insights': True,
-                'pattern_recognition': True
-            }
+        # Get comprehensive Cohere analysis (reuses the calls made for the similarity section)
+        try:
+            cohere_analysis = similarity_detector.get_cohere_code_analysis(code_content, scope)
+        except Exception as analysis_error:
+            current_app.logger.warning(f"Cohere analysis failed: {analysis_error}")
+            cohere_analysis = {'error': f'AI analysis failed: {str(analysis_error)}', 'fallback_used': True}
+        yield 'cohere_analysis', cohere_analysis
+
+def _enhanced_summary(results, language, use_cohere):
+    """
+    Closing fields of the enhanced analysis response
+    """
+    cohere_analysis = results.get('cohere_analysis', {})
+    return {
+        'timestamp': datetime.utcnow().isoformat(),
+        'language': results.get('analysis', {}).get('detected_language', language),
+        'enhanced_features': {
+            'semantic_understanding': use_cohere and 'error' not in cohere_analysis,
+            'ai_powered_insights': True,
+            'pattern_recognition': True
         }
-        
-        # Convert numpy types to JSON-serializable types
-        response = convert_numpy_types(response)
-        
-        return jsonify(response)
-        
-    except Exception as e:
-        current_app.logger.error(f"Error in analyze_code_enhanced: {str(e)}")
-        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+    }
 
 @api_bp.route('/cohere-analysis', methods=['POST'])
 def cohere_analysis():
@@ -400,8 +574,8 @@ def compare_with_cohere():
         code1 = data.get('code1')
         code2 = data.get('code2')
         
-        from services.cohere_service import CohereService
-        cohere_service = CohereService()
+        # Reuse the process-wide service and its pooled client instead of building one per request
+        cohere_service = similarity_detector.cohere_service
         
         if not cohere_service.is_available():
             return jsonify({
@@ -457,42 +631,50 @@ def batch_analyze():
         codes = data['codes']
         language = data.get('language', 'auto')
         
-        if len(codes) > 20:  # Limit batch size
-            return jsonify({'error': 'Maximum 20 code snippets allowed per batch'}), 400
-        
-        results = []
-        for i, code in enumerate(codes):
-            try:
-                analysis = code_analyzer.analyze(code, language)
-                results.append({
-                    'index': i,
-                    'analysis': analysis,
-                    'status': 'success'
-                })
-            except Exception as e:
-                results.append({
-                    'index': i,
-                    'error': str(e),
-                    'status': 'failed'
-                })
-        
-        # Calculate cross-similarities
-        similarities = []
-        for i in range(len(codes)):
-            for j in range(i + 1, len(codes)):
-                try:
-                    similarity = similarity_detector.calculate_similarity(codes[i], codes[j], language)
-                    similarities.append({
-                        'code1_index': i,
-                        'code2_index': j,
-                        'similarity_score': similarity
-                    })
-                except Exception as e:
-                    similarities.append({
-                        'code1_index': i,
-                        'code2_index': j,
-                        'error': str(e)
-                    })
+        if not all(isinstance(code, str) for code in codes):
+            return jsonify({'error': 'Every code snippet must be a string'}), 400
+        
+        max_snippets = current_app.config.get('BATCH_MAX_SNIPPETS', 500)
+        if len(codes) > max_snippets:  # Limit batch size
+            return jsonify({'error': f'Maximum {max_snippets} code snippets allowed per batch'}), 400
+        
+        fields, error = get_analysis_fields(data)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        workers = current_app.config.get('SIMILARITY_WORKERS')
+        time_budget = get_analysis_time_budget()
+        stream_format = get_stream_format(request, data)
+        
+        if stream_format:
+            def records():
+                failed = 0
+                for result in code_analyzer.iter_analyze_many(codes, language, fields, workers, time_budget):
+                    failed += result['status'] == 'failed'
+                    result['type'] = 'analysis'
+                    yield convert_numpy_types(result)
+                
+                pairs = 0
+                for row in similarity_detector.iter_pairwise_similarities(codes, language, workers=workers):
+                    pairs += 1
+                    row['type'] = 'similarity'
+                    yield row
+                
+                yield {
+                    'type': 'summary',
+                    'total_analyzed': len(codes),
+                    'failed': failed,
+                    'total_pairs': pairs,
+                    'timestamp': datetime.utcnow().isoformat()
+                }
+            
+            return stream_records(records(), stream_format)
+        
+        # Snippets are analyzed in parallel on the persistent process pool
+        results = code_analyzer.analyze_many(codes, language, fields, workers, time_budget)
+        
+        # Calculate cross-similarities for all pairs at once
+        similarities = list(similarity_detector.iter_pairwise_similarities(codes, language, workers=workers))
         
         response = {
             'results': results,
@@ -506,3 +688,54 @@ def batch_analyze():
     except Exception as e:
         current_app.logger.error(f"Error in batch_analyze: {str(e)}")
         return jsonify({'error': 'Batch analysis failed'}), 500
+
+@api_bp.route('/cohort-sweep', methods=['POST'])
+def cohort_sweep():
+    """
+    Sweep a whole cohort of submissions for plagiarism, scoring only
+    LSH-selected candidate pairs and clustering the flagged ones
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or 'submissions' not in data or not isinstance(data['submissions'], list):
+            return jsonify({'error': 'Array of submissions required'}), 400
+        
+        submissions = []
+        for i, item in enumerate(data['submissions']):
+            if isinstance(item, str):
+                item = {'id': i, 'code': item}
+            if not isinstance(item, dict) or not isinstance(item.get('code'), str):
+                return jsonify({'error': f'Submission {i} must be a string or an object with a code string'}), 400
+            submissions.append(item)
+        
+        max_submissions = current_app.config.get('COHORT_MAX_SUBMISSIONS', 2000)
+        if len(submissions) > max_submissions:
+            return jsonify({'error': f'Maximum {max_submissions} submissions allowed per sweep'}), 400
+        
+        threshold, error = get_sweep_threshold(data)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        template, error = get_sweep_template(data)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        sweep = CohortSweep(similarity_detector, threshold=threshold)
+        sweep_result = sweep.run(
+            submissions,
+            data.get('language', 'auto'),
+            template_codes=template,
+            workers=current_app.config.get('SIMILARITY_WORKERS')
+        )
+        
+        response = {
+            'sweep': sweep_result,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+        
+        return jsonify(convert_numpy_types(response))
+        
+    except Exception as e:
+        current_app.logger.error(f"Error in cohort_sweep: {str(e)}")
+        return jsonify({'error': 'Cohort sweep failed'}), 500
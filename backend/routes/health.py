@@ -1,5 +1,8 @@
 from flask import Blueprint, jsonify
 
+from utils.circuit_breaker import circuit_breaker_states
+from utils.http_pool import http_pool_stats
+
 health_bp = Blueprint('health', __name__)
 
 @health_bp.route('/health')
@@ -7,5 +10,9 @@ def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
-        'message': 'AI Code Plagiarism Detector API is running'
+        'message': 'AI Code Plagiarism Detector API is running',
+        # External AI services are skipped (local fallback) while their breaker is open
+        'circuit_breakers': circuit_breaker_states(),
+        # Keep-alive pools shared by external API clients
+        'http_pools': http_pool_stats()
     })
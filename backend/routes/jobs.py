@@ -0,0 +1,276 @@
+from flask import Blueprint, request, jsonify, current_app
+from datetime import datetime
+from services.job_queue import JobQueue, FINISHED_STATUSES
+from services.cohere_service import CODE_INSIGHTS
+from utils.validators import validate_code_input
+from routes.api import get_analysis_fields, get_sweep_template, get_sweep_threshold
+
+jobs_bp = Blueprint('jobs', __name__)
+
+def get_job_queue() -> JobQueue:
+    """Job queue configured for the current app"""
+    queue = current_app.extensions.get('job_queue')
+    if queue is None:
+        queue = JobQueue(current_app.config['JOB_DB_PATH'], current_app.config['JOB_RESULT_TTL'])
+        current_app.extensions['job_queue'] = queue
+    return queue
+
+def _validate_code_job(payload):
+    validation_result = validate_code_input(payload)
+    return None if validation_result['valid'] else validation_result['message']
+
+def _validate_batch_job(payload):
+    codes = payload.get('codes')
+    if not isinstance(codes, list) or not all(isinstance(code, str) for code in codes):
+        return 'Array of code snippets required'
+    max_snippets = current_app.config.get('BATCH_MAX_SNIPPETS', 500)
+    if len(codes) > max_snippets:
+        return f'Maximum {max_snippets} code snippets allowed per batch'
+    return get_analysis_fields(payload)[1]
+
+def _validate_sweep_job(payload):
+    submissions = payload.get('submissions')
+    if not isinstance(submissions, list):
+        return 'Array of submissions required'
+    for i, item in enumerate(submissions):
+        code = item if isinstance(item, str) else item.get('code') if isinstance(item, dict) else None
+        if not isinstance(code, str):
+            return f'Submission {i} must be a string or an object with a code string'
+    max_submissions = current_app.config.get('COHORT_MAX_SUBMISSIONS', 2000)
+    if len(submissions) > max_submissions:
+        return f'Maximum {max_submissions} submissions allowed per sweep'
+    return get_sweep_threshold(payload)[1] or get_sweep_template(payload)[1]
+
+def _validate_cohere_insights_job(payload):
+    codes = payload.get('codes')
+    if not isinstance(codes, list) or not all(isinstance(code, str) for code in codes):
+        return 'Array of code snippets required'
+    max_snippets = current_app.config.get('BATCH_MAX_SNIPPETS', 500)
+    if len(codes) > max_snippets:
+        return f'Maximum {max_snippets} code snippets allowed per batch'
+    if payload.get('insight', 'classification') not in CODE_INSIGHTS:
+        return f"insight must be one of: {', '.join(CODE_INSIGHTS)}"
+    return None
+
+# Job kinds accepted by the API and the validator for their payloads
+JOB_VALIDATORS = {
+    'analyze-enhanced': _validate_code_job,
+    'explain-code': lambda payload: None if isinstance(payload.get('code'), str) else 'Code content required',
+    'batch-analyze': _validate_batch_job,
+    'cohort-sweep': _validate_sweep_job,
+    'cohere-insights': _validate_cohere_insights_job
+}
+
+@jobs_bp.route('', methods=['POST'])
+def submit_job():
+    """
+    Submit a heavy analysis to run in the background.
+    Body: {"kind": "...", "payload": {...}} where payload matches the
+    corresponding synchronous endpoint's request body.
+    """
+    try:
+        data = request.get_json()
+
+        if not data or data.get('kind') not in JOB_VALIDATORS:
+            return jsonify({
+                'error': 'A valid job kind is required',
+                'supported_kinds': list(JOB_VALIDATORS.keys())
+            }), 400
+
+        payload = data.get('payload')
+        if not isinstance(payload, dict):
+            return jsonify({'error': 'Job payload must be an object'}), 400
+
+        error = JOB_VALIDATORS[data['kind']](payload)
+        if error:
+            return jsonify({'error': error}), 400
+
+        job_id = get_job_queue().submit(data['kind'], payload)
+
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f'/api/jobs/{job_id}',
+            'result_url': f'/api/jobs/{job_id}/result',
+            'timestamp': datetime.utcnow().isoformat()
+        }), 202
+
+    except Exception as e:
+        current_app.logger.error(f"Error in submit_job: {str(e)}")
+        return jsonify({'error': 'Failed to submit job'}), 500
+
+@jobs_bp.route('', methods=['GET'])
+def list_jobs():
+    """
+    List recent jobs, optionally filtered by ?status=
+    """
+    status = request.args.get('status')
+    # SQLite reads a negative LIMIT as no limit
+    limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+    return jsonify({'jobs': get_job_queue().list(status, limit)})
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Get job status and progress
+    """
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    return jsonify(job)
+
+@jobs_bp.route('/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """
+    Get the result of a finished job
+    """
+    job = get_job_queue().get(job_id, include_result=True)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+
+    if job['status'] not in FINISHED_STATUSES:
+        return jsonify(job), 202
+    if job['status'] != 'succeeded':
+        return jsonify(job), 409
+    return jsonify(job)
+
+@jobs_bp.route('/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """
+    Cancel a queued or running job
+    """
+    status = get_job_queue().cancel(job_id)
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({
+        'job_id': job_id,
+        'status': status,
+        'cancel_requested': status == 'running'
+    })
+
+def load_job_handlers():
+    """
+    Handlers run by job worker processes, keyed by job kind.
+    Called once per worker process: the app and its models are loaded here
+    and stay resident for every job the worker runs.
+    """
+    # Importing the app module builds the app once (for FLASK_ENV)
+    from app import app
+    app.app_context().push()
+
+    from routes.api import (
+        code_analyzer, similarity_detector, local_llm_service,
+        _iter_enhanced_sections, _enhanced_summary
+    )
+    from services.cohort_sweep import CohortSweep
+    from services.cohere_async import AsyncCohereService
+    import asyncio
+
+    def analyze_enhanced(payload, report_progress):
+        language = payload.get('language', 'auto')
+        use_cohere = payload.get('useCohere', True)
+        sections = _iter_enhanced_sections(
+            payload['code'], language, payload.get('checkDatabase', True), use_cohere
+        )
+        response = {}
+        for completed, (key, value) in enumerate(sections, 1):
+            response[key] = value
+            report_progress(completed / 3, f'{key} complete')
+        response.update(_enhanced_summary(response, language, use_cohere))
+        return response
+
+    def explain_code(payload, report_progress):
+        if not local_llm_service.current_model:
+            report_progress(0.1, 'loading model')
+            if not local_llm_service.load_model('distilgpt2'):
+                raise RuntimeError('Could not load local language model')
+        report_progress(0.5, 'generating explanation')
+        return {
+            'explanation': local_llm_service.generate_code_explanation(
+                payload['code'], payload.get('max_length', 150)
+            ),
+            'model_used': 'distilgpt2_local',
+            'timestamp': datetime.utcnow().isoformat()
+        }
+
+    def batch_analyze(payload, report_progress):
+        codes = payload['codes']
+        language = payload.get('language', 'auto')
+        fields = get_analysis_fields(payload)[0]
+        total_pairs = len(codes) * (len(codes) - 1) // 2
+        total_steps = max(1, len(codes) + total_pairs)
+
+        results = []
+        for result in code_analyzer.iter_analyze_many(
+            codes, language, fields, app.config.get('SIMILARITY_WORKERS'),
+            app.config.get('ANALYSIS_TIME_BUDGET') or None
+        ):
+            results.append(result)
+            report_progress(len(results) / total_steps, f'analyzed {len(results)} of {len(codes)}')
+
+        similarities = []
+        for row in similarity_detector.iter_pairwise_similarities(
+            codes, language, workers=app.config.get('SIMILARITY_WORKERS')
+        ):
+            similarities.append(row)
+            if len(similarities) % 1000 == 0:
+                report_progress((len(codes) + len(similarities)) / total_steps,
+                                f'scored {len(similarities)} of {total_pairs} pairs')
+
+        return {
+            'results': results,
+            'cross_similarities': similarities,
+            'timestamp': datetime.utcnow().isoformat(),
+            'total_analyzed': len(codes)
+        }
+
+    def cohort_sweep(payload, report_progress):
+        submissions = [
+            item if isinstance(item, dict) else {'id': i, 'code': item}
+            for i, item in enumerate(payload['submissions'])
+        ]
+        # Validated on submit, so there are no errors to report here
+        template = get_sweep_template(payload)[0]
+        sweep = CohortSweep(similarity_detector, threshold=get_sweep_threshold(payload)[0])
+        report_progress(0.05, f'sweeping {len(submissions)} submissions')
+        return {
+            # report_progress raises JobCancelled once the job is cancelled, stopping the sweep
+            'sweep': sweep.run(
+                submissions,
+                payload.get('language', 'auto'),
+                template_codes=template,
+                workers=app.config.get('SIMILARITY_WORKERS'),
+                on_progress=report_progress
+            ),
+            'timestamp': datetime.utcnow().isoformat()
+        }
+
+    def cohere_insights(payload, report_progress):
+        codes = payload['codes']
+        insight = payload.get('insight', 'classification')
+
+        def progress(done):
+            if done % 25 == 0:
+                report_progress(done / len(codes), f'analyzed {done} of {len(codes)}')
+
+        async def run():
+            # One event loop thread keeps every request of the job in flight
+            async with AsyncCohereService() as service:
+                if not service.is_available():
+                    raise RuntimeError('Cohere service not available')
+                return await service.code_insights_many(codes, insight, on_done=progress)
+
+        return {
+            'insight': insight,
+            'results': asyncio.run(run()),
+            'timestamp': datetime.utcnow().isoformat(),
+            'total_analyzed': len(codes)
+        }
+
+    return {
+        'analyze-enhanced': analyze_enhanced,
+        'explain-code': explain_code,
+        'batch-analyze': batch_analyze,
+        'cohort-sweep': cohort_sweep,
+        'cohere-insights': cohere_insights
+    }
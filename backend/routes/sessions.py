@@ -0,0 +1,105 @@
+from flask import Blueprint, request, jsonify, current_app
+from services.analysis_session import SessionManager, SessionConflict
+
+sessions_bp = Blueprint('sessions', __name__)
+
+def get_session_manager() -> SessionManager:
+    """Analysis session registry for the current app"""
+    manager = current_app.extensions.get('analysis_sessions')
+    if manager is None:
+        from routes.api import code_analyzer, similarity_detector
+        manager = SessionManager(
+            code_analyzer,
+            similarity_detector,
+            max_sessions=current_app.config.get('ANALYSIS_SESSION_MAX', 500),
+            ttl=current_app.config.get('ANALYSIS_SESSION_TTL', 1800)
+        )
+        current_app.extensions['analysis_sessions'] = manager
+    return manager
+
+def _max_code_size():
+    return current_app.config.get('ANALYSIS_SESSION_MAX_CODE_SIZE', 500000)
+
+@sessions_bp.route('', methods=['POST'])
+def open_session():
+    """
+    Open an incremental analysis session for an editor buffer.
+    Body: {"code": "...", "language": "auto", "checkDatabase": false}
+    """
+    try:
+        data = request.get_json() or {}
+        code = data.get('code', '')
+        if not isinstance(code, str):
+            return jsonify({'error': 'Code must be a string'}), 400
+        if len(code) > _max_code_size():
+            return jsonify({'error': f'Code is too large (max {_max_code_size()} characters)'}), 400
+
+        session = get_session_manager().create(
+            code, data.get('language', 'auto'), bool(data.get('checkDatabase', False))
+        )
+        return jsonify(session.state()), 201
+
+    except Exception as e:
+        current_app.logger.error(f"Error in open_session: {str(e)}")
+        return jsonify({'error': 'Failed to open analysis session'}), 500
+
+@sessions_bp.route('/<session_id>', methods=['GET'])
+def get_session(session_id):
+    """
+    Full analysis of the session's current buffer version
+    """
+    session = get_session_manager().get(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found or expired'}), 404
+    with session.lock:
+        return jsonify(session.state())
+
+@sessions_bp.route('/<session_id>/changes', methods=['POST'])
+def apply_changes(session_id):
+    """
+    Apply editor changes and return the analysis diff.
+    Body: {"version": n, "deltas": [{"offset", "length", "text"}, ...]}
+    or {"version": n, "code": "..."} to replace the whole buffer.
+    Deltas are applied in order, each against the result of the previous one.
+    Offsets and lengths count UTF-16 code units, as editors report them.
+    """
+    try:
+        data = request.get_json() or {}
+        session = get_session_manager().get(session_id)
+        if session is None:
+            return jsonify({'error': 'Session not found or expired'}), 404
+
+        version = data.get('version')
+        deltas = data.get('deltas')
+        code = data.get('code')
+        if not isinstance(version, int):
+            return jsonify({'error': 'The version the changes are based on is required'}), 400
+        if code is None and not isinstance(deltas, list):
+            return jsonify({'error': 'Either a deltas array or the full code is required'}), 400
+        if code is not None and not isinstance(code, str):
+            return jsonify({'error': 'Code must be a string'}), 400
+
+        with session.lock:
+            try:
+                diff = session.apply(version, deltas, code, _max_code_size())
+            except SessionConflict as e:
+                return jsonify({
+                    'error': 'Changes are based on a stale version; resend the full code',
+                    'version': e.current_version
+                }), 409
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        return jsonify(diff)
+
+    except Exception as e:
+        current_app.logger.error(f"Error in apply_changes: {str(e)}")
+        return jsonify({'error': 'Failed to apply changes'}), 500
+
+@sessions_bp.route('/<session_id>', methods=['DELETE'])
+def close_session(session_id):
+    """
+    Close a session and free its results
+    """
+    if not get_session_manager().close(session_id):
+        return jsonify({'error': 'Session not found'}), 404
+    return jsonify({'session_id': session_id, 'closed': True})
@@ -0,0 +1,88 @@
+"""
+Per-request analysis context.
+
+Created once per analyzed code string; every derived view (lines, per-line
+metric arrays, token stream, construct counts, parse tree) is computed
+lazily on first use and then shared by all CodeAnalyzer methods.
+"""
+import re
+import time
+from functools import cached_property
+from typing import Any, Callable, Dict, List, Optional
+
+from .canonicalizer import CanonicalCode, canonicalize
+from .keyword_scanner import get_scanner
+from .python_structure import PythonStructureVisitor, parse_python_structure
+from utils.line_metrics import LineMetrics
+
+_TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+class AnalysisContext:
+    """
+    Code being analyzed plus lazily memoized views derived from it
+    """
+
+    def __init__(self, code: str, language: str = 'auto', deadline: Optional[float] = None):
+        self.code = code
+        self.language = language
+        self.deadline = deadline  # time.perf_counter() value after which remaining work is skipped
+        self.skipped = []  # fields left out because the deadline passed
+        self._memo = {}
+
+    @cached_property
+    def lines(self) -> List[str]:
+        return self.code.split('\n')
+
+    @cached_property
+    def lowered(self) -> str:
+        """Lower-cased code for case-insensitive substring checks"""
+        return self.code.lower()
+
+    @cached_property
+    def stripped_lines(self) -> List[str]:
+        return [line.strip() for line in self.lines]
+
+    @cached_property
+    def line_metrics(self) -> LineMetrics:
+        """Vectorized per-line length, indentation, blank and comment arrays"""
+        return LineMetrics(self.code)
+
+    @cached_property
+    def canonical(self) -> CanonicalCode:
+        """Comment-free, tokenized and identifier-abstracted forms, shared with SimilarityDetector"""
+        return canonicalize(self.code, self.language)
+
+    @cached_property
+    def tokens(self) -> List[str]:
+        """Identifier, keyword, number and punctuation tokens in source order"""
+        return _TOKEN_PATTERN.findall(self.code)
+
+    @cached_property
+    def constructs(self) -> Dict[str, int]:
+        """
+        Keyword, definition and literal counts from a single scan that
+        skips strings and comments (see keyword_scanner.CONSTRUCTS)
+        """
+        return get_scanner(self.language).scan(self.code)
+
+    @cached_property
+    def python_structure(self) -> Optional[PythonStructureVisitor]:
+        """Single-pass AST structure for Python code, None for other languages or unparsable code"""
+        if self.language != 'python':
+            return None
+        return parse_python_structure(self.code)
+
+    def out_of_time(self) -> bool:
+        """True once the analysis deadline has passed"""
+        return self.deadline is not None and time.perf_counter() > self.deadline
+
+    def count(self, *constructs: str) -> int:
+        """Total occurrences of the given constructs"""
+        counts = self.constructs
+        return sum(counts.get(construct, 0) for construct in constructs)
+
+    def memoize(self, name: str, compute: Callable[[], Any]) -> Any:
+        """Compute a derived value once per context"""
+        if name not in self._memo:
+            self._memo[name] = compute()
+        return self._memo[name]
@@ -0,0 +1,363 @@
+"""
+Incremental analysis sessions for live editors.
+
+A session holds the editor buffer split into top-level regions (functions,
+classes, runs of module-level statements). Each region is analyzed on its
+own and its result is kept under the hash of its content, so after an edit
+only regions whose content changed are re-analyzed and the response is a
+diff against the previous analysis.
+"""
+import hashlib
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Per-region sections; the session summary is aggregated from these
+REGION_FIELDS = [
+    'lines_of_code',
+    'complexity_metrics',
+    'structure_analysis.function_names',
+    'structure_analysis.imports',
+    'code_quality.code_smells'
+]
+
+# Top-level lines that start a new region even without a blank line before them
+_DEFINITION_START = re.compile(
+    r'(?:(?:export|public|private|protected|internal|static|abstract|final|async|pub)\s+)*'
+    r'(?:def|class|function|func|fn|fun|interface|struct|enum|impl|module|trait|object)\b'
+)
+# Top-level lines that continue the previous construct
+_CONTINUATION = re.compile(r'[}\])]|(?:else|elif|elsif|except|finally|catch|rescue|ensure|end|when)\b')
+# Lines that attach to the definition below them
+_ATTACHED = ('@', '#', '//', '/*', '*', '"""', "'''")
+# Characters that take two UTF-16 code units (a surrogate pair)
+_ASTRAL = re.compile('[\U00010000-\U0010FFFF]')
+
+class SessionConflict(Exception):
+    """Raised when an update is based on a stale buffer version"""
+
+    def __init__(self, current_version: int):
+        super().__init__(f'Session is at version {current_version}')
+        self.current_version = current_version
+
+def split_regions(code: str) -> List[Dict[str, Any]]:
+    """
+    Split code into top-level regions with 1-based inclusive line ranges.
+    A region starts at an unindented line that follows a blank line or that
+    begins a definition, unless it continues (or is attached to) the
+    construct before it.
+    """
+    lines = code.split('\n')
+    starts = [0]
+    attached_from = None  # first line of the decorators/comments directly above
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if not stripped:
+            attached_from = None
+            continue
+        top_level = line[0] not in ' \t'
+        if i > 0 and top_level and not _CONTINUATION.match(stripped):
+            blank_before = not lines[i - 1].strip()
+            if blank_before:
+                start = i
+            elif _DEFINITION_START.match(stripped):
+                start = attached_from if attached_from is not None else i
+            else:
+                start = None
+            if start is not None and start > starts[-1]:
+                starts.append(start)
+        if top_level and stripped.startswith(_ATTACHED):
+            if attached_from is None:
+                attached_from = i
+        else:
+            attached_from = None
+
+    regions = []
+    for index, start in enumerate(starts):
+        end = starts[index + 1] if index + 1 < len(starts) else len(lines)
+        regions.append({
+            'start_line': start + 1,
+            'end_line': end,
+            'text': '\n'.join(lines[start:end])
+        })
+    return regions
+
+def _code_point_index(code: str, units: int) -> int:
+    """
+    Index into code of a UTF-16 code unit offset: characters outside the
+    Basic Multilingual Plane are two UTF-16 units but one Python character
+    """
+    extra = 0
+    for match in _ASTRAL.finditer(code):
+        position = match.start() + extra  # of this character, in UTF-16 units
+        if units <= position:
+            break
+        if units == position + 1:
+            raise ValueError(f'Delta offset {units} splits a surrogate pair')
+        extra += 1
+    return units - extra
+
+def apply_delta(code: str, delta: Dict[str, Any]) -> str:
+    """
+    Apply one text edit: replace `length` characters at `offset` with `text`.
+    Offsets and lengths count UTF-16 code units, like JavaScript strings and
+    Monaco's rangeOffset/rangeLength (whose names are accepted too).
+    """
+    if not isinstance(delta, dict):
+        raise ValueError('Each delta must be an object with offset, length and text')
+    offset = delta.get('offset', delta.get('rangeOffset'))
+    length = delta.get('length', delta.get('rangeLength', 0))
+    text = delta.get('text', '')
+    if not isinstance(offset, int) or not isinstance(length, int) or not isinstance(text, str):
+        raise ValueError('Each delta needs an integer offset and length and a text string')
+    size = len(code) + len(_ASTRAL.findall(code))
+    if offset < 0 or length < 0 or offset + length > size:
+        raise ValueError(f'Delta range {offset}+{length} is outside the buffer (length {size})')
+    start = _code_point_index(code, offset)
+    end = _code_point_index(code, offset + length)
+    return code[:start] + text + code[end:]
+
+class AnalysisSession:
+    """
+    One editor buffer and the per-region analysis of its current version
+    """
+
+    def __init__(self, session_id: str, code: str, language: str, code_analyzer,
+                 similarity_detector=None, check_database: bool = False):
+        self.session_id = session_id
+        self.code = ''
+        self.requested_language = language
+        self.language = language
+        self.version = 0
+        self.code_analyzer = code_analyzer
+        self.similarity_detector = similarity_detector
+        self.check_database = check_database and similarity_detector is not None
+        self.regions = []  # current regions in buffer order
+        self.results = {}  # region hash -> {'analysis', 'similarity', 'corpus'}
+        self.summary = {}
+        self.created_at = self.last_used = time.time()
+        self.lock = threading.Lock()
+        self._refresh(code)
+
+    def apply(self, base_version: int, deltas: Optional[List[Dict[str, Any]]] = None,
+              code: Optional[str] = None, max_code_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Apply deltas (in order) or replace the whole buffer, re-analyze the
+        changed regions and return the analysis diff
+        """
+        if base_version != self.version:
+            raise SessionConflict(self.version)
+
+        if code is None:
+            code = self.code
+            for delta in deltas or []:
+                code = apply_delta(code, delta)
+        if max_code_size is not None and len(code) > max_code_size:
+            raise ValueError(f'Code is too large (max {max_code_size} characters)')
+        return self._refresh(code)
+
+    def state(self) -> Dict[str, Any]:
+        """Full analysis of the current version"""
+        return {
+            'session_id': self.session_id,
+            'version': self.version,
+            'language': self.language,
+            'summary': self.summary,
+            'regions': [self._describe(region) for region in self.regions]
+        }
+
+    def _refresh(self, code: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        if self.requested_language == 'auto':
+            self.language = self.code_analyzer.detect_language(code)
+        language_changed = bool(self.regions) and self.language != self.regions[0]['language']
+
+        previous = {region['id']: region for region in self.regions}
+        corpus = self.similarity_detector.database_fingerprint if self.check_database else None
+
+        regions = []
+        recomputed = 0
+        for region in split_regions(code):
+            region['language'] = self.language
+            region['id'] = hashlib.sha1(
+                f"{self.language}\0{region['text']}".encode('utf-8', 'surrogatepass')
+            ).hexdigest()[:16]
+            result = self.results.get(region['id'])
+            if result is None or result['corpus'] != corpus:
+                result = self._analyze_region(region['text'], corpus, result)
+                self.results[region['id']] = result
+                recomputed += 1
+            regions.append(region)
+
+        current_ids = {region['id'] for region in regions}
+        self.results = {key: value for key, value in self.results.items() if key in current_ids}
+
+        old_summary = self.summary
+        self.code = code
+        self.regions = regions
+        self.summary = self._summarize()
+        self.version += 1
+        self.last_used = time.time()
+
+        moved = [
+            {'id': region['id'], 'start_line': region['start_line'], 'end_line': region['end_line']}
+            for region in regions
+            if region['id'] in previous and (
+                previous[region['id']]['start_line'] != region['start_line']
+                or previous[region['id']]['end_line'] != region['end_line']
+            )
+        ]
+        return {
+            'session_id': self.session_id,
+            'version': self.version,
+            'language': self.language,
+            'language_changed': language_changed,
+            'regions': {
+                'added': [self._describe(region) for region in regions if region['id'] not in previous],
+                'removed': [region_id for region_id in previous if region_id not in current_ids],
+                'moved': moved,
+                'unchanged': sum(1 for region in regions if region['id'] in previous)
+            },
+            'summary_changes': {
+                key: {'old': old_summary.get(key), 'new': value}
+                for key, value in self.summary.items() if old_summary.get(key) != value
+            },
+            'recomputed_regions': recomputed,
+            'reused_regions': len(regions) - recomputed,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    def _analyze_region(self, text: str, corpus, previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        # A corpus change only invalidates the similarity part
+        if previous is not None:
+            analysis = previous['analysis']
+        elif text.strip():
+            analysis = self.code_analyzer.analyze(text, self.language, REGION_FIELDS)
+        else:
+            analysis = None
+
+        similarity = None
+        if self.check_database and text.strip():
+            similarity = self.similarity_detector.find_similar_code(text, self.language, check_database=True)
+        return {'analysis': analysis, 'similarity': similarity, 'corpus': corpus}
+
+    def _describe(self, region: Dict[str, Any]) -> Dict[str, Any]:
+        result = self.results[region['id']]
+        description = {
+            'id': region['id'],
+            'start_line': region['start_line'],
+            'end_line': region['end_line'],
+            'analysis': result['analysis']
+        }
+        if self.check_database:
+            description['similarity'] = result['similarity']
+        return description
+
+    def _summarize(self) -> Dict[str, Any]:
+        """Whole-buffer metrics aggregated from the region results"""
+        lines = {'total': 0, 'code': 0, 'comments': 0, 'blank': 0}
+        complexity = 1
+        nesting_depth = function_count = class_count = 0
+        function_names, imports, smells = set(), set(), set()
+        highest_similarity, matches = 0.0, {}
+
+        for region in self.regions:
+            result = self.results[region['id']]
+            analysis = result['analysis']
+            if analysis is None:
+                blank = region['end_line'] - region['start_line'] + 1
+                lines['total'] += blank
+                lines['blank'] += blank
+                continue
+
+            for key in lines:
+                lines[key] += analysis['lines_of_code'][key]
+            metrics = analysis['complexity_metrics']
+            complexity += metrics['cyclomatic_complexity'] - 1
+            nesting_depth = max(nesting_depth, metrics['nesting_depth'])
+            function_count += metrics['function_count']
+            class_count += metrics['class_count']
+            function_names.update(analysis['structure_analysis']['function_names'])
+            imports.update(analysis['structure_analysis']['imports'])
+            smells.update(analysis['code_quality']['code_smells'])
+
+            similarity = result['similarity']
+            if similarity:
+                highest_similarity = max(highest_similarity, similarity['highest_similarity'])
+                for match in similarity['matches']:
+                    best = matches.get(match['id'])
+                    if best is None or match['similarity_score'] > best['similarity_score']:
+                        matches[match['id']] = match
+
+        summary = {
+            'lines_of_code': lines,
+            'cyclomatic_complexity': complexity,
+            'nesting_depth': nesting_depth,
+            'function_count': function_count,
+            'class_count': class_count,
+            'function_names': sorted(function_names),
+            'imports': sorted(imports),
+            'code_smells': sorted(smells),
+            'region_count': len(self.regions)
+        }
+        if self.check_database:
+            summary['highest_similarity'] = highest_similarity
+            summary['risk_level'] = (
+                'high' if highest_similarity >= 0.8 else 'medium' if highest_similarity >= 0.6 else 'low'
+            )
+            summary['top_matches'] = [
+                match['id'] for match in
+                sorted(matches.values(), key=lambda match: match['similarity_score'], reverse=True)[:10]
+            ]
+        return summary
+
+class SessionManager:
+    """
+    In-memory registry of open sessions with idle expiry and a size bound
+    (least recently used sessions are closed first)
+    """
+
+    def __init__(self, code_analyzer, similarity_detector=None, max_sessions: int = 500, ttl: float = 1800):
+        self.code_analyzer = code_analyzer
+        self.similarity_detector = similarity_detector
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, code: str, language: str = 'auto', check_database: bool = False) -> AnalysisSession:
+        session = AnalysisSession(
+            uuid.uuid4().hex, code, language, self.code_analyzer,
+            self.similarity_detector, check_database
+        )
+        with self._lock:
+            self._purge_expired()
+            self._sessions[session.session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def get(self, session_id: str) -> Optional[AnalysisSession]:
+        with self._lock:
+            self._purge_expired()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                session.last_used = time.time()
+            return session
+
+    def close(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.ttl
+        for session_id in [key for key, session in self._sessions.items() if session.last_used < cutoff]:
+            del self._sessions[session_id]
@@ -0,0 +1,120 @@
+"""
+Canonical forms of submitted code shared by CodeAnalyzer and SimilarityDetector.
+
+A code string is canonicalized once per language: a single scan with the
+language's comment and string syntax (the keyword scanner's tables) yields
+the comment-free text, and the comparison text, token stream and
+identifier-abstracted form are derived from it on first use. Forms are kept
+in a bounded LRU cache, so the analyzer and the detector working on the same
+code within a request (and database entries across requests) reuse one scan.
+"""
+import re
+from functools import cached_property, lru_cache
+from typing import List
+
+from .keyword_scanner import DEFAULT_SYNTAX, LANGUAGE_SYNTAX
+from .language_detector import LanguageDetector
+
+# Distinct (code, language) pairs whose canonical forms are kept
+CANONICAL_CACHE_SIZE = 256
+
+# Words too common to tell two snippets apart
+NOISE_TOKENS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'})
+
+_STRING_QUOTES = ('"', "'", '`')
+_WORD = re.compile(r'\w+')
+_WHITESPACE = re.compile(r'\s+')
+_PUNCTUATION_SPACE = re.compile(r'\s*([{}();\[\],])\s*')
+_ASSIGNED_NAME = re.compile(r'\b(\w+)\s*=')
+
+_language_detector = LanguageDetector()
+
+def abstract_identifiers(text: str, language: str) -> str:
+    """Replace assigned names with VAR-prefixed placeholders (Python only for now)"""
+    if language == 'python':
+        return _ASSIGNED_NAME.sub(r'VAR\1 =', text)
+    return text
+
+@lru_cache(maxsize=None)
+def _compiled_skip_pattern(key: str) -> re.Pattern:
+    syntax = LANGUAGE_SYNTAX.get(key, DEFAULT_SYNTAX)
+    return re.compile('|'.join(syntax['skip']))
+
+def _skip_pattern(language: str) -> re.Pattern:
+    """
+    Comments and string literals of a language, compiled once per process;
+    unknown languages share the 'default' pattern
+    """
+    return _compiled_skip_pattern(language if language in LANGUAGE_SYNTAX else 'default')
+
+class CanonicalCode:
+    """
+    Canonical forms of one code string; each form is computed on first use
+    """
+
+    def __init__(self, code: str, language: str):
+        self.code = code
+        self.language = language
+
+    @cached_property
+    def _scanned(self):
+        # One pass: comments are dropped, strings kept verbatim in the
+        # comment-free text and masked as STRING for tokenization
+        kept, masked = [], []
+        position = 0
+        for match in _skip_pattern(self.language).finditer(self.code):
+            start, end = match.span()
+            if start > position:
+                kept.append(self.code[position:start])
+                masked.append(self.code[position:start])
+            if self.code.startswith(_STRING_QUOTES, start):
+                kept.append(match.group())
+                masked.append(' STRING ')
+            position = end
+        kept.append(self.code[position:])
+        masked.append(self.code[position:])
+        return ''.join(kept), ''.join(masked)
+
+    @cached_property
+    def comment_free(self) -> str:
+        """The code with every comment removed and everything else untouched"""
+        return self._scanned[0]
+
+    @cached_property
+    def tokens(self) -> List[str]:
+        """
+        Lower-cased words of the comment-free code with string literals as
+        'string', without noise words and single characters
+        """
+        return [
+            token for token in (word.lower() for word in _WORD.findall(self._scanned[1]))
+            if len(token) > 1 and token not in NOISE_TOKENS
+        ]
+
+    @cached_property
+    def normalized(self) -> str:
+        """Comment-free, lower-cased code on one line, without spaces around punctuation"""
+        collapsed = _WHITESPACE.sub(' ', self.comment_free)
+        return _PUNCTUATION_SPACE.sub(r'\1', collapsed).strip().lower()
+
+    @cached_property
+    def abstracted(self) -> str:
+        """
+        Comment-free code on one line with assigned names marked as
+        variables ('x = 1' becomes 'VARx = 1' in Python)
+        """
+        return abstract_identifiers(_WHITESPACE.sub(' ', self.comment_free), self.language).strip()
+
+@lru_cache(maxsize=CANONICAL_CACHE_SIZE)
+def _canonical_for(code: str, language: str) -> CanonicalCode:
+    return CanonicalCode(code, language)
+
+def canonicalize(code: str, language: str = 'auto') -> CanonicalCode:
+    """
+    Canonical forms of code. 'auto' and 'unknown' are resolved with the
+    language detector first, so callers that pass the detected language
+    share the cached forms with those that pass 'auto'.
+    """
+    if language in ('auto', 'unknown'):
+        language = _language_detector.detect(code)['language']
+    return _canonical_for(code, language)
@@ -2,9 +2,126 @@ import ast
 import re
 import os
 import math
-from typing import Dict, List, Any, Optional
+import time
+import numpy as np
+from typing import Dict, List, Any, Callable, Iterable, Iterator, Optional, Tuple, Union
 from collections import Counter
-import math
+from concurrent.futures.process import BrokenProcessPool
+from .analysis_context import AnalysisContext
+from .canonicalizer import abstract_identifiers, canonicalize
+from .keyword_scanner import DECISION_CONSTRUCTS
+from .language_detector import LanguageDetector
+from utils.text_scan import contains_any, contains_in_order
+from utils.process_pool import (
+    get_process_pool, discard_process_pool, default_worker_count, process_pool_available
+)
+
+CodeInput = Union[str, AnalysisContext]
+
+# Bump when the analysis output changes so cached results are not reused
+ANALYZER_VERSION = '7'
+
+# Quoted strings; an unclosed quote ends at the end of its line (or of the
+# code for triple quotes and backticks) so every character is scanned once
+_STRING_LITERAL = re.compile(
+    r'"""(?P<triple_double>[\s\S]*?)(?:"""|\Z)'
+    r"|'''(?P<triple_single>[\s\S]*?)(?:'''|\Z)"
+    r'|"(?P<double>(?:[^"\\\n]|\\.)*)"?'
+    r"|'(?P<single>(?:[^'\\\n]|\\.)*)'?"
+    r'|`(?P<backtick>(?:[^`\\]|\\[\s\S])*)`?'
+)
+_STRING_DELIMITERS = {
+    'triple_double': '"""', 'triple_single': "'''", 'double': '"', 'single': "'", 'backtick': '`'
+}
+_FOR_WORD = re.compile(r'\bfor\b')
+_RANGE_WORD = re.compile(r'\brange\b')
+
+# Below this many snippets the pool's IPC overhead outweighs the parallel speedup
+PARALLEL_MIN_SNIPPETS = 8
+# Upper bound on snippets sent to a worker per task
+ANALYSIS_CHUNK_SIZE = 32
+
+# Sections of CodeAnalyzer.analyze and the parts each one is made of.
+# A field is either a whole section or 'section.part'.
+ANALYSIS_SECTIONS = {
+    'lines_of_code': (),
+    'complexity_metrics': ('cyclomatic_complexity', 'nesting_depth', 'function_count', 'class_count'),
+    'structure_analysis': ('imports', 'function_names', 'variable_names', 'string_literals', 'control_flow'),
+    'patterns': ('design_patterns', 'algorithm_patterns', 'data_structures'),
+    'normalized_code': (),
+    'code_quality': ('readability_score', 'maintainability_index', 'code_smells', 'best_practices')
+}
+
+# Fields computed from another field's (memoized) result; the dependency is
+# computed first and dropped from the output unless it was requested too
+FIELD_DEPENDENCIES = {
+    'code_quality.maintainability_index': ('complexity_metrics.cyclomatic_complexity',)
+}
+
+def resolve_fields(fields: Optional[Iterable[str]]) -> Optional[Dict[str, Optional[set]]]:
+    """
+    Map requested fields to {section: parts}, where parts is None for a
+    whole section. Returns None when every section is wanted.
+    Raises ValueError for unknown fields.
+    """
+    if fields is None:
+        return None
+    
+    selected = {}
+    pending = list(fields)
+    while pending:
+        field = pending.pop()
+        section, _, part = field.partition('.')
+        if section == 'detected_language' and not part:
+            continue
+        if section not in ANALYSIS_SECTIONS or (part and part not in ANALYSIS_SECTIONS[section]):
+            raise ValueError(f'Unknown analysis field: {field}')
+        
+        if not part:
+            selected[section] = None
+        elif section not in selected:
+            selected[section] = {part}
+        elif selected[section] is not None:
+            selected[section].add(part)
+        pending.extend(FIELD_DEPENDENCIES.get(field, ()))
+    
+    return selected
+
+def analyze_item(analyzer: 'CodeAnalyzer', index: int, code: str, language: str,
+                 fields: Optional[List[str]] = None, time_budget: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Analyze one snippet of a batch, reporting a failure as the item's result
+    """
+    try:
+        return {
+            'index': index,
+            'analysis': analyzer.analyze(code, language, fields, time_budget),
+            'status': 'success'
+        }
+    except Exception as e:
+        return {
+            'index': index,
+            'error': str(e),
+            'status': 'failed'
+        }
+
+_worker_analyzer = None
+
+def analyze_chunk(task: Tuple[int, List[str], str, Optional[List[str]], Optional[float]]) -> List[Dict[str, Any]]:
+    """
+    Analyze a chunk of snippets. ``task`` is ``(first_index, codes, language,
+    fields, time_budget)``. Runs inside spawned pool worker processes, each of
+    which imports only the analyzer's modules (no models) and keeps one
+    CodeAnalyzer for its lifetime.
+    """
+    global _worker_analyzer
+    if _worker_analyzer is None:
+        _worker_analyzer = CodeAnalyzer()
+    first_index, codes, language, fields, time_budget = task
+    return [
+        analyze_item(_worker_analyzer, first_index + offset, code, language, fields, time_budget)
+        for offset, code in enumerate(codes)
+    ]
 
 class CodeAnalyzer:
     """
@@ -27,77 +144,154 @@ class CodeAnalyzer:
             'swift': ['.swift'],
             'kotlin': ['.kt']
         }
+        self.language_detector = LanguageDetector()
     
-    def analyze(self, code: str, language: str = 'auto') -> Dict[str, Any]:
-        """
-        Comprehensive code analysis
-        """
+    def analyze(self, code: str, language: str = 'auto',
+                fields: Optional[Iterable[str]] = None,
+                time_budget: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Comprehensive code analysis.
+        fields limits the result to the given sections or 'section.part'
+        fields (plus 'detected_language'); only those and the fields they
+        depend on are computed.
+        time_budget (seconds) is checked between fields: once it is spent the
+        remaining fields are skipped and the result is marked 'truncated'
+        with their names in 'skipped_fields'.
+        """
+        requested = resolve_fields(fields)
+        deadline = time.perf_counter() + time_budget if time_budget else None
+        
+        language_confidence = None
         if language == 'auto':
-            language = self.detect_language(code)
-        
-        analysis = {
-            'detected_language': language,
-            'lines_of_code': self.count_lines(code),
-            'complexity_metrics': self.calculate_complexity(code, language),
-            'structure_analysis': self.analyze_structure(code, language),
-            'patterns': self.extract_patterns(code, language),
-            'normalized_code': self.normalize_code(code, language),
-            'code_quality': self.analyze_code_quality(code, language)
+            detection = self.language_detector.detect(code)
+            language, language_confidence = detection['language'], detection['confidence']
+        
+        # Lines, keyword counts and the Python parse tree are derived once
+        # and shared by every section
+        ctx = AnalysisContext(code, language, deadline)
+        
+        sections = {
+            'lines_of_code': lambda parts: self.count_lines(ctx),
+            'complexity_metrics': lambda parts: self.calculate_complexity(ctx, language, parts),
+            'structure_analysis': lambda parts: self.analyze_structure(ctx, language, parts),
+            'patterns': lambda parts: self.extract_patterns(ctx, language, parts),
+            'normalized_code': lambda parts: self.normalize_code(ctx, language),
+            'code_quality': lambda parts: self.analyze_code_quality(ctx, language, parts)
         }
         
+        analysis = {'detected_language': language}
+        if language_confidence is not None:
+            analysis['language_confidence'] = language_confidence
+        for section, compute in sections.items():
+            if requested is not None and section not in requested:
+                continue
+            if ctx.out_of_time():
+                ctx.skipped.append(section)
+                continue
+            analysis[section] = compute(None if requested is None else requested[section])
+        
+        if requested is not None:
+            self._drop_unrequested(analysis, fields)
+        
+        if ctx.skipped:
+            analysis['truncated'] = True
+            analysis['skipped_fields'] = ctx.skipped
+        
         return analysis
     
-    def detect_language(self, code: str) -> str:
+    def analyze_many(self, codes: List[str], language: str = 'auto',
+                     fields: Optional[List[str]] = None, workers: Optional[int] = None,
+                     time_budget: Optional[float] = None) -> List[Dict[str, Any]]:
         """
-        Detect programming language from code content
+        Analyze many snippets across a persistent pool of spawned processes.
+        Returns one {'index', 'analysis', 'status'} item per snippet in input
+        order; a snippet that fails gets {'index', 'error', 'status': 'failed'}
+        without affecting the others.
         """
-        # Simple heuristics for language detection
-        patterns = {
-            'python': [
-                r'def\s+\w+\s*\(',
-                r'import\s+\w+',
-                r'from\s+\w+\s+import',
-                r'if\s+__name__\s*==\s*["\']__main__["\']'
-            ],
-            'javascript': [
-                r'function\s+\w+\s*\(',
-                r'const\s+\w+\s*=',
-                r'let\s+\w+\s*=',
-                r'var\s+\w+\s*=',
-                r'console\.log\s*\('
-            ],
-            'java': [
-                r'public\s+class\s+\w+',
-                r'public\s+static\s+void\s+main',
-                r'System\.out\.print',
-                r'import\s+java\.'
-            ],
-            'cpp': [
-                r'#include\s*<\w+>',
-                r'int\s+main\s*\(',
-                r'std::\w+',
-                r'cout\s*<<'
-            ],
-            'csharp': [
-                r'using\s+System',
-                r'public\s+class\s+\w+',
-                r'Console\.Write',
-                r'namespace\s+\w+'
-            ]
-        }
-        
-        scores = {}
-        for lang, lang_patterns in patterns.items():
-            score = 0
-            for pattern in lang_patterns:
-                matches = len(re.findall(pattern, code, re.IGNORECASE))
-                score += matches
-            scores[lang] = score
+        return list(self.iter_analyze_many(codes, language, fields, workers, time_budget))
+    
+    def iter_analyze_many(self, codes: List[str], language: str = 'auto',
+                          fields: Optional[List[str]] = None, workers: Optional[int] = None,
+                          time_budget: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Like analyze_many, yielding items in input order as they complete
+        """
+        workers = workers or default_worker_count()
+        # A few chunks per worker keeps the pool balanced while amortizing IPC
+        chunk_size = max(1, min(ANALYSIS_CHUNK_SIZE, math.ceil(len(codes) / (workers * 4))))
+        tasks = [
+            (start, codes[start:start + chunk_size], language, fields, time_budget)
+            for start in range(0, len(codes), chunk_size)
+        ]
         
-        if not scores or max(scores.values()) == 0:
-            return 'unknown'
+        completed = 0
+        if workers > 1 and len(codes) >= PARALLEL_MIN_SNIPPETS and process_pool_available():
+            try:
+                pool = get_process_pool(workers)
+                for items in pool.map(analyze_chunk, tasks):
+                    completed += 1
+                    yield from items
+                return
+            except (BrokenProcessPool, OSError) as e:
+                print(f"Process pool unavailable, analyzing in-process: {e}")
+                discard_process_pool(workers)
+        
+        for first_index, chunk, *_ in tasks[completed:]:
+            for offset, code in enumerate(chunk):
+                yield analyze_item(self, first_index + offset, code, language, fields, time_budget)
+    
+    def _drop_unrequested(self, analysis: Dict[str, Any], fields: Iterable[str]):
+        """
+        Remove parts that were only computed as dependencies of requested fields
+        """
+        wanted = {}
+        for field in fields:
+            section, _, part = field.partition('.')
+            if not part:
+                wanted[section] = None
+            elif wanted.get(section, set()) is not None:
+                wanted.setdefault(section, set()).add(part)
         
-        return max(scores, key=scores.get)
+        for section in list(analysis):
+            if section in ('detected_language', 'language_confidence'):
+                continue
+            if section not in wanted:
+                del analysis[section]
+            elif wanted[section] is not None:
+                analysis[section] = {
+                    part: value for part, value in analysis[section].items() if part in wanted[section]
+                }
+    
+    def _compute_parts(self, ctx: AnalysisContext, section: str,
+                       computers: Dict[str, Callable[[], Any]],
+                       parts: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Run the requested parts of a section, or all of them when parts is None.
+        Parts left when the context's deadline passes are recorded as skipped.
+        """
+        results = {}
+        for name, compute in computers.items():
+            if parts is not None and name not in parts:
+                continue
+            if ctx.out_of_time():
+                ctx.skipped.append(f'{section}.{name}')
+                continue
+            results[name] = compute()
+        return results
+    
+    def _context(self, code: CodeInput, language: str = 'auto') -> AnalysisContext:
+        """
+        Reuse the caller's context, or wrap a bare code string in a new one
+        """
+        if isinstance(code, AnalysisContext):
+            return code
+        return AnalysisContext(code, language)
+    
+    def detect_language(self, code: str) -> str:
+        """
+        Detect programming language from code content
+        """
+        return self.language_detector.detect(code)['language']
     
     def detect_language_from_filename(self, filename: str) -> str:
         """
@@ -111,15 +305,15 @@ class CodeAnalyzer:
         
         return 'unknown'
     
-    def count_lines(self, code: str) -> Dict[str, int]:
+    def count_lines(self, code: CodeInput) -> Dict[str, int]:
         """
         Count different types of lines in code
         """
-        lines = code.split('\n')
+        metrics = self._context(code).line_metrics
         
-        total_lines = len(lines)
-        blank_lines = sum(1 for line in lines if not line.strip())
-        comment_lines = self.count_comment_lines(lines)
+        total_lines = metrics.count
+        blank_lines = total_lines - metrics.non_empty
+        comment_lines = metrics.comment_line_count()
         code_lines = total_lines - blank_lines - comment_lines
         
         return {
@@ -129,146 +323,91 @@ class CodeAnalyzer:
             'blank': blank_lines
         }
     
-    def count_comment_lines(self, lines: List[str]) -> int:
-        """
-        Count comment lines (simplified)
-        """
-        comment_count = 0
-        in_multiline_comment = False
-        
-        for line in lines:
-            stripped = line.strip()
-            
-            # Single line comments
-            if stripped.startswith('#') or stripped.startswith('//'):
-                comment_count += 1
-            # Multi-line comments (simplified)
-            elif '/*' in stripped:
-                comment_count += 1
-                if '*/' not in stripped:
-                    in_multiline_comment = True
-            elif in_multiline_comment:
-                comment_count += 1
-                if '*/' in stripped:
-                    in_multiline_comment = False
-        
-        return comment_count
-    
-    def calculate_complexity(self, code: str, language: str) -> Dict[str, Any]:
+    def calculate_complexity(self, code: CodeInput, language: str,
+                             parts: Optional[Iterable[str]] = None) -> Dict[str, Any]:
         """
         Calculate code complexity metrics
         """
-        complexity = {
-            'cyclomatic_complexity': self.calculate_cyclomatic_complexity(code),
-            'nesting_depth': self.calculate_max_nesting_depth(code),
-            'function_count': self.count_functions(code, language),
-            'class_count': self.count_classes(code, language)
-        }
-        
-        return complexity
+        ctx = self._context(code, language)
+        return self._compute_parts(ctx, 'complexity_metrics', {
+            'cyclomatic_complexity': lambda: self.calculate_cyclomatic_complexity(ctx),
+            'nesting_depth': lambda: self.calculate_max_nesting_depth(ctx),
+            'function_count': lambda: self.count_functions(ctx, language),
+            'class_count': lambda: self.count_classes(ctx, language)
+        }, parts)
     
-    def calculate_cyclomatic_complexity(self, code: str) -> int:
+    def calculate_cyclomatic_complexity(self, code: CodeInput) -> int:
         """
         Calculate cyclomatic complexity (simplified)
         """
-        # Count decision points
-        decision_keywords = ['if', 'elif', 'else', 'while', 'for', 'try', 'except', 'case', 'switch']
-        complexity = 1  # Base complexity
-        
-        for keyword in decision_keywords:
-            # Simple regex to find keywords
-            pattern = r'\b' + keyword + r'\b'
-            matches = len(re.findall(pattern, code, re.IGNORECASE))
-            complexity += matches
-        
-        return complexity
+        ctx = self._context(code)
+        if ctx.python_structure is not None:
+            return ctx.python_structure.cyclomatic_complexity
+        # Base complexity of 1 plus one per decision point outside strings and comments
+        return ctx.memoize('cyclomatic_complexity', lambda: 1 + ctx.count(*DECISION_CONSTRUCTS))
     
-    def calculate_max_nesting_depth(self, code: str) -> int:
+    def calculate_max_nesting_depth(self, code: CodeInput) -> int:
         """
         Calculate maximum nesting depth
         """
-        lines = code.split('\n')
-        max_depth = 0
-        current_depth = 0
-        
-        for line in lines:
-            stripped = line.strip()
-            if not stripped:
-                continue
-            
-            # Count indentation
-            leading_spaces = len(line) - len(line.lstrip())
-            indent_level = leading_spaces // 4  # Assuming 4-space indentation
-            
-            # Rough approximation of nesting
-            if stripped.endswith(':') or stripped.endswith('{'):
-                current_depth = indent_level + 1
-                max_depth = max(max_depth, current_depth)
+        ctx = self._context(code)
+        if ctx.python_structure is not None:
+            return ctx.python_structure.max_depth
+        metrics = ctx.line_metrics
         
-        return max_depth
+        # Rough approximation of nesting: lines opening a block, with their
+        # indentation in levels (assuming 4-space indentation)
+        opens_block = metrics.ends_with_any(':{')
+        if not opens_block.any():
+            return 0
+        return int(metrics.indentation[opens_block].max()) // 4 + 1
     
-    def count_functions(self, code: str, language: str) -> int:
+    def count_functions(self, code: CodeInput, language: str) -> int:
         """
         Count function definitions
         """
-        patterns = {
-            'python': r'def\s+\w+\s*\(',
-            'javascript': r'function\s+\w+\s*\(',
-            'java': r'(public|private|protected)?\s*(static)?\s*\w+\s+\w+\s*\(',
-            'cpp': r'\w+\s+\w+\s*\([^)]*\)\s*{',
-            'csharp': r'(public|private|protected)?\s*(static)?\s*\w+\s+\w+\s*\('
-        }
-        
-        pattern = patterns.get(language, r'function\s+\w+\s*\(|def\s+\w+\s*\(')
-        return len(re.findall(pattern, code, re.IGNORECASE))
+        ctx = self._context(code, language)
+        if ctx.python_structure is not None:
+            return len(ctx.python_structure.functions)
+        return ctx.count('function_definitions')
     
-    def count_classes(self, code: str, language: str) -> int:
+    def count_classes(self, code: CodeInput, language: str) -> int:
         """
         Count class definitions
         """
-        patterns = {
-            'python': r'class\s+\w+',
-            'javascript': r'class\s+\w+',
-            'java': r'(public|private)?\s*class\s+\w+',
-            'cpp': r'class\s+\w+',
-            'csharp': r'(public|private|internal)?\s*class\s+\w+'
-        }
-        
-        pattern = patterns.get(language, r'class\s+\w+')
-        return len(re.findall(pattern, code, re.IGNORECASE))
+        ctx = self._context(code, language)
+        if ctx.python_structure is not None:
+            return len(ctx.python_structure.classes)
+        return ctx.count('class_definitions')
     
-    def analyze_structure(self, code: str, language: str) -> Dict[str, Any]:
+    def analyze_structure(self, code: CodeInput, language: str,
+                          parts: Optional[Iterable[str]] = None) -> Dict[str, Any]:
         """
         Analyze code structure and patterns
         """
-        structure = {
-            'imports': self.extract_imports(code, language),
-            'function_names': self.extract_function_names(code, language),
-            'variable_names': self.extract_variable_names(code, language),
-            'string_literals': self.extract_string_literals(code),
-            'control_flow': self.analyze_control_flow(code)
-        }
-        
-        return structure
+        ctx = self._context(code, language)
+        return self._compute_parts(ctx, 'structure_analysis', {
+            'imports': lambda: self.extract_imports(ctx, language),
+            'function_names': lambda: self.extract_function_names(ctx, language),
+            'variable_names': lambda: self.extract_variable_names(ctx, language),
+            'string_literals': lambda: self.extract_string_literals(ctx),
+            'control_flow': lambda: self.analyze_control_flow(ctx)
+        }, parts)
     
-    def extract_imports(self, code: str, language: str) -> List[str]:
+    def extract_imports(self, code: CodeInput, language: str) -> List[str]:
         """
         Extract import statements more accurately
         """
+        ctx = self._context(code, language)
+        code = ctx.code
         imports = []
         
         if language == 'python':
             # Python imports using AST
-            try:
-                tree = ast.parse(code)
-                for node in ast.walk(tree):
-                    if isinstance(node, ast.Import):
-                        for alias in node.names:
-                            imports.append(alias.name)
-                    elif isinstance(node, ast.ImportFrom):
-                        if node.module:
-                            imports.append(node.module)
-            except:
+            structure = ctx.python_structure
+            if structure is not None:
+                imports = list(structure.imports)
+            else:
                 # Fallback to regex
                 import_patterns = [
                     r'import\s+([^\s\n,]+)',
@@ -280,7 +419,7 @@ class CodeAnalyzer:
         elif language in ['javascript', 'typescript']:
             # JavaScript/TypeScript imports
             import_patterns = [
-                r'import\s+.*?from\s+["\']([^"\']+)["\']',
+                r'import\s+[^\n]{0,1000}?from\s+["\']([^"\']+)["\']',
                 r'require\s*\(\s*["\']([^"\']+)["\']\s*\)',
                 r'import\s+["\']([^"\']+)["\']'  # import 'module'
             ]
@@ -291,7 +430,7 @@ class CodeAnalyzer:
             pattern = r'import\s+([^\s;]+);'
             imports = re.findall(pattern, code)
         elif language in ['cpp', 'c']:
-            pattern = r'#include\s*[<"]([^>"]+)[>"]'
+            pattern = r'#include\s*[<"]([^>"\n]{1,256})[>"]'
             imports = re.findall(pattern, code)
         
         # Clean up and return unique imports
@@ -303,300 +442,283 @@ class CodeAnalyzer:
         
         return list(set(cleaned_imports))
     
-    def extract_function_names(self, code: str, language: str) -> List[str]:
+    def extract_function_names(self, code: CodeInput, language: str) -> List[str]:
         """
         Extract function names using AST for Python, regex for others
         """
+        ctx = self._context(code, language)
+        code = ctx.code
         functions = []
         
         if language == 'python':
-            try:
-                tree = ast.parse(code)
-                for node in ast.walk(tree):
-                    if isinstance(node, ast.FunctionDef):
-                        functions.append(node.name)
-            except:
+            structure = ctx.python_structure
+            if structure is not None:
+                functions = structure.function_names
+            else:
                 # Fallback to regex if AST parsing fails
                 pattern = r'def\s+(\w+)\s*\('
                 functions = re.findall(pattern, code)
         elif language in ['javascript', 'typescript']:
             patterns = [
                 r'function\s+(\w+)\s*\(',  # function name()
-                r'(\w+)\s*:\s*function',   # name: function
-                r'(\w+)\s*=\s*function',   # name = function
-                r'(\w+)\s*=\s*\([^)]*\)\s*=>'  # arrow functions
+                r'\b(\w+)\s*:\s*function',   # name: function
+                r'\b(\w+)\s*=\s*function',   # name = function
+                r'\b(\w+)\s*=\s*\([^)]{0,1000}\)\s*=>'  # arrow functions
             ]
             for pattern in patterns:
                 functions.extend(re.findall(pattern, code))
         elif language == 'java':
-            pattern = r'(?:public|private|protected)?\s*(?:static)?\s*\w+\s+(\w+)\s*\([^)]*\)\s*\{'
+            pattern = r'\b(?:(?:public|private|protected)\s+)?(?:static\s+)?\w+\s+(\w+)\s*\([^)]{0,1000}\)\s*\{'
             functions = re.findall(pattern, code)
         else:
-            pattern = r'(\w+)\s*\([^)]*\)\s*\{'
+            pattern = r'\b(\w+)\s*\([^)]{0,1000}\)\s*\{'
             functions = re.findall(pattern, code)
         
         return list(set(functions))  # Remove duplicates
     
-    def extract_variable_names(self, code: str, language: str) -> List[str]:
+    def extract_variable_names(self, code: CodeInput, language: str) -> List[str]:
         """
         Extract variable names using AST for Python, regex for others
         """
+        ctx = self._context(code, language)
+        code = ctx.code
         variables = []
         
         if language == 'python':
-            try:
-                tree = ast.parse(code)
-                for node in ast.walk(tree):
-                    if isinstance(node, ast.Assign):
-                        for target in node.targets:
-                            if isinstance(target, ast.Name):
-                                variables.append(target.id)
-                    elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
-                        variables.append(node.target.id)
-            except:
+            structure = ctx.python_structure
+            if structure is not None:
+                variables = structure.variables
+            else:
                 # Fallback to regex
-                pattern = r'(\w+)\s*='
+                pattern = r'\b(\w+)\s*='
                 variables = re.findall(pattern, code)
         elif language in ['javascript', 'typescript']:
             patterns = [
                 r'(?:var|let|const)\s+(\w+)',
-                r'(\w+)\s*=\s*[^=]'  # assignment
+                r'\b(\w+)\s*=\s*[^=]'  # assignment
             ]
             for pattern in patterns:
                 variables.extend(re.findall(pattern, code))
         else:
-            pattern = r'(\w+)\s*='
+            pattern = r'\b(\w+)\s*='
             variables = re.findall(pattern, code)
         
         # Filter out common keywords and return unique variables
         keywords = {'if', 'for', 'while', 'def', 'class', 'import', 'from', 'return', 'print'}
         return list(set([var for var in variables if var not in keywords and len(var) > 1]))
     
-    def extract_string_literals(self, code: str) -> List[str]:
+    def extract_string_literals(self, code: CodeInput) -> List[str]:
         """
-        Extract string literals more accurately
+        Extract the contents of closed string literals (first 10 unique)
         """
-        strings = []
-        
-        # Match different quote styles
-        patterns = [
-            r'"([^"\\\\]|\\\\.)*"',    # Double quotes
-            r"'([^'\\\\]|\\\\.)*'",    # Single quotes
-            r'`([^`\\\\]|\\\\.)*`',    # Backticks (template literals)
-            r'f"([^"\\\\]|\\\\.)*"',   # f-strings
-            r"f'([^'\\\\]|\\\\.)*'"    # f-strings with single quotes
-        ]
+        code = self._context(code).code
+        strings = {}
         
-        for pattern in patterns:
-            matches = re.findall(pattern, code)
-            for match in matches:
-                # Extract content between quotes
-                if isinstance(match, tuple):
-                    content = match[0] if match[0] else match[1] if len(match) > 1 else ''
-                else:
-                    content = match
-                if content and len(content.strip()) > 0:
-                    strings.append(content)
-        
-        # Also get the full quoted strings for better analysis
-        full_pattern = r'["\']([^"\'\\\\]|\\\\.)*["\']'
-        full_matches = re.findall(full_pattern, code)
-        strings.extend([s for s in full_matches if len(s.strip()) > 2])
+        for match in _STRING_LITERAL.finditer(code):
+            delimiter = _STRING_DELIMITERS[match.lastgroup]
+            text = match.group()
+            # Skip unclosed strings
+            if len(text) < 2 * len(delimiter) or not text.endswith(delimiter):
+                continue
+            content = match.group(match.lastgroup)
+            if content.strip():
+                strings[content] = None
+                if len(strings) == 10:
+                    break
         
-        return list(set(strings[:10]))  # Return unique strings, max 10
+        return list(strings)
     
-    def analyze_control_flow(self, code: str) -> Dict[str, int]:
+    def analyze_control_flow(self, code: CodeInput) -> Dict[str, int]:
         """
         Analyze control flow constructs
         """
+        ctx = self._context(code)
+        if ctx.python_structure is not None:
+            return dict(ctx.python_structure.control_flow)
+        
         constructs = {
-            'if_statements': len(re.findall(r'\bif\b', code, re.IGNORECASE)),
-            'loops': len(re.findall(r'\b(for|while)\b', code, re.IGNORECASE)),
-            'try_catch': len(re.findall(r'\b(try|catch|except)\b', code, re.IGNORECASE)),
-            'switches': len(re.findall(r'\b(switch|case)\b', code, re.IGNORECASE))
+            'if_statements': ctx.count('if'),
+            'loops': ctx.count('for', 'while'),
+            'try_catch': ctx.count('try', 'catch', 'except'),
+            'switches': ctx.count('switch', 'case')
         }
         
         return constructs
     
-    def extract_patterns(self, code: str, language: str) -> Dict[str, Any]:
+    def extract_patterns(self, code: CodeInput, language: str,
+                         parts: Optional[Iterable[str]] = None) -> Dict[str, Any]:
         """
         Extract common programming patterns
         """
-        patterns = {
-            'design_patterns': self.detect_design_patterns(code),
-            'algorithm_patterns': self.detect_algorithm_patterns(code),
-            'data_structures': self.detect_data_structures(code, language)
-        }
-        
-        return patterns
+        ctx = self._context(code, language)
+        return self._compute_parts(ctx, 'patterns', {
+            'design_patterns': lambda: self.detect_design_patterns(ctx),
+            'algorithm_patterns': lambda: self.detect_algorithm_patterns(ctx),
+            'data_structures': lambda: self.detect_data_structures(ctx, language)
+        }, parts)
     
-    def detect_design_patterns(self, code: str) -> List[str]:
+    def detect_design_patterns(self, code: CodeInput) -> List[str]:
         """
         Detect common design patterns (simplified)
         """
+        lowered = self._context(code).lowered
         patterns = []
         
         # Singleton pattern
-        if re.search(r'class.*Singleton|__new__.*instance', code, re.IGNORECASE):
+        if contains_in_order(lowered, 'class', 'singleton') or contains_in_order(lowered, '__new__', 'instance'):
             patterns.append('Singleton')
         
         # Factory pattern
-        if re.search(r'class.*Factory|def.*create.*\(', code, re.IGNORECASE):
+        if contains_in_order(lowered, 'class', 'factory') or contains_in_order(lowered, 'def', 'create', '('):
             patterns.append('Factory')
         
         # Observer pattern
-        if re.search(r'notify|observer|subscribe', code, re.IGNORECASE):
+        if contains_any(lowered, 'notify', 'observer', 'subscribe'):
             patterns.append('Observer')
         
         return patterns
     
-    def detect_algorithm_patterns(self, code: str) -> List[str]:
+    def detect_algorithm_patterns(self, code: CodeInput) -> List[str]:
         """
         Detect algorithmic patterns more comprehensively
         """
+        ctx = self._context(code)
+        structure = ctx.python_structure
+        code = ctx.code
+        lowered = ctx.lowered
         patterns = []
         
         # Recursion - look for function calling itself
-        function_names = re.findall(r'def\s+(\w+)', code)
-        for func_name in function_names:
-            if re.search(rf'\b{func_name}\s*\(', code):
+        if structure is not None:
+            if structure.recursive_functions:
+                patterns.append('Recursion')
+        else:
+            function_names = set(re.findall(r'def\s+(\w+)', code))
+            if function_names and function_names & set(re.findall(r'\b(\w+)\s*\(', code)):
                 patterns.append('Recursion')
-                break
         
-        # Iteration patterns
-        if re.search(r'\bfor\b.*\brange\b', code):
+        # Iteration patterns: 'for' followed by 'range' on the same line
+        if 'range' in code and any(self._for_before_range(line) for line in ctx.lines if 'range' in line):
             patterns.append('Iteration')
         
         # Mathematical sequences
-        if re.search(r'fibonacci|fib', code, re.IGNORECASE):
+        if 'fib' in lowered:
             patterns.append('Fibonacci')
-        if re.search(r'factorial', code, re.IGNORECASE):
+        if 'factorial' in lowered:
             patterns.append('Factorial')
         
         # Sorting algorithms
         sorting_patterns = [
-            ('bubble.*sort', 'Bubble Sort'),
-            ('quick.*sort', 'Quick Sort'),
-            ('merge.*sort', 'Merge Sort'),
-            ('insertion.*sort', 'Insertion Sort'),
-            ('selection.*sort', 'Selection Sort'),
-            (r'sorted?\(', 'Built-in Sort')
+            ('bubble', 'Bubble Sort'),
+            ('quick', 'Quick Sort'),
+            ('merge', 'Merge Sort'),
+            ('insertion', 'Insertion Sort'),
+            ('selection', 'Selection Sort')
         ]
-        for pattern, name in sorting_patterns:
-            if re.search(pattern, code, re.IGNORECASE):
+        for prefix, name in sorting_patterns:
+            if contains_in_order(lowered, prefix, 'sort'):
                 patterns.append(name)
+        if re.search(r'sorted?\(', lowered):
+            patterns.append('Built-in Sort')
         
         # Search algorithms
-        if re.search(r'binary.*search', code, re.IGNORECASE):
+        if contains_in_order(lowered, 'binary', 'search'):
             patterns.append('Binary Search')
-        if re.search(r'linear.*search', code, re.IGNORECASE):
+        if contains_in_order(lowered, 'linear', 'search'):
             patterns.append('Linear Search')
         
         # Dynamic Programming indicators
-        if re.search(r'memo|dp\[|cache|@lru_cache', code, re.IGNORECASE):
+        if contains_any(lowered, 'memo', 'dp[', 'cache'):
             patterns.append('Dynamic Programming')
         
         # Graph algorithms
-        if re.search(r'dfs|depth.*first', code, re.IGNORECASE):
+        if 'dfs' in lowered or contains_in_order(lowered, 'depth', 'first'):
             patterns.append('Depth-First Search')
-        if re.search(r'bfs|breadth.*first', code, re.IGNORECASE):
+        if 'bfs' in lowered or contains_in_order(lowered, 'breadth', 'first'):
             patterns.append('Breadth-First Search')
         
         return patterns
     
-    def detect_data_structures(self, code: str, language: str) -> List[str]:
+    @staticmethod
+    def _for_before_range(line: str) -> bool:
+        """True if the line has the word 'for' followed later by the word 'range'"""
+        loop = _FOR_WORD.search(line)
+        return loop is not None and _RANGE_WORD.search(line, loop.end()) is not None
+    
+    def detect_data_structures(self, code: CodeInput, language: str) -> List[str]:
         """
         Detect data structure usage more comprehensively
         """
+        ctx = self._context(code, language)
+        code = ctx.code
+        lowered = ctx.lowered
         structures = []
         
+        # Bracket pairs are matched on a single line, like the '.*' regexes they replace
         if language == 'python':
             # Python-specific structures
-            if re.search(r'\[.*\]|list\(|\.append\(|\.pop\(', code):
+            if contains_in_order(code, '[', ']') or contains_any(code, 'list(', '.append(', '.pop('):
                 structures.append('List')
-            if re.search(r'\{.*:.*\}|dict\(|\.keys\(\)|\.values\(\)', code):
+            if contains_in_order(code, '{', ':', '}') or contains_any(code, 'dict(', '.keys()', '.values()'):
                 structures.append('Dictionary')
-            if re.search(r'set\(|\{.*\}.*add\(', code):
+            if 'set(' in code or contains_in_order(code, '{', '}', 'add('):
                 structures.append('Set')
-            if re.search(r'tuple\(|\(.*,.*\)', code):
+            if 'tuple(' in code or contains_in_order(code, '(', ',', ')'):
                 structures.append('Tuple')
-            if re.search(r'deque|collections\.deque', code):
+            if 'deque' in code:
                 structures.append('Deque')
         elif language in ['javascript', 'typescript']:
-            if re.search(r'\[.*\]|Array\(|\.push\(|\.pop\(', code):
+            if contains_in_order(code, '[', ']') or contains_any(code, 'Array(', '.push(', '.pop('):
                 structures.append('Array')
-            if re.search(r'\{.*:.*\}|Object\(|new Map\(', code):
+            if contains_in_order(code, '{', ':', '}') or contains_any(code, 'Object(', 'new Map('):
                 structures.append('Object/Map')
-            if re.search(r'new Set\(', code):
+            if 'new Set(' in code:
                 structures.append('Set')
         elif language == 'java':
-            if re.search(r'ArrayList|List<|Vector', code):
+            if contains_any(code, 'ArrayList', 'List<', 'Vector'):
                 structures.append('ArrayList')
-            if re.search(r'HashMap|Map<', code):
+            if contains_any(code, 'HashMap', 'Map<'):
                 structures.append('HashMap')
-            if re.search(r'HashSet|Set<', code):
+            if contains_any(code, 'HashSet', 'Set<'):
                 structures.append('HashSet')
         
         # Language-agnostic patterns
-        if re.search(r'stack|push.*pop|LIFO', code, re.IGNORECASE):
+        if contains_any(lowered, 'stack', 'lifo') or contains_in_order(lowered, 'push', 'pop'):
             structures.append('Stack')
-        if re.search(r'queue|enqueue|dequeue|FIFO', code, re.IGNORECASE):
+        if contains_any(lowered, 'queue', 'fifo'):
             structures.append('Queue')
-        if re.search(r'tree|node|left.*right|parent.*child', code, re.IGNORECASE):
+        if (contains_any(lowered, 'tree', 'node') or contains_in_order(lowered, 'left', 'right')
+                or contains_in_order(lowered, 'parent', 'child')):
             structures.append('Tree')
-        if re.search(r'graph|vertex|edge|adjacency', code, re.IGNORECASE):
+        if contains_any(lowered, 'graph', 'vertex', 'edge', 'adjacency'):
             structures.append('Graph')
-        if re.search(r'linked.*list|next.*node', code, re.IGNORECASE):
+        if contains_in_order(lowered, 'linked', 'list') or contains_in_order(lowered, 'next', 'node'):
             structures.append('Linked List')
-        if re.search(r'heap|priority.*queue|heapify', code, re.IGNORECASE):
+        if 'heap' in lowered or contains_in_order(lowered, 'priority', 'queue'):
             structures.append('Heap')
         
         return structures
     
-    def normalize_code(self, code: str, language: str) -> str:
+    def normalize_code(self, code: CodeInput, language: str) -> str:
         """
         Normalize code for better comparison
         """
-        # Remove comments
-        normalized = self.remove_comments(code, language)
-        
-        # Normalize whitespace
-        normalized = re.sub(r'\s+', ' ', normalized)
-        
-        # Remove extra blank lines
-        normalized = re.sub(r'\n\s*\n', '\n', normalized)
-        
-        # Normalize variable names (replace with placeholders)
-        normalized = self.normalize_variable_names(normalized, language)
-        
-        return normalized.strip()
+        # Comment removal, whitespace and name normalization come from the
+        # canonical forms SimilarityDetector uses too
+        return self._context(code, language).canonical.abstracted
     
     def remove_comments(self, code: str, language: str) -> str:
         """
         Remove comments from code
         """
-        if language == 'python':
-            # Remove # comments
-            code = re.sub(r'#.*$', '', code, flags=re.MULTILINE)
-        elif language in ['javascript', 'java', 'cpp', 'csharp']:
-            # Remove // comments
-            code = re.sub(r'//.*$', '', code, flags=re.MULTILINE)
-            # Remove /* */ comments
-            code = re.sub(r'/\*.*?\*/', '', code, flags=re.DOTALL)
-        
-        return code
+        return canonicalize(code, language).comment_free
     
     def normalize_variable_names(self, code: str, language: str) -> str:
         """
         Replace variable names with generic placeholders
         """
         # This is a simplified version - in practice, you'd want more sophisticated AST-based normalization
-        
-        if language == 'python':
-            # Replace variable assignments
-            code = re.sub(r'(\w+)\s*=', r'VAR\1 =', code)
-        
-        return code
+        return abstract_identifiers(code, language)
     
     def get_supported_languages(self) -> List[str]:
         """
@@ -604,32 +726,33 @@ class CodeAnalyzer:
         """
         return list(self.supported_languages.keys())
     
-    def analyze_code_quality(self, code: str, language: str) -> Dict[str, Any]:
+    def analyze_code_quality(self, code: CodeInput, language: str,
+                             parts: Optional[Iterable[str]] = None) -> Dict[str, Any]:
         """
         Analyze code quality metrics
         """
-        quality_metrics = {
-            'readability_score': self.calculate_readability_score(code),
-            'maintainability_index': self.calculate_maintainability_index(code),
-            'code_smells': self.detect_code_smells(code, language),
-            'best_practices': self.check_best_practices(code, language)
-        }
-        return quality_metrics
+        ctx = self._context(code, language)
+        return self._compute_parts(ctx, 'code_quality', {
+            'readability_score': lambda: self.calculate_readability_score(ctx),
+            'maintainability_index': lambda: self.calculate_maintainability_index(ctx),
+            'code_smells': lambda: self.detect_code_smells(ctx, language),
+            'best_practices': lambda: self.check_best_practices(ctx, language)
+        }, parts)
     
-    def calculate_readability_score(self, code: str) -> float:
+    def calculate_readability_score(self, code: CodeInput) -> float:
         """
         Calculate a simple readability score based on various factors
         """
-        lines = code.split('\n')
-        non_empty_lines = [line for line in lines if line.strip()]
+        metrics = self._context(code).line_metrics
+        non_empty = metrics.non_empty
         
-        if not non_empty_lines:
+        if not non_empty:
             return 0.0
         
         # Factors for readability
-        avg_line_length = sum(len(line) for line in non_empty_lines) / len(non_empty_lines)
-        comment_ratio = len([line for line in lines if line.strip().startswith('#')]) / len(non_empty_lines)
-        whitespace_ratio = len([line for line in lines if not line.strip()]) / len(lines)
+        avg_line_length = int(metrics.length[~metrics.blank].sum()) / non_empty
+        comment_ratio = int(metrics.starts_with('#').sum()) / non_empty
+        whitespace_ratio = (metrics.count - non_empty) / metrics.count
         
         # Score calculation (0-100)
         score = 100
@@ -647,12 +770,13 @@ class CodeAnalyzer:
         
         return max(0, min(100, score))
     
-    def calculate_maintainability_index(self, code: str) -> float:
+    def calculate_maintainability_index(self, code: CodeInput) -> float:
         """
         Calculate maintainability index (simplified version)
         """
-        lines_of_code = len([line for line in code.split('\n') if line.strip()])
-        complexity = self.calculate_complexity(code, 'python').get('cyclomatic_complexity', 1)
+        ctx = self._context(code)
+        lines_of_code = ctx.line_metrics.non_empty
+        complexity = self.calculate_cyclomatic_complexity(ctx)
         
         if lines_of_code == 0:
             return 0
@@ -661,57 +785,90 @@ class CodeAnalyzer:
         mi = 171 - 5.2 * math.log(lines_of_code) - 0.23 * complexity
         return max(0, min(100, mi))
     
-    def detect_code_smells(self, code: str, language: str) -> List[str]:
+    def detect_code_smells(self, code: CodeInput, language: str) -> List[str]:
         """
         Detect common code smells
         """
+        ctx = self._context(code, language)
+        structure = ctx.python_structure
+        metrics = ctx.line_metrics
+        code = ctx.code
         smells = []
         
-        # Long method (too many lines)
-        if language == 'python':
-            functions = re.findall(r'def\s+\w+.*?(?=def\s+\w+|$)', code, re.DOTALL)
-            for func in functions:
-                func_lines = len([line for line in func.split('\n') if line.strip()])
-                if func_lines > 20:
+        if structure is not None:
+            # Long method and long parameter list from the parsed function definitions
+            non_empty_before = np.concatenate(([0], np.cumsum(~metrics.blank)))
+            for function in structure.functions:
+                # ast also breaks lines on a lone '\r', so clamp to the '\n'-split line count
+                end = min(function['end_lineno'], metrics.count)
+                body_lines = non_empty_before[end] - non_empty_before[min(function['lineno'] - 1, end)]
+                if body_lines > 20:
                     smells.append('Long Method')
                     break
-        
-        # Too many parameters
-        if re.search(r'def\s+\w+\([^)]{50,}\)', code):
-            smells.append('Long Parameter List')
+            if any(function['arg_count'] > 5 for function in structure.functions):
+                smells.append('Long Parameter List')
+        else:
+            # Long method (too many lines)
+            if language == 'python':
+                # Each function runs from its 'def' to the next one
+                starts = [match.start() for match in re.finditer(r'def\s+\w+', code)]
+                for start, end in zip(starts, starts[1:] + [len(code)]):
+                    func_lines = len([line for line in code[start:end].split('\n') if line.strip()])
+                    if func_lines > 20:
+                        smells.append('Long Method')
+                        break
+            
+            # Too many parameters: 50+ characters up to the closing parenthesis
+            close = -1
+            for match in re.finditer(r'def\s+\w+\(', code):
+                if close < match.end():
+                    close = code.find(')', match.end())
+                    if close == -1:
+                        break
+                if close - match.end() >= 50:
+                    smells.append('Long Parameter List')
+                    break
         
         # Duplicate code patterns
-        lines = [line.strip() for line in code.split('\n') if line.strip()]
+        lines = [line for line in ctx.stripped_lines if line]
         if len(set(lines)) < len(lines) * 0.8:
             smells.append('Duplicate Code')
         
         # Deep nesting
-        max_indentation = 0
-        for line in code.split('\n'):
-            if line.strip():
-                indentation = len(line) - len(line.lstrip())
-                max_indentation = max(max_indentation, indentation)
+        indentation = metrics.indentation[~metrics.blank]
+        max_indentation = int(indentation.max()) if len(indentation) else 0
         
         if max_indentation > 16:  # More than 4 levels of nesting
             smells.append('Deep Nesting')
         
         # Magic numbers
-        if re.search(r'\b\d{2,}\b', code) and not re.search(r'range\(', code):
+        if ctx.count('magic_numbers') and not ctx.count('range_calls'):
             smells.append('Magic Numbers')
         
         return smells
     
-    def check_best_practices(self, code: str, language: str) -> Dict[str, bool]:
+    def check_best_practices(self, code: CodeInput, language: str) -> Dict[str, bool]:
         """
         Check adherence to best practices
         """
+        ctx = self._context(code, language)
+        structure = ctx.python_structure
+        code = ctx.code
         practices = {}
         
-        if language == 'python':
+        if structure is not None:
+            names = structure.function_names
+            practices['uses_snake_case'] = bool(names) and all(re.fullmatch(r'[a-z_][a-z0-9_]*', name) for name in names)
+            practices['has_docstrings'] = structure.has_module_docstring or any(
+                item['has_docstring'] for item in structure.functions + structure.classes
+            )
+            practices['proper_imports'] = structure.star_imports == 0
+            practices['no_trailing_whitespace'] = not bool(re.search(r'[ \t](?=\n|\Z)', code))
+        elif language == 'python':
             # PEP 8 style checks
             practices['uses_snake_case'] = bool(re.search(r'def\s+[a-z_]+\(', code))
-            practices['has_docstrings'] = bool(re.search(r'""".*?"""', code, re.DOTALL))
+            practices['has_docstrings'] = code.count('"""') >= 2
             practices['proper_imports'] = not bool(re.search(r'import\s+\*', code))
-            practices['no_trailing_whitespace'] = not bool(re.search(r'\s+$', code, re.MULTILINE))
+            practices['no_trailing_whitespace'] = not bool(re.search(r'\s(?=\n|\Z)', code))
         
         return practices
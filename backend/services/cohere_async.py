@@ -0,0 +1,242 @@
+"""
+Asyncio counterpart of CohereService for bulk work such as job handlers
+and command-line tools: hundreds of Cohere requests can be in flight on one
+thread, bounded by COHERE_ASYNC_CONCURRENCY. Within a process it shares the
+sync service's rate limiter and circuit breaker; the embedding store and
+generation cache are shared on disk.
+
+Usage:
+    async with AsyncCohereService() as service:
+        categories = await service.code_insights_many(codes, 'classification')
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+import numpy as np
+
+from utils.circuit_breaker import CircuitOpenError
+from .cohere_service import (
+    CODE_INSIGHTS, DEFAULT_EMBED_MODEL, DOCUMENT_INPUT_TYPE, EMBED_BATCH_SIZE, RETRY_STATUS_CODES,
+    CohereRequestError, code_insight_params, code_insight_result, cohere_api_key, cohere_setting,
+    generation_cache_key, get_cohere_breaker, get_cohere_rate_limiter, open_embedding_store,
+    open_generation_cache, retry_delay
+)
+
+class AsyncCohereService:
+    """
+    Async Cohere client; its HTTP session lives for an `async with` block.
+    Bulk methods keep at most `concurrency` requests in flight and return
+    results in input order.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None):
+        self.api_key = cohere_api_key()
+        self.api_url = cohere_setting('COHERE_API_URL').rstrip('/')
+        self.concurrency = max(1, int(concurrency or cohere_setting('COHERE_ASYNC_CONCURRENCY')))
+        self.max_retries = int(cohere_setting('COHERE_MAX_RETRIES'))
+        self.request_timeout = float(cohere_setting('COHERE_REQUEST_TIMEOUT'))
+        self.call_deadline = float(cohere_setting('COHERE_CALL_DEADLINE'))
+        self.breaker = get_cohere_breaker()
+        # Same bucket as the sync service in this process. Buckets are per process,
+        # so a job worker's requests are limited separately from the web server's
+        self.rate_limiter = get_cohere_rate_limiter(self.api_url)
+        self.embedding_store = open_embedding_store()
+        self.generation_cache = open_generation_cache()
+        self._session = None
+        self._generations = {}  # cache key -> Task of a generate call in flight
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        """Start the HTTP session; its connection pool is bounded by the concurrency"""
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                headers={'Authorization': f'Bearer {self.api_key}', 'Content-Type': 'application/json'}
+            )
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def is_available(self) -> bool:
+        """Check if Cohere service is available (configured, and its circuit breaker is not open)"""
+        return bool(self.api_key) and not self.breaker.is_open()
+
+    async def gather(self, func: Callable[[Any], Awaitable[Any]], items: Iterable[Any],
+                     on_done: Optional[Callable[[int], None]] = None) -> List[Any]:
+        """
+        [await func(item) for item in items], with at most `concurrency`
+        running at once. Only that many coroutines exist at a time, so
+        memory does not grow with the number of items. on_done is called
+        with the number of finished items after each one.
+        """
+        items = list(items)
+        results = [None] * len(items)
+        pending = iter(enumerate(items))
+        finished = 0
+
+        async def worker():
+            nonlocal finished
+            # Workers share one iterator, so each item is taken exactly once
+            for index, item in pending:
+                results[index] = await func(item)
+                finished += 1
+                if on_done is not None:
+                    on_done(finished)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(self.concurrency, len(items)))]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            raise
+        return results
+
+    async def embed_bulk(self, texts: List[str], model: str = DEFAULT_EMBED_MODEL,
+                         input_type: str = DOCUMENT_INPUT_TYPE) -> np.ndarray:
+        """
+        Embed any number of texts in API-sized batches that run concurrently;
+        rows come back in input order. Raises CohereRequestError if a batch
+        still fails after its retries.
+        """
+        if not texts:
+            return np.empty((0, 0))
+        batches = [texts[i:i + EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+
+        async def embed_batch(batch):
+            body = {'texts': batch, 'model': model, 'input_type': input_type, 'truncate': 'END'}
+            embeddings = (await self._post('embed', body)).get('embeddings')
+            if not isinstance(embeddings, list) or len(embeddings) != len(batch):
+                raise CohereRequestError(f"Embed response has {len(embeddings or [])} embeddings for {len(batch)} texts")
+            return embeddings
+
+        results = await self.gather(embed_batch, batches)
+        return np.array([row for result in results for row in result])
+
+    async def get_embeddings(self, texts: List[str], model: str = DEFAULT_EMBED_MODEL,
+                             input_type: str = DOCUMENT_INPUT_TYPE) -> Optional[np.ndarray]:
+        """Embeddings of texts, or None if embedding failed"""
+        try:
+            return await self.embed_bulk(texts, model, input_type)
+        except Exception as e:
+            print(f"Error getting embeddings: {e}")
+            return None
+
+    async def get_document_embeddings(self, texts: List[str], model: str = DEFAULT_EMBED_MODEL) -> Optional[np.ndarray]:
+        """
+        Embeddings of database documents, served from the embedding store;
+        only texts not stored yet are sent to Cohere (and then stored)
+        """
+        stored = self.embedding_store.get_many(model, DOCUMENT_INPUT_TYPE, texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, stored) if vector is None))
+        if missing:
+            embeddings = await self.get_embeddings(missing, model, DOCUMENT_INPUT_TYPE)
+            if embeddings is None or len(embeddings) != len(missing):
+                return None
+            self.embedding_store.put_many(model, DOCUMENT_INPUT_TYPE, missing, embeddings)
+            stored = self.embedding_store.get_many(model, DOCUMENT_INPUT_TYPE, texts)
+        return np.vstack(stored) if stored else np.empty((0, 0), dtype=np.float32)
+
+    async def generate(self, **params) -> Tuple[str, bool]:
+        """
+        Generated text and whether it came from the generation cache;
+        concurrent calls with the same parameters share one request
+        """
+        key = generation_cache_key(params)
+        if self.generation_cache is not None:
+            try:
+                text = self.generation_cache.get(key)
+                if text is not None:
+                    return text, True
+            except Exception as e:
+                print(f"Error reading generation cache: {e}")
+
+        task = self._generations.get(key)
+        if task is None:
+            task = self._generations[key] = asyncio.ensure_future(self._generate(key, params))
+            task.add_done_callback(lambda _: self._generations.pop(key, None))
+        # shield: one caller being cancelled must not cancel the shared request
+        return await asyncio.shield(task), False
+
+    async def _generate(self, key: str, params: Dict[str, Any]) -> str:
+        response = await self._post('generate', params)
+        generations = response.get('generations') or []
+        text = generations[0].get('text', '') if generations else ''
+        if text and self.generation_cache is not None:
+            try:
+                self.generation_cache.set(key, text)
+            except Exception as e:
+                print(f"Error writing generation cache: {e}")
+        return text
+
+    async def code_insight(self, code: str, insight: str) -> Optional[Dict[str, Any]]:
+        """One CODE_INSIGHTS analysis of code, as returned by the sync service, or None if it failed"""
+        if insight not in CODE_INSIGHTS:
+            raise ValueError(f"Unknown code insight: {insight}")
+        try:
+            text, cached = await self.generate(**code_insight_params(insight, code))
+            return code_insight_result(insight, text, cached)
+        except Exception as e:
+            print(f"Error running {insight} analysis: {e}")
+            return None
+
+    async def code_insights_many(self, codes: List[str], insight: str,
+                                 on_done: Optional[Callable[[int], None]] = None) -> List[Optional[Dict[str, Any]]]:
+        """The same CODE_INSIGHTS analysis of every snippet, in input order"""
+        return await self.gather(lambda code: self.code_insight(code, insight), codes, on_done)
+
+    async def _post(self, endpoint: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        POST to the Cohere API under the rate limiter and circuit breaker,
+        retrying rate-limited (429), server error (5xx) and connection
+        failures with jittered exponential backoff until COHERE_CALL_DEADLINE
+        """
+        if self._session is None:
+            raise RuntimeError('AsyncCohereService must be opened before use (async with)')
+        url = f"{self.api_url}/v1/{endpoint}"
+        deadline = time.monotonic() + self.call_deadline
+        for attempt in range(self.max_retries + 1):
+            if not await self.rate_limiter.acquire_async(timeout=max(0.0, deadline - time.monotonic())):
+                raise CohereRequestError(f"Cohere {endpoint} call exceeded its {self.call_deadline}s deadline")
+            if not self.breaker.allow():
+                raise CircuitOpenError(self.breaker.name, self.breaker.retry_in())
+            retry_after = None
+            started = time.monotonic()
+            timeout = aiohttp.ClientTimeout(total=max(0.1, min(self.request_timeout, deadline - time.monotonic())))
+            try:
+                async with self._session.post(url, json=body, timeout=timeout) as response:
+                    status = response.status
+                    retry_after = response.headers.get('Retry-After')
+                    payload = await response.json(content_type=None) if status < 400 else await response.text()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.breaker.record(time.monotonic() - started, failed=True)
+                error = CohereRequestError(f"Cohere {endpoint} request failed: {e!r}")
+            except BaseException:
+                # Cancelled: the call's outcome is unknown
+                self.breaker.release()
+                raise
+            else:
+                # A 429 is backed off and retried, not counted as an outage
+                self.breaker.record(time.monotonic() - started, failed=status >= 500)
+                if status < 400:
+                    return payload
+                error = CohereRequestError(f"Cohere {endpoint} returned {status}: {payload[:200]}", status)
+                if status not in RETRY_STATUS_CODES:
+                    raise error
+
+            if attempt == self.max_retries:
+                raise error
+            delay = retry_delay(attempt, retry_after)
+            if time.monotonic() + delay >= deadline:
+                raise error
+            await asyncio.sleep(delay)
@@ -1,7 +1,301 @@
-import cohere
+import hashlib
+import json
+import os
+import random
+import time
 import numpy as np
-from typing import List, Dict, Any, Optional
+import requests
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Dict, Any, Optional, Tuple
 from flask import current_app
+from config import BACKEND_DIR
+from utils.embedding_store import EmbeddingStore
+from utils.sqlite_cache import SQLiteCache
+from utils.rate_limiter import get_rate_limiter
+from utils.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from utils.http_pool import get_http_session
+
+DEFAULT_EMBED_MODEL = "embed-english-v3.0"
+# Database snippets and queries are both embedded as documents so the
+# similarity between two snippets does not depend on which one is the query
+DOCUMENT_INPUT_TYPE = "search_document"
+
+# Texts per embed request accepted by the Cohere API
+EMBED_BATCH_SIZE = 96
+# Responses worth retrying after a backoff
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Backoff before retry n is a random delay up to min(cap, base * 2**n) seconds
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_CAP = 30.0
+
+# Bump when a generate prompt template changes so cached generations are not reused
+PROMPT_TEMPLATE_VERSION = '1'
+
+# Settings read from the Flask config, or the environment outside an app context
+DEFAULT_SETTINGS = {
+    'COHERE_API_URL': 'https://api.cohere.ai',
+    'COHERE_EMBED_CONCURRENCY': 4,
+    'COHERE_ASYNC_CONCURRENCY': 64,
+    'COHERE_REQUESTS_PER_MINUTE': 100,
+    'COHERE_RATE_LIMIT_BURST': 4,
+    'COHERE_MAX_RETRIES': 5,
+    'COHERE_REQUEST_TIMEOUT': 10,
+    'COHERE_HTTP_POOL_SIZE': 20,
+    'COHERE_CALL_DEADLINE': 15,
+    'COHERE_BREAKER_WINDOW': 20,
+    'COHERE_BREAKER_MIN_CALLS': 5,
+    'COHERE_BREAKER_FAILURE_RATE': 0.5,
+    'COHERE_BREAKER_SLOW_CALL_SECONDS': 5,
+    'COHERE_BREAKER_SLOW_CALL_RATE': 0.8,
+    'COHERE_BREAKER_OPEN_SECONDS': 30,
+    'COHERE_EMBEDDING_STORE_PATH': os.path.join(BACKEND_DIR, 'model_cache', 'cohere_embeddings.sqlite3'),
+    'COHERE_GENERATION_CACHE_PATH': os.path.join(BACKEND_DIR, 'model_cache', 'cohere_generations.sqlite3'),
+    'COHERE_GENERATION_CACHE_TTL': 7 * 24 * 3600,
+    'COHERE_GENERATION_CACHE_MAX_ENTRIES': 5000
+}
+
+# Independent generate-based analyses of one snippet, by the name used in prefetch_code_insights
+CODE_INSIGHTS = ('intent', 'patterns', 'classification')
+
+class CohereRequestError(Exception):
+    """Raised when a Cohere API request fails for good"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+def is_upstream_failure(error: Exception) -> bool:
+    """
+    Whether an error counts against the service's health: connection
+    problems, timeouts and server errors. Bad requests do not, and neither
+    does rate limiting (429), which the retries' backoff handles.
+    """
+    status = getattr(error, 'status', None) or getattr(error, 'http_status', None)
+    return status is None or status >= 500
+
+def cohere_setting(name: str) -> Any:
+    """Flask config value, or the environment variable outside an app context"""
+    try:
+        return current_app.config.get(name, DEFAULT_SETTINGS[name])
+    except RuntimeError:
+        return os.environ.get(name, DEFAULT_SETTINGS[name])
+
+def cohere_api_key() -> Optional[str]:
+    """API key from the Flask app context, falling back to the environment"""
+    try:
+        return current_app.config.get('COHERE_API_KEY')
+    except RuntimeError:
+        # Working outside of application context, try environment variable
+        return os.environ.get('COHERE_API_KEY') or 'F3dnVKxBTB5V20BhUqP5GFdZHMrS6wGBekVzuCCm'
+
+def retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Jittered exponential backoff before retry `attempt`, honouring a Retry-After header"""
+    delay = random.uniform(0, min(RETRY_BACKOFF_CAP, RETRY_BACKOFF_BASE * 2 ** attempt))
+    if retry_after:
+        try:
+            delay = max(delay, min(RETRY_BACKOFF_CAP, float(retry_after)))
+        except ValueError:
+            pass
+    return delay
+
+def get_cohere_rate_limiter(api_url: str):
+    """
+    Token bucket shared by every Cohere caller in the process. It refills at
+    COHERE_REQUESTS_PER_MINUTE and holds COHERE_RATE_LIMIT_BURST tokens, so
+    that many requests (e.g. concurrent embed batches) can start at once;
+    beyond the burst, requests are spaced by the sustained rate.
+    """
+    return get_rate_limiter(
+        f'cohere:{api_url}',
+        float(cohere_setting('COHERE_REQUESTS_PER_MINUTE')) / 60.0,
+        capacity=max(1.0, float(cohere_setting('COHERE_RATE_LIMIT_BURST')))
+    )
+
+def get_cohere_breaker():
+    """Process-wide circuit breaker shared by every Cohere caller"""
+    return get_circuit_breaker(
+        'cohere',
+        window=int(cohere_setting('COHERE_BREAKER_WINDOW')),
+        min_calls=int(cohere_setting('COHERE_BREAKER_MIN_CALLS')),
+        failure_rate=float(cohere_setting('COHERE_BREAKER_FAILURE_RATE')),
+        slow_call_seconds=float(cohere_setting('COHERE_BREAKER_SLOW_CALL_SECONDS')),
+        slow_call_rate=float(cohere_setting('COHERE_BREAKER_SLOW_CALL_RATE')),
+        open_seconds=float(cohere_setting('COHERE_BREAKER_OPEN_SECONDS'))
+    )
+
+def open_embedding_store() -> EmbeddingStore:
+    """Local store of database embeddings; in memory only when no path is configured"""
+    path = cohere_setting('COHERE_EMBEDDING_STORE_PATH')
+    try:
+        return EmbeddingStore(path)
+    except Exception as e:
+        print(f"Warning: Could not open embedding store at {path}: {e}")
+        return EmbeddingStore()
+
+def open_generation_cache() -> Optional[SQLiteCache]:
+    """Disk cache of generated texts shared by all workers; None when no path is configured"""
+    path = cohere_setting('COHERE_GENERATION_CACHE_PATH')
+    if not path:
+        return None
+    try:
+        return SQLiteCache(
+            path,
+            max_entries=int(cohere_setting('COHERE_GENERATION_CACHE_MAX_ENTRIES')),
+            ttl=float(cohere_setting('COHERE_GENERATION_CACHE_TTL')) or None
+        )
+    except Exception as e:
+        print(f"Warning: Could not open generation cache at {path}: {e}")
+        return None
+
+def generation_cache_key(params: Dict[str, Any]) -> str:
+    """
+    Generation cache key; the prompt embeds the code, so it covers model,
+    template version, code, temperature and max_tokens
+    """
+    return 'generate:' + hashlib.sha256(json.dumps(
+        {'template_version': PROMPT_TEMPLATE_VERSION, **params}, sort_keys=True
+    ).encode('utf-8', 'surrogatepass')).hexdigest()
+
+def code_insight_params(insight: str, code: str) -> Dict[str, Any]:
+    """Generate parameters of one CODE_INSIGHTS analysis of code"""
+    if insight == 'intent':
+        return {
+            'model': "command",  # Use basic command model instead of command-r
+            'prompt': _intent_prompt(code),
+            'max_tokens': 300,
+            'temperature': 0.3
+        }
+    if insight == 'patterns':
+        return {
+            'model': "command",  # Use basic command model
+            'prompt': _patterns_prompt(code),
+            'max_tokens': 400,
+            'temperature': 0.2
+        }
+    if insight == 'classification':
+        # Use generation instead of classification for free tier
+        return {'prompt': _classification_prompt(code), 'max_tokens': 50, 'temperature': 0.1}
+    raise ValueError(f"Unknown code insight: {insight}")
+
+def code_insight_result(insight: str, text: str, cached: bool) -> Optional[Dict[str, Any]]:
+    """Result of a CODE_INSIGHTS analysis from its generated text"""
+    if insight == 'intent':
+        return {"analysis": text.strip(), "model_used": "command-r", "cached": cached}
+    if insight == 'patterns':
+        return {"patterns": text.strip(), "model_used": "command-r", "cached": cached}
+    if not text:
+        return None
+    return {
+        "category": text.strip().lower(),
+        "confidence": 0.8,  # Default confidence for generation-based classification
+        "model_used": "command",
+        "cached": cached
+    }
+
+# The prompts' exact text, indentation included, is part of the generation cache key
+def _intent_prompt(code: str) -> str:
+    return f"""
+            Analyze the following code and provide:
+            1. What the code does (main purpose)
+            2. Key algorithms or patterns used
+            3. Complexity level (beginner/intermediate/advanced)
+            4. Programming concepts demonstrated
+            
+            Code:
+            ```
+            {code}
+            ```
+            
+            Provide a concise analysis:
+            """
+
+def _patterns_prompt(code: str) -> str:
+    return f"""
+            Analyze this code for:
+            1. Design patterns used (if any)
+            2. Code quality issues
+            3. Potential security concerns
+            4. Best practices followed or violated
+            5. Suggestions for improvement
+            
+            Code:
+            ```
+            {code}
+            ```
+            
+            Provide structured feedback:
+            """
+
+def _classification_prompt(code: str) -> str:
+    return f"""
+Analyze this code snippet and classify it into one of these categories:
+- algorithm: Mathematical or computational algorithms
+- data_structure: Classes, data containers, or structures
+- web_framework: Web development code (Flask, Django, etc.)
+- data_analysis: Data processing, analysis, or visualization
+- testing: Unit tests or test code
+- utility: Helper functions or utilities
+- other: Any other type of code
+
+Code to classify:
+```
+{code}
+```
+
+Response should be just the category name (one word):"""
+
+class GenerationScope:
+    """
+    Request-scoped memo of Cohere generate calls: each distinct prompt is
+    sent once, and analyses started with prefetch() run concurrently while
+    the caller waits at most `timeout` seconds for any call's result
+    """
+
+    def __init__(self, timeout: float, max_workers: int = len(CODE_INSIGHTS)):
+        self.timeout = timeout
+        self._calls = {}  # generate parameters -> Future of the response
+        self._prefetched = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cohere-prefetch')
+        # Calls run on their own threads so every caller, the first one
+        # included, stops waiting at the deadline
+        self._call_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cohere-generate')
+
+    def generate(self, call, **params):
+        """
+        Response of call(**params); the first caller with these parameters
+        makes the call, later ones wait for its result
+        """
+        key = tuple(sorted(params.items()))
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = self._calls[key] = self._call_executor.submit(call, **params)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise TimeoutError(f"Cohere generate call did not finish within {self.timeout}s") from None
+
+    def prefetch(self, analysis, code: str):
+        """Start analysis(code, scope) in the background, once per scope"""
+        key = (analysis.__name__, code)
+        with self._lock:
+            if key in self._prefetched:
+                return
+            self._prefetched.add(key)
+        self._executor.submit(analysis, code, self)
+
+    def close(self):
+        """Stop waiting for calls that have not started; running ones finish in the background"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._call_executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
 class CohereService:
     """
@@ -9,54 +303,168 @@ class CohereService:
     """
     
     def __init__(self):
-        self.client = None
-        self._initialize_client()
+        self.api_url = cohere_setting('COHERE_API_URL').rstrip('/')
+        self.embed_concurrency = max(1, int(cohere_setting('COHERE_EMBED_CONCURRENCY')))
+        self.max_retries = int(cohere_setting('COHERE_MAX_RETRIES'))
+        self.request_timeout = float(cohere_setting('COHERE_REQUEST_TIMEOUT'))
+        self.call_deadline = float(cohere_setting('COHERE_CALL_DEADLINE'))
+        self.breaker = get_cohere_breaker()
+        self.rate_limiter = get_cohere_rate_limiter(self.api_url)
+        # Keep-alive connections shared by every CohereService in the process
+        self.session = get_http_session('cohere', max(1, int(cohere_setting('COHERE_HTTP_POOL_SIZE'))))
+        # Requests go straight to the HTTP API; the key is the only client state
+        self.api_key = cohere_api_key()
+        if not self.api_key:
+            print("Warning: Cohere API key not found in configuration; Cohere analysis is disabled")
+        self.embedding_store = open_embedding_store()
+        self.generation_cache = open_generation_cache()
     
-    def _initialize_client(self):
-        """Initialize Cohere client with API key"""
-        try:
-            # Try to get API key from Flask app context first, then fall back to environment
-            try:
-                from flask import current_app
-                api_key = current_app.config.get('COHERE_API_KEY')
-            except RuntimeError:
-                # Working outside of application context, try environment variable
-                import os
-                api_key = os.environ.get('COHERE_API_KEY') or 'F3dnVKxBTB5V20BhUqP5GFdZHMrS6wGBekVzuCCm'
-            
-            if api_key:
-                self.client = cohere.Client(api_key)
-            else:
-                raise ValueError("Cohere API key not found in configuration")
-        except Exception as e:
-            print(f"Warning: Could not initialize Cohere client: {e}")
-            self.client = None
-    
-    def get_embeddings(self, texts: List[str], model: str = "embed-english-v3.0") -> Optional[np.ndarray]:
+    def get_embeddings(self, texts: List[str], model: str = DEFAULT_EMBED_MODEL,
+                       input_type: str = DOCUMENT_INPUT_TYPE) -> Optional[np.ndarray]:
         """
         Get embeddings for text/code using Cohere's embedding models
         
         Args:
             texts: List of text/code snippets to embed
             model: Cohere embedding model to use
+            input_type: Cohere input type the embeddings are made for
         
         Returns:
             Numpy array of embeddings or None if failed
         """
-        if not self.client:
+        if not self.api_key:
             return None
         
         try:
-            response = self.client.embed(
-                texts=texts,
-                model=model,
-                input_type="search_document"
-            )
-            return np.array(response.embeddings)
+            return self.embed_bulk(texts, model, input_type)
         except Exception as e:
             print(f"Error getting embeddings: {e}")
             return None
     
+    def embed_bulk(self, texts: List[str], model: str = DEFAULT_EMBED_MODEL,
+                   input_type: str = DOCUMENT_INPUT_TYPE) -> np.ndarray:
+        """
+        Embed any number of texts: inputs are split into API-sized batches
+        that run concurrently (at most COHERE_EMBED_CONCURRENCY at a time)
+        under the shared rate limiter, and the rows come back in input order.
+        Only COHERE_RATE_LIMIT_BURST batches start at once; after that they
+        start at the COHERE_REQUESTS_PER_MINUTE rate.
+        Raises CohereRequestError if a batch still fails after its retries.
+        """
+        if not texts:
+            return np.empty((0, 0))
+        batches = [texts[i:i + EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+        if len(batches) == 1:
+            return np.array(self._embed_batch(batches[0], model, input_type))
+        
+        with ThreadPoolExecutor(max_workers=min(self.embed_concurrency, len(batches))) as executor:
+            # map keeps batch order, so rows line up with texts
+            results = list(executor.map(lambda batch: self._embed_batch(batch, model, input_type), batches))
+        return np.array([row for result in results for row in result])
+    
+    def _embed_batch(self, texts: List[str], model: str, input_type: str) -> List[List[float]]:
+        body = {'texts': texts, 'model': model, 'input_type': input_type, 'truncate': 'END'}
+        response = self._post('embed', body)
+        embeddings = response.get('embeddings')
+        if not isinstance(embeddings, list) or len(embeddings) != len(texts):
+            raise CohereRequestError(f"Embed response has {len(embeddings or [])} embeddings for {len(texts)} texts")
+        return embeddings
+    
+    def _post(self, endpoint: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        POST to the Cohere API over the shared keep-alive session, under the
+        rate limiter and circuit breaker, retrying rate-limited (429), server
+        error (5xx) and connection failures with jittered exponential backoff
+        until COHERE_CALL_DEADLINE
+        """
+        url = f"{self.api_url}/v1/{endpoint}"
+        headers = {'Authorization': f'Bearer {self.api_key}', 'Content-Type': 'application/json'}
+        deadline = time.monotonic() + self.call_deadline
+        for attempt in range(self.max_retries + 1):
+            if not self.rate_limiter.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                raise CohereRequestError(f"Cohere {endpoint} call exceeded its {self.call_deadline}s deadline")
+            retry_after = None
+            try:
+                response = self._upstream(
+                    self.session.post, url, json=body, headers=headers,
+                    timeout=max(0.1, min(self.request_timeout, deadline - time.monotonic()))
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = CohereRequestError(f"Cohere {endpoint} request failed: {e}")
+            else:
+                if response.status_code < 400:
+                    return response.json()
+                error = CohereRequestError(
+                    f"Cohere {endpoint} returned {response.status_code}: {response.text[:200]}", response.status_code
+                )
+                if response.status_code not in RETRY_STATUS_CODES:
+                    raise error
+                retry_after = response.headers.get('Retry-After')
+            
+            if attempt == self.max_retries:
+                raise error
+            delay = retry_delay(attempt, retry_after)
+            if time.monotonic() + delay >= deadline:
+                raise error
+            time.sleep(delay)
+    
+    def _upstream(self, call, *args, **kwargs):
+        """
+        Make one request to Cohere through the circuit breaker, recording
+        whether it failed and how long it took. Raises CircuitOpenError
+        without calling while the breaker is open.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.breaker.name, self.breaker.retry_in())
+        started = time.monotonic()
+        try:
+            result = call(*args, **kwargs)
+        except Exception as e:
+            self.breaker.record(time.monotonic() - started, failed=is_upstream_failure(e))
+            raise
+        # Raw HTTP responses report errors by status code instead of raising;
+        # a 429 is backed off and retried, not counted as an outage
+        status = getattr(result, 'status_code', None)
+        failed = status is not None and status >= 500
+        self.breaker.record(time.monotonic() - started, failed=failed)
+        return result
+    
+    def get_document_embeddings(self, texts: List[str], model: str = DEFAULT_EMBED_MODEL) -> Optional[np.ndarray]:
+        """
+        Embeddings of database documents, served from the embedding store;
+        only texts not stored yet are sent to Cohere (and then stored)
+        
+        Returns:
+            Matrix with one row per text, or None if embedding failed
+        """
+        stored = self.embedding_store.get_many(model, DOCUMENT_INPUT_TYPE, texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, stored) if vector is None))
+        if missing:
+            embeddings = self.get_embeddings(missing, model, DOCUMENT_INPUT_TYPE)
+            if embeddings is None or len(embeddings) != len(missing):
+                return None
+            self.embedding_store.put_many(model, DOCUMENT_INPUT_TYPE, missing, embeddings)
+            stored = self.embedding_store.get_many(model, DOCUMENT_INPUT_TYPE, texts)
+        return np.vstack(stored) if stored else np.empty((0, 0), dtype=np.float32)
+    
+    def index_documents(self, texts: List[str], model: str = DEFAULT_EMBED_MODEL) -> bool:
+        """
+        Embed and store database documents at ingest so searches only embed
+        the query. Returns False if Cohere is unavailable or the call failed.
+        """
+        if not self.api_key or not texts:
+            return False
+        return self.get_document_embeddings(texts, model) is not None
+    
+    @staticmethod
+    def cosine_similarities(query: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+        """Cosine similarity of one vector with every row of a matrix"""
+        matrix = np.asarray(matrix, dtype=np.float64)
+        query = np.asarray(query, dtype=np.float64)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        scores = matrix @ query
+        return np.divide(scores, norms, out=np.zeros_like(scores), where=norms > 0)
+    
     def calculate_similarity(self, code1: str, code2: str) -> Optional[float]:
         """
         Calculate semantic similarity between two code snippets using Cohere embeddings
@@ -68,156 +476,126 @@ class CohereService:
         Returns:
             Similarity score (0-1) or None if failed
         """
-        if not self.client:
+        if not self.api_key:
             return None
         
         try:
             embeddings = self.get_embeddings([code1, code2])
             if embeddings is not None and len(embeddings) == 2:
                 # Calculate cosine similarity
-                emb1, emb2 = embeddings[0], embeddings[1]
-                similarity = np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2))
+                similarity = self.cosine_similarities(embeddings[0], embeddings[1:])[0]
                 return float(similarity)  # Convert numpy float to Python float
             return None
         except Exception as e:
             print(f"Error calculating similarity: {e}")
             return None
     
-    def analyze_code_intent(self, code: str) -> Optional[Dict[str, Any]]:
+    def generation_scope(self) -> GenerationScope:
+        """New request-scoped memo for generate calls (close it when the request ends)"""
+        return GenerationScope(self.call_deadline)
+    
+    def prefetch_code_insights(self, code: str, scope: GenerationScope, insights=CODE_INSIGHTS):
+        """Start the named CODE_INSIGHTS analyses of code concurrently in the scope"""
+        if not self.is_available():
+            return
+        analyses = {
+            'intent': self.analyze_code_intent,
+            'patterns': self.detect_code_patterns,
+            'classification': self.classify_code_type
+        }
+        for insight in insights:
+            scope.prefetch(analyses[insight], code)
+    
+    def _generate(self, scope: Optional[GenerationScope], **params) -> Tuple[str, bool]:
+        """
+        Generated text and whether it came from the generation cache,
+        memoized in the request scope when there is one
+        """
+        if scope is None:
+            # A scope of its own still bounds the call by the deadline
+            with self.generation_scope() as scope:
+                return scope.generate(self._cached_generate, **params)
+        return scope.generate(self._cached_generate, **params)
+    
+    def _cached_generate(self, **params) -> Tuple[str, bool]:
+        key = generation_cache_key(params)
+        if self.generation_cache is not None:
+            try:
+                text = self.generation_cache.get(key)
+                if text is not None:
+                    return text, True
+            except Exception as e:
+                print(f"Error reading generation cache: {e}")
+        
+        response = self._post('generate', params)
+        generations = response.get('generations') or []
+        text = generations[0].get('text', '') if generations else ''
+        if text and self.generation_cache is not None:
+            try:
+                self.generation_cache.set(key, text)
+            except Exception as e:
+                print(f"Error writing generation cache: {e}")
+        return text, False
+    
+    def analyze_code_intent(self, code: str, scope: Optional[GenerationScope] = None) -> Optional[Dict[str, Any]]:
         """
         Analyze code intent and purpose using Cohere's generation capabilities
         
         Args:
             code: Code snippet to analyze
+            scope: Request-scoped generation memo, if any
         
         Returns:
             Analysis results or None if failed
         """
-        if not self.client:
+        if not self.api_key:
             return None
         
         try:
-            prompt = f"""
-            Analyze the following code and provide:
-            1. What the code does (main purpose)
-            2. Key algorithms or patterns used
-            3. Complexity level (beginner/intermediate/advanced)
-            4. Programming concepts demonstrated
-            
-            Code:
-            ```
-            {code}
-            ```
-            
-            Provide a concise analysis:
-            """
-            
-            response = self.client.generate(
-                model="command",  # Use basic command model instead of command-r
-                prompt=prompt,
-                max_tokens=300,
-                temperature=0.3
-            )
-            
-            return {
-                "analysis": response.generations[0].text.strip(),
-                "model_used": "command-r"
-            }
+            text, cached = self._generate(scope, **code_insight_params('intent', code))
+            return code_insight_result('intent', text, cached)
         except Exception as e:
             print(f"Error analyzing code intent: {e}")
             return None
     
-    def detect_code_patterns(self, code: str) -> Optional[Dict[str, Any]]:
+    def detect_code_patterns(self, code: str, scope: Optional[GenerationScope] = None) -> Optional[Dict[str, Any]]:
         """
         Detect common code patterns and potential issues using Cohere
         
         Args:
             code: Code snippet to analyze
+            scope: Request-scoped generation memo, if any
         
         Returns:
             Pattern detection results or None if failed
         """
-        if not self.client:
+        if not self.api_key:
             return None
         
         try:
-            prompt = f"""
-            Analyze this code for:
-            1. Design patterns used (if any)
-            2. Code quality issues
-            3. Potential security concerns
-            4. Best practices followed or violated
-            5. Suggestions for improvement
-            
-            Code:
-            ```
-            {code}
-            ```
-            
-            Provide structured feedback:
-            """
-            
-            response = self.client.generate(
-                model="command",  # Use basic command model
-                prompt=prompt,
-                max_tokens=400,
-                temperature=0.2
-            )
-            
-            return {
-                "patterns": response.generations[0].text.strip(),
-                "model_used": "command-r"
-            }
+            text, cached = self._generate(scope, **code_insight_params('patterns', code))
+            return code_insight_result('patterns', text, cached)
         except Exception as e:
             print(f"Error detecting patterns: {e}")
             return None
     
-    def classify_code_type(self, code: str) -> Optional[Dict[str, Any]]:
+    def classify_code_type(self, code: str, scope: Optional[GenerationScope] = None) -> Optional[Dict[str, Any]]:
         """
         Classify the type and category of code using Cohere
         
         Args:
             code: Code snippet to classify
+            scope: Request-scoped generation memo, if any
         
         Returns:
             Classification results or None if failed
         """
-        if not self.client:
+        if not self.api_key:
             return None
         
         try:
-            # Use generation instead of classification for free tier
-            prompt = f"""
-Analyze this code snippet and classify it into one of these categories:
-- algorithm: Mathematical or computational algorithms
-- data_structure: Classes, data containers, or structures
-- web_framework: Web development code (Flask, Django, etc.)
-- data_analysis: Data processing, analysis, or visualization
-- testing: Unit tests or test code
-- utility: Helper functions or utilities
-- other: Any other type of code
-
-Code to classify:
-```
-{code}
-```
-
-Response should be just the category name (one word):"""
-            
-            response = self.client.generate(
-                prompt=prompt,
-                max_tokens=50,
-                temperature=0.1
-            )
-            
-            if response.generations and response.generations[0].text:
-                category = response.generations[0].text.strip().lower()
-                return {
-                    "category": category,
-                    "confidence": 0.8,  # Default confidence for generation-based classification
-                    "model_used": "command"
-                }
-            return None
+            text, cached = self._generate(scope, **code_insight_params('classification', code))
+            return code_insight_result('classification', text, cached)
         except Exception as e:
             print(f"Error classifying code: {e}")
             return None
@@ -234,40 +612,40 @@ Response should be just the category name (one word):"""
         Returns:
             List of similar code snippets with similarity scores
         """
-        if not self.client or not code_database:
+        if not self.api_key or not code_database:
             return None
         
         try:
-            # Get embeddings for all code snippets
-            all_texts = [query_code] + code_database
-            embeddings = self.get_embeddings(all_texts)
-            
-            if embeddings is None:
+            # Database embeddings come from the store; only the query is sent to Cohere
+            db_embeddings = self.get_document_embeddings(code_database)
+            if db_embeddings is None:
                 return None
             
-            query_embedding = embeddings[0]
-            db_embeddings = embeddings[1:]
+            query_embedding = self.embedding_store.get_many(DEFAULT_EMBED_MODEL, DOCUMENT_INPUT_TYPE, [query_code])[0]
+            if query_embedding is None:
+                embeddings = self.get_embeddings([query_code])
+                if embeddings is None:
+                    return None
+                query_embedding = embeddings[0]
             
-            # Calculate similarities
-            similarities = []
-            for i, db_embedding in enumerate(db_embeddings):
-                similarity = np.dot(query_embedding, db_embedding) / (
-                    np.linalg.norm(query_embedding) * np.linalg.norm(db_embedding)
-                )
-                similarities.append({
-                    "index": i,
-                    "code": code_database[i],
-                    "similarity": float(similarity)
-                })
+            # Calculate similarities with one matrix-vector product
+            scores = self.cosine_similarities(query_embedding, db_embeddings)
             
             # Sort by similarity and return top k
-            similarities.sort(key=lambda x: x["similarity"], reverse=True)
-            return similarities[:top_k]
+            top = np.argsort(-scores, kind='stable')[:top_k]
+            return [
+                {
+                    "index": int(i),
+                    "code": code_database[i],
+                    "similarity": float(scores[i])
+                }
+                for i in top
+            ]
             
         except Exception as e:
             print(f"Error finding similar code: {e}")
             return None
     
     def is_available(self) -> bool:
-        """Check if Cohere service is available"""
-        return self.client is not None
+        """Check if Cohere service is available (configured, and its circuit breaker is not open)"""
+        return bool(self.api_key) and not self.breaker.is_open()
@@ -0,0 +1,277 @@
+"""
+Cohort-scale plagiarism sweep.
+
+Compares every submission of one assignment against every other without
+scoring all n(n-1)/2 pairs: MinHash signatures over token shingles are
+bucketed with locality-sensitive hashing (LSH) so only plausible candidate
+pairs reach the full SimilarityDetector scoring.
+"""
+import zlib
+import numpy as np
+from collections import defaultdict
+from typing import Callable, Dict, List, Any, Optional, Set, Tuple
+
+# Mersenne prime used by the MinHash permutations
+_MINHASH_PRIME = (1 << 31) - 1
+
+class CohortSweep:
+    """
+    Finds and clusters suspiciously similar submissions within a cohort
+    """
+
+    def __init__(self, similarity_detector, shingle_size: int = 4, bands: int = 40, rows: int = 3,
+                 threshold: float = 0.7, max_shingle_frequency: Optional[float] = None,
+                 max_bucket_size: int = 200, seed: int = 1):
+        """
+        Args:
+            similarity_detector: SimilarityDetector used to score candidate pairs
+            shingle_size: Number of consecutive tokens per shingle
+            bands: Number of LSH bands
+            rows: MinHash values per band; bands * rows is the signature length.
+                  Pairs become candidates around a shingle Jaccard of (1/bands)^(1/rows)
+            threshold: Combined similarity score at which a pair is flagged
+            max_shingle_frequency: Optionally also ignore shingles present in more
+                  than this fraction of submissions. Only meant for near-universal
+                  boilerplate (at least 0.9): a solution copied by most of the class
+                  must not be mistaken for boilerplate. Off by default; pass the
+                  starter code as template_codes instead
+            max_bucket_size: LSH buckets larger than this are split on more of
+                  the signature; members whose whole signatures are identical are
+                  compared directly however many there are
+            seed: Seed for the MinHash permutations
+        """
+        self.similarity_detector = similarity_detector
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self.rows = rows
+        self.threshold = threshold
+        if max_shingle_frequency is not None and not 0.9 <= max_shingle_frequency <= 1.0:
+            raise ValueError('max_shingle_frequency must be between 0.9 and 1.0 (near-universal shingles only)')
+        self.max_shingle_frequency = max_shingle_frequency
+        self.max_bucket_size = max_bucket_size
+
+        rng = np.random.RandomState(seed)
+        num_perm = bands * rows
+        self._perm_a = rng.randint(1, _MINHASH_PRIME, size=num_perm).astype(np.uint64)
+        self._perm_b = rng.randint(0, _MINHASH_PRIME, size=num_perm).astype(np.uint64)
+
+    def shingles(self, tokens: List[str]) -> Set[int]:
+        """
+        Hash every run of ``shingle_size`` consecutive tokens
+        """
+        if not tokens:
+            return set()
+        size = min(self.shingle_size, len(tokens))
+        return {
+            zlib.crc32(' '.join(tokens[i:i + size]).encode('utf-8'))
+            for i in range(len(tokens) - size + 1)
+        }
+
+    def signature(self, shingles: Set[int]) -> Optional[np.ndarray]:
+        """
+        MinHash signature of a shingle set, or None for an empty set
+        """
+        if not shingles:
+            return None
+        values = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        hashed = (np.outer(self._perm_a, values) + self._perm_b[:, None]) % _MINHASH_PRIME
+        return hashed.min(axis=1)
+
+    def candidate_pairs(self, signatures: List[Optional[np.ndarray]],
+                        report: Optional[Dict[str, int]] = None) -> Set[Tuple[int, int]]:
+        """
+        Pairs of submissions that share at least one LSH band. Oversized
+        buckets are counted in report (if given) under 'oversized_buckets',
+        and groups of identical signatures still larger than max_bucket_size
+        under 'direct_comparison_groups'.
+        """
+        if report is None:
+            report = {}
+        report.setdefault('oversized_buckets', 0)
+        report.setdefault('direct_comparison_groups', 0)
+        length = self.bands * self.rows
+        candidates = set()
+        for band in range(self.bands):
+            start = band * self.rows
+            buckets = defaultdict(list)
+            for index, signature in enumerate(signatures):
+                if signature is not None:
+                    buckets[signature[start:start + self.rows].tobytes()].append(index)
+
+            for members in buckets.values():
+                if len(members) > self.max_bucket_size:
+                    report['oversized_buckets'] += 1
+                    self._split_bucket(members, signatures, start, 2 * self.rows, length, candidates, report)
+                else:
+                    self._add_all_pairs(members, candidates)
+
+        return candidates
+
+    def _split_bucket(self, members: List[int], signatures: List[Optional[np.ndarray]], start: int,
+                      key_length: int, length: int, candidates: Set[Tuple[int, int]], report: Dict[str, int]):
+        """
+        Re-bucket an oversized bucket on a longer stretch of the signature
+        (wrapping around from the band's start), until the buckets are small
+        enough or the key covers the whole signature
+        """
+        if key_length >= length:
+            # Identical signatures: near-duplicates, so every pair is compared
+            if len(members) > self.max_bucket_size:
+                report['direct_comparison_groups'] += 1
+            self._add_all_pairs(members, candidates)
+            return
+        positions = [(start + offset) % length for offset in range(key_length)]
+        buckets = defaultdict(list)
+        for index in members:
+            buckets[signatures[index][positions].tobytes()].append(index)
+        for sub_members in buckets.values():
+            if len(sub_members) > self.max_bucket_size:
+                self._split_bucket(sub_members, signatures, start, key_length + self.rows, length, candidates, report)
+            else:
+                self._add_all_pairs(sub_members, candidates)
+
+    @staticmethod
+    def _add_all_pairs(members: List[int], candidates: Set[Tuple[int, int]]):
+        for a in range(len(members)):
+            for b in range(a + 1, len(members)):
+                candidates.add((members[a], members[b]))
+
+    def run(self, submissions: List[Dict[str, Any]], language: str = 'auto',
+            template_codes: Optional[List[str]] = None, workers: Optional[int] = None,
+            on_progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, Any]:
+        """
+        Sweep a cohort of submissions for plagiarism.
+
+        Args:
+            submissions: List of dicts with ``code`` and an optional ``id``
+            language: Programming language of the submissions
+            template_codes: Starter code handed out with the assignment; its
+                  shingles are ignored when picking candidate pairs
+            workers: Worker processes used to score candidate pairs
+            on_progress: Called as on_progress(fraction, message) while
+                  signatures are built and candidate pairs scored; an exception
+                  it raises (e.g. a cancelled job) stops the sweep
+
+        Returns:
+            Flagged pairs, clusters of connected flagged submissions and statistics
+        """
+        def report(fraction, message):
+            if on_progress is not None:
+                on_progress(fraction, message)
+
+        ids = [submission.get('id', index) for index, submission in enumerate(submissions)]
+        codes = [submission['code'] for submission in submissions]
+        prepared = self.similarity_detector.prepare_snippets(codes, language)
+        report(0.1, f'tokenized {len(codes)} submissions')
+
+        shingle_sets = [self.shingles(item['tokens']) for item in prepared]
+        template, common = self._ignored_shingles(shingle_sets, template_codes or [], language)
+        signatures = []
+        for shingles in shingle_sets:
+            own = shingles - template
+            # Common shingles are dropped only while something else is left, so a
+            # submission made entirely of widely shared code (e.g. the copy most
+            # of the class handed in) is still bucketed with its copies
+            signatures.append(self.signature((own - common) or own))
+            if len(signatures) % 100 == 0:
+                report(0.1 + 0.2 * len(signatures) / len(shingle_sets),
+                       f'signed {len(signatures)} of {len(shingle_sets)} submissions')
+
+        bucket_report = {}
+        candidates = sorted(self.candidate_pairs(signatures, bucket_report))
+        if bucket_report['oversized_buckets']:
+            print(f"Cohort sweep: split {bucket_report['oversized_buckets']} LSH buckets larger than "
+                  f"{self.max_bucket_size}; {bucket_report['direct_comparison_groups']} groups of "
+                  f"identical signatures were compared pair by pair")
+        report(0.3, f'scoring {len(candidates)} candidate pairs')
+
+        flagged = []
+        for scored, row in enumerate(self.similarity_detector.iter_pairwise_similarities(
+            codes, language, pairs=candidates, workers=workers,
+            include_breakdown=True, prepared=prepared
+        ), start=1):
+            if scored % 500 == 0:
+                report(0.3 + 0.7 * scored / len(candidates), f'scored {scored} of {len(candidates)} candidate pairs')
+            if row['similarity_score'] >= self.threshold:
+                row['code1_id'] = ids[row['code1_index']]
+                row['code2_id'] = ids[row['code2_index']]
+                flagged.append(row)
+
+        flagged.sort(key=lambda x: x['similarity_score'], reverse=True)
+        total_pairs = len(codes) * (len(codes) - 1) // 2
+
+        return {
+            'flagged_pairs': flagged,
+            'clusters': self.cluster(flagged, ids),
+            'statistics': {
+                'total_submissions': len(codes),
+                'total_pairs': total_pairs,
+                'candidate_pairs': len(candidates),
+                'flagged_pairs': len(flagged),
+                'pruned_ratio': 1.0 - len(candidates) / total_pairs if total_pairs else 0.0,
+                # LSH buckets over max_bucket_size, split rather than skipped
+                'oversized_buckets': bucket_report['oversized_buckets'],
+                'direct_comparison_groups': bucket_report['direct_comparison_groups'],
+                'threshold': self.threshold
+            }
+        }
+
+    def cluster(self, flagged: List[Dict[str, Any]], ids: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Group flagged pairs into connected components
+        """
+        parent = {}
+
+        def find(index):
+            parent.setdefault(index, index)
+            while parent[index] != index:
+                parent[index] = parent[parent[index]]
+                index = parent[index]
+            return index
+
+        for row in flagged:
+            root1, root2 = find(row['code1_index']), find(row['code2_index'])
+            if root1 != root2:
+                parent[root2] = root1
+
+        components = defaultdict(lambda: {'members': set(), 'pairs': 0, 'max_similarity': 0.0})
+        for row in flagged:
+            component = components[find(row['code1_index'])]
+            component['members'].update((row['code1_index'], row['code2_index']))
+            component['pairs'] += 1
+            component['max_similarity'] = max(component['max_similarity'], row['similarity_score'])
+
+        clusters = []
+        for component in components.values():
+            members = sorted(component['members'])
+            clusters.append({
+                'members': [ids[index] for index in members],
+                'member_indices': members,
+                'size': len(members),
+                'flagged_pairs': component['pairs'],
+                'max_similarity': component['max_similarity']
+            })
+
+        clusters.sort(key=lambda x: (x['size'], x['max_similarity']), reverse=True)
+        return clusters
+
+    def _ignored_shingles(self, shingle_sets: List[Set[int]], template_codes: List[str],
+                          language: str) -> Tuple[Set[int], Set[int]]:
+        """
+        Shingles from the starter code, and the near-universal ones when
+        max_shingle_frequency is set
+        """
+        template = set()
+        for item in self.similarity_detector.prepare_snippets(template_codes, language):
+            template |= self.shingles(item['tokens'])
+
+        common = set()
+        if self.max_shingle_frequency is not None and len(shingle_sets) >= 4:
+            frequency = defaultdict(int)
+            for shingles in shingle_sets:
+                for shingle in shingles:
+                    frequency[shingle] += 1
+            limit = self.max_shingle_frequency * len(shingle_sets)
+            common = {shingle for shingle, count in frequency.items() if count > limit} - template
+
+        return template, common
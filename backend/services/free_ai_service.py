@@ -11,6 +11,7 @@ from transformers import pipeline, AutoTokenizer, AutoModel
 import time
 import numpy as np
 from utils.json_utils import convert_numpy_types
+from utils.line_metrics import LineMetrics
 
 class FreeAIService:
     """
@@ -69,8 +70,11 @@ class FreeAIService:
         """Local code analysis using transformer models"""
         analysis = {}
         
+        # Per-line arrays shared by the complexity and readability scores
+        metrics = LineMetrics(code)
+        
         # Calculate complexity score based on code structure
-        complexity_score = self._calculate_complexity(code)
+        complexity_score = self._calculate_complexity(code, metrics)
         analysis['complexity_score'] = complexity_score
         
         if complexity_score < 0.3:
@@ -81,7 +85,7 @@ class FreeAIService:
             analysis['complexity'] = 'high'
         
         # Calculate readability score
-        readability_score = self._calculate_readability(code)
+        readability_score = self._calculate_readability(code, metrics)
         analysis['readability_score'] = readability_score
         
         if readability_score > 0.7:
@@ -100,61 +104,52 @@ class FreeAIService:
         # Convert any numpy types to Python native types
         return convert_numpy_types(analysis)
     
-    def _calculate_complexity(self, code: str) -> float:
+    def _calculate_complexity(self, code: str, metrics: Optional[LineMetrics] = None) -> float:
         """Calculate code complexity score"""
-        lines = code.split('\n')
-        non_empty_lines = [line for line in lines if line.strip()]
+        metrics = metrics or LineMetrics(code)
+        non_empty = ~metrics.blank
+        total_lines = int(non_empty.sum())
         
-        if not non_empty_lines:
+        if not total_lines:
             return 0.0
         
-        # Count complexity indicators
-        complexity_indicators = 0
-        total_lines = len(non_empty_lines)
-        
-        for line in non_empty_lines:
-            line = line.strip()
-            # Count control structures
-            if any(keyword in line for keyword in ['if', 'for', 'while', 'try', 'except', 'elif']):
-                complexity_indicators += 1
-            # Count nested structures
-            if line.count('    ') > 2:  # More than 2 levels of indentation
-                complexity_indicators += 0.5
+        # Count control structures
+        control_lines = non_empty & metrics.contains('if', 'for', 'while', 'try', 'except')
+        # Count nested structures: more than 2 levels of indentation inside the line
+        nested_lines = non_empty & (metrics.space_groups(4) > 2)
+        complexity_indicators = int(control_lines.sum()) + 0.5 * int(nested_lines.sum())
         
         return min(complexity_indicators / total_lines, 1.0)
     
-    def _calculate_readability(self, code: str) -> float:
+    def _calculate_readability(self, code: str, metrics: Optional[LineMetrics] = None) -> float:
         """Calculate code readability score"""
-        lines = code.split('\n')
-        non_empty_lines = [line for line in lines if line.strip()]
+        metrics = metrics or LineMetrics(code)
+        non_empty = ~metrics.blank
+        total_lines = int(non_empty.sum())
         
-        if not non_empty_lines:
+        if not total_lines:
             return 0.0
         
         readability_score = 1.0
         
         # Check average line length
-        avg_line_length = sum(len(line) for line in non_empty_lines) / len(non_empty_lines)
+        avg_line_length = int(metrics.length[non_empty].sum()) / total_lines
         if avg_line_length > 120:
             readability_score -= 0.2
         elif avg_line_length > 80:
             readability_score -= 0.1
         
         # Check for comments
-        comment_lines = sum(1 for line in non_empty_lines if line.strip().startswith('#'))
-        comment_ratio = comment_lines / len(non_empty_lines)
+        comment_lines = metrics.starts_with('#')
+        comment_ratio = int(comment_lines.sum()) / total_lines
         if comment_ratio < 0.1:
             readability_score -= 0.2
         
-        # Check for meaningful variable names
-        meaningful_names = 0
-        total_vars = 0
-        for line in non_empty_lines:
-            if '=' in line and not line.strip().startswith('#'):
-                parts = line.split('=')[0].strip()
-                if parts and len(parts.split()[-1]) > 2:  # Variable name longer than 2 chars
-                    meaningful_names += 1
-                total_vars += 1
+        # Check for meaningful variable names (longer than 2 chars) in assignments
+        name_lengths = metrics.assignment_name_lengths()[~comment_lines]
+        assigned = name_lengths >= 0
+        total_vars = int(assigned.sum())
+        meaningful_names = int((name_lengths > 2).sum())
         
         if total_vars > 0:
             name_ratio = meaningful_names / total_vars
@@ -13,7 +13,30 @@ from sentence_transformers import SentenceTransformer
 import numpy as np
 from typing import Dict, List, Any, Optional
 import logging
+import threading
 from flask import current_app
+from config import BACKEND_DIR
+from utils.embedding_store import content_hash
+from .model_registry import ModelRegistry
+from .semantic_index import SemanticIndex, index_path
+
+# Default padded tokens (batch size x longest sequence) per embedding forward pass
+DEFAULT_EMBED_BATCH_TOKENS = 8192
+MAX_SEQUENCE_LENGTH = 512
+# Default memory budget for loaded models, in MiB
+DEFAULT_MODEL_MEMORY_MB = 2048
+SEMANTIC_SEARCH_MODEL = 'sentence-transformers/all-mpnet-base-v2'
+# Corpus embeddings semantic_code_search keeps between calls
+SEARCH_CORPUS_CACHE_MAX_ENTRIES = 50000
+# Registry names of the pipelines (code models are registered under their model name)
+PIPELINE_NAMES = ('code_generation', 'classification')
+
+def _setting(name: str, default: Any) -> Any:
+    """Flask config value, or the environment variable outside an app context"""
+    try:
+        return current_app.config.get(name, default)
+    except RuntimeError:
+        return os.environ.get(name, default)
 
 class HuggingFaceService:
     """
@@ -22,9 +45,19 @@ class HuggingFaceService:
     
     def __init__(self):
         self.token = None
-        self.models = {}
-        self.tokenizers = {}
-        self.pipelines = {}
+        # Models, tokenizers and pipelines share one memory budget; the least
+        # recently used are evicted past it and reloaded on demand
+        pinned = _setting('HF_PINNED_MODELS', '')
+        # Named semantic search indexes, loaded from HF_SEMANTIC_INDEX_DIR on first use
+        self.indexes = {}
+        self._indexes_lock = threading.Lock()
+        # Embeddings of code_database entries seen by semantic_code_search, by content hash
+        self._search_corpus = SemanticIndex('search_corpus', SEMANTIC_SEARCH_MODEL)
+        self._search_corpus_lock = threading.Lock()
+        self.registry = ModelRegistry(
+            int(float(_setting('HF_MODEL_MEMORY_MB', DEFAULT_MODEL_MEMORY_MB)) * 2 ** 20),
+            pinned=[name.strip() for name in pinned.split(',') if name.strip()] if isinstance(pinned, str) else pinned
+        )
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
         self.logger = logging.getLogger(__name__)
         
@@ -36,97 +69,157 @@ class HuggingFaceService:
         
     def load_code_model(self, model_name: str = "microsoft/GraphCodeBERT-base"):
         """Load a code understanding model"""
+        return self._code_model(model_name) is not None
+    
+    def _code_model(self, model_name: str):
+        """(tokenizer, model) of a code model from the registry, or None if it could not be loaded"""
+        def load():
+            self.logger.info(f"Loading code model: {model_name}")
+            tokenizer = AutoTokenizer.from_pretrained(
+                model_name, 
+                use_auth_token=self.token
+            )
+            model = AutoModel.from_pretrained(
+                model_name, 
+                use_auth_token=self.token
+            ).to(self.device)
+            return tokenizer, model
+        
         try:
-            if model_name not in self.models:
-                self.logger.info(f"Loading code model: {model_name}")
-                self.tokenizers[model_name] = AutoTokenizer.from_pretrained(
-                    model_name, 
-                    use_auth_token=self.token
-                )
-                self.models[model_name] = AutoModel.from_pretrained(
-                    model_name, 
-                    use_auth_token=self.token
-                ).to(self.device)
-                
-            return True
+            return self.registry.get(model_name, load)
         except Exception as e:
             self.logger.error(f"Failed to load model {model_name}: {str(e)}")
-            return False
+            return None
     
     def get_code_embeddings(self, code: str, model_name: str = "microsoft/GraphCodeBERT-base"):
-        """Get embeddings for code using advanced models"""
+        """Get embeddings for code using advanced models (a 1 x dim array)"""
+        return self.get_code_embeddings_many([code], model_name)
+    
+    def get_code_embeddings_many(self, codes: List[str], model_name: str = "microsoft/GraphCodeBERT-base",
+                                 normalize: bool = False, batch_tokens: Optional[int] = None) -> Optional[np.ndarray]:
+        """
+        Embeddings of many snippets, one row per snippet in input order.
+        Snippets are sorted by length and grouped so that each forward pass
+        pads at most batch_tokens tokens (HF_EMBED_BATCH_TOKENS by default);
+        token states are mean-pooled over the attention mask so padding does
+        not dilute them. normalize returns unit-length rows.
+        """
         try:
-            if not self.load_code_model(model_name):
+            loaded = self._code_model(model_name)
+            if loaded is None:
                 return None
-                
-            tokenizer = self.tokenizers[model_name]
-            model = self.models[model_name]
+            if not codes:
+                return np.empty((0, 0), dtype=np.float32)
             
-            # Tokenize and encode
-            inputs = tokenizer(
-                code, 
-                return_tensors="pt", 
-                max_length=512, 
-                truncation=True, 
-                padding=True
-            ).to(self.device)
+            # Hold the pair for the whole call, even if the registry evicts it meanwhile
+            tokenizer, model = loaded
+            batch_tokens = batch_tokens or max(
+                MAX_SEQUENCE_LENGTH, int(_setting('HF_EMBED_BATCH_TOKENS', DEFAULT_EMBED_BATCH_TOKENS))
+            )
+            
+            # Tokenize once without padding; batches are padded only to their own longest snippet
+            encoded = tokenizer(list(codes), max_length=MAX_SEQUENCE_LENGTH, truncation=True)['input_ids']
+            order = sorted(range(len(codes)), key=lambda i: len(encoded[i]))
+            
+            batches = []
+            batch = []
+            for index in order:
+                # Sorted ascending, so this snippet is the longest in the batch
+                if batch and (len(batch) + 1) * len(encoded[index]) > batch_tokens:
+                    batches.append(batch)
+                    batch = []
+                batch.append(index)
+            batches.append(batch)
             
-            with torch.no_grad():
-                outputs = model(**inputs)
-                embeddings = outputs.last_hidden_state.mean(dim=1).cpu().numpy()
-                
-            return embeddings
+            embeddings = [None] * len(codes)
+            with torch.inference_mode():
+                for batch in batches:
+                    inputs = tokenizer.pad(
+                        {'input_ids': [encoded[i] for i in batch]}, return_tensors="pt"
+                    ).to(self.device)
+                    hidden = model(**inputs).last_hidden_state
+                    mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                    pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+                    if normalize:
+                        pooled = torch.nn.functional.normalize(pooled, dim=1)
+                    for index, row in zip(batch, pooled.float().cpu().numpy()):
+                        embeddings[index] = row
+            
+            return np.vstack(embeddings)
             
         except Exception as e:
             self.logger.error(f"Failed to get embeddings: {str(e)}")
             return None
     
     def calculate_advanced_similarity(self, code1: str, code2: str):
-        """Calculate similarity using GraphCodeBERT"""
+        """Calculate similarity using GraphCodeBERT (both snippets in one forward pass)"""
         try:
-            embeddings1 = self.get_code_embeddings(code1)
-            embeddings2 = self.get_code_embeddings(code2)
-            
-            if embeddings1 is None or embeddings2 is None:
+            embeddings = self.get_code_embeddings_many([code1, code2], normalize=True)
+            if embeddings is None:
                 return None
             
-            # Calculate cosine similarity
-            similarity = np.dot(embeddings1[0], embeddings2[0]) / (
-                np.linalg.norm(embeddings1[0]) * np.linalg.norm(embeddings2[0])
-            )
-            
-            return float(similarity)
+            # Rows are unit length, so the dot product is the cosine similarity
+            return float(np.dot(embeddings[0], embeddings[1]))
             
         except Exception as e:
             self.logger.error(f"Failed to calculate similarity: {str(e)}")
             return None
     
+    def calculate_similarities(self, query_code: str, codes: List[str]) -> Optional[List[float]]:
+        """GraphCodeBERT cosine similarity of one snippet with each of many, in input order"""
+        try:
+            embeddings = self.get_code_embeddings_many([query_code] + list(codes), normalize=True)
+            if embeddings is None:
+                return None
+            return [float(score) for score in embeddings[1:] @ embeddings[0]]
+            
+        except Exception as e:
+            self.logger.error(f"Failed to calculate similarities: {str(e)}")
+            return None
+    
+    def calculate_pairwise_similarities(self, codes: List[str]) -> Optional[np.ndarray]:
+        """Matrix of GraphCodeBERT cosine similarities between every pair of snippets"""
+        try:
+            embeddings = self.get_code_embeddings_many(codes, normalize=True)
+            if embeddings is None:
+                return None
+            return embeddings @ embeddings.T
+            
+        except Exception as e:
+            self.logger.error(f"Failed to calculate pairwise similarities: {str(e)}")
+            return None
+    
     def load_code_generation_pipeline(self):
         """Load code generation pipeline"""
+        return self._code_generation_pipeline() is not None
+    
+    def _code_generation_pipeline(self):
+        def load():
+            self.logger.info("Loading code generation pipeline...")
+            return pipeline(
+                "text-generation",
+                model="Salesforce/codegen-350M-mono",
+                tokenizer="Salesforce/codegen-350M-mono",
+                device=0 if self.device == 'cuda' else -1,
+                use_auth_token=self.token
+            )
+        
         try:
-            if 'code_generation' not in self.pipelines:
-                self.logger.info("Loading code generation pipeline...")
-                self.pipelines['code_generation'] = pipeline(
-                    "text-generation",
-                    model="Salesforce/codegen-350M-mono",
-                    tokenizer="Salesforce/codegen-350M-mono",
-                    device=0 if self.device == 'cuda' else -1,
-                    use_auth_token=self.token
-                )
-            return True
+            return self.registry.get('code_generation', load)
         except Exception as e:
             self.logger.error(f"Failed to load generation pipeline: {str(e)}")
-            return False
+            return None
     
     def generate_code_explanation(self, code: str, max_length: int = 150):
         """Generate code explanation using free models"""
         try:
-            if not self.load_code_generation_pipeline():
+            generator = self._code_generation_pipeline()
+            if generator is None:
                 return "Code generation model not available"
             
             prompt = f"# Explain this code:\n{code}\n# Explanation:"
             
-            result = self.pipelines['code_generation'](
+            result = generator(
                 prompt,
                 max_length=max_length,
                 num_return_sequences=1,
@@ -144,27 +237,32 @@ class HuggingFaceService:
     
     def load_classification_pipeline(self):
         """Load code classification pipeline"""
+        return self._classification_pipeline() is not None
+    
+    def _classification_pipeline(self):
+        def load():
+            self.logger.info("Loading classification pipeline...")
+            return pipeline(
+                "text-classification",
+                model="huggingface/CodeBERTa-small-v1",
+                use_auth_token=self.token,
+                device=0 if self.device == 'cuda' else -1
+            )
+        
         try:
-            if 'classification' not in self.pipelines:
-                self.logger.info("Loading classification pipeline...")
-                self.pipelines['classification'] = pipeline(
-                    "text-classification",
-                    model="huggingface/CodeBERTa-small-v1",
-                    use_auth_token=self.token,
-                    device=0 if self.device == 'cuda' else -1
-                )
-            return True
+            return self.registry.get('classification', load)
         except Exception as e:
             self.logger.error(f"Failed to load classification pipeline: {str(e)}")
-            return False
+            return None
     
     def classify_code_intent(self, code: str):
         """Classify code intent/purpose"""
         try:
-            if not self.load_classification_pipeline():
+            classifier = self._classification_pipeline()
+            if classifier is None:
                 return {"intent": "unknown", "confidence": 0.0}
             
-            result = self.pipelines['classification'](code)
+            result = classifier(code)
             
             return {
                 "intent": result[0]['label'],
@@ -178,35 +276,76 @@ class HuggingFaceService:
     
     def load_semantic_search_model(self):
         """Load semantic search model"""
+        return self._semantic_search_model() is not None
+    
+    def _semantic_search_model(self):
+        def load():
+            self.logger.info("Loading semantic search model...")
+            return SentenceTransformer(
+                SEMANTIC_SEARCH_MODEL,
+                use_auth_token=self.token
+            )
+        
         try:
-            if 'semantic_search' not in self.models:
-                self.logger.info("Loading semantic search model...")
-                self.models['semantic_search'] = SentenceTransformer(
-                    'sentence-transformers/all-mpnet-base-v2',
-                    use_auth_token=self.token
-                )
-            return True
+            return self.registry.get('semantic_search', load)
         except Exception as e:
             self.logger.error(f"Failed to load semantic search model: {str(e)}")
-            return False
+            return None
+    
+    def _encode_for_search(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Unit-length semantic search embeddings of texts, or None if the model is unavailable"""
+        model = self._semantic_search_model()
+        if model is None:
+            return None
+        return model.encode(list(texts), convert_to_numpy=True, normalize_embeddings=True)
     
     def semantic_code_search(self, query_code: str, code_database: List[str], top_k: int = 5):
-        """Perform semantic search across code database"""
+        """
+        Perform semantic search across code database. Database entries are
+        encoded once and remembered, so repeated searches of the same corpus
+        only encode the query; use a named index for large reference corpora.
+        """
         try:
-            if not self.load_semantic_search_model():
+            if not code_database:
                 return []
             
-            model = self.models['semantic_search']
+            hashes = [content_hash(code) for code in code_database]
+            codes_by_hash = dict(zip(hashes, code_database))
+            missing = [h for h in codes_by_hash if h not in self._search_corpus]
+            encoded = {}
+            if missing:
+                embeddings = self._encode_for_search([codes_by_hash[h] for h in missing])
+                if embeddings is None:
+                    return []
+                encoded = dict(zip(missing, embeddings))
             
-            # Encode query and database
-            query_embedding = model.encode([query_code])
-            db_embeddings = model.encode(code_database)
+            # Encoding runs unlocked; pruning, adding and reading back happen under
+            # one lock so a concurrent search cannot evict this corpus in between
+            with self._search_corpus_lock:
+                missing = [h for h in codes_by_hash if h not in self._search_corpus]
+                if missing:
+                    evicted = [h for h in missing if h not in encoded]
+                    if evicted:
+                        # Evicted by another search since the check above
+                        embeddings = self._encode_for_search([codes_by_hash[h] for h in evicted])
+                        if embeddings is None:
+                            return []
+                        encoded.update(zip(evicted, embeddings))
+                    if len(self._search_corpus) + len(missing) > SEARCH_CORPUS_CACHE_MAX_ENTRIES:
+                        current = set(hashes)
+                        self._search_corpus.remove([h for h in self._search_corpus.ids if h not in current])
+                    self._search_corpus.add(missing, np.array([encoded[h] for h in missing]))
+                db_embeddings = self._search_corpus.vectors(hashes)
+            
+            query_embedding = self._encode_for_search([query_code])
+            if query_embedding is None or db_embeddings is None:
+                return []
             
-            # Calculate similarities
-            similarities = model.similarity(query_embedding, db_embeddings)[0]
+            # Unit-length rows, so dot products are cosine similarities
+            similarities = db_embeddings @ query_embedding[0]
             
             # Get top results
-            top_indices = torch.topk(similarities, min(top_k, len(code_database))).indices
+            top_indices = np.argsort(-similarities, kind='stable')[:min(top_k, len(code_database))]
             
             results = []
             for idx in top_indices:
@@ -222,6 +361,88 @@ class HuggingFaceService:
             self.logger.error(f"Failed to perform semantic search: {str(e)}")
             return []
     
+    def get_semantic_index(self, name: str) -> SemanticIndex:
+        """
+        Named semantic search index: the one in memory, else the one saved in
+        HF_SEMANTIC_INDEX_DIR, else a new empty index
+        """
+        with self._indexes_lock:
+            index = self.indexes.get(name)
+            if index is None:
+                path = index_path(self._index_dir(), name)
+                if os.path.exists(path):
+                    index = SemanticIndex.load(path)
+                    if index.model != SEMANTIC_SEARCH_MODEL:
+                        raise ValueError(f"Index {name} was built with {index.model}, not {SEMANTIC_SEARCH_MODEL}")
+                    self.logger.info(f"Loaded semantic index {name} ({len(index)} entries)")
+                else:
+                    index = SemanticIndex(name, SEMANTIC_SEARCH_MODEL)
+                self.indexes[name] = index
+            return index
+    
+    @staticmethod
+    def _index_dir() -> str:
+        return _setting('HF_SEMANTIC_INDEX_DIR', os.path.join(BACKEND_DIR, 'model_cache', 'semantic_indexes'))
+    
+    def add_to_semantic_index(self, name: str, codes: List[str], ids: Optional[List[Any]] = None) -> int:
+        """
+        Encode codes and add them to the named index (ids default to content
+        hashes; existing ids are replaced). Returns the number of entries added.
+        """
+        try:
+            if not codes:
+                return 0
+            if ids is None:
+                ids = [content_hash(code) for code in codes]
+            embeddings = self._encode_for_search(codes)
+            if embeddings is None:
+                return 0
+            self.get_semantic_index(name).add(ids, embeddings, documents=codes)
+            return len(codes)
+        except Exception as e:
+            self.logger.error(f"Failed to add to semantic index {name}: {str(e)}")
+            return 0
+    
+    def remove_from_semantic_index(self, name: str, ids: List[Any]) -> int:
+        """Remove entries from the named index; returns how many were removed"""
+        try:
+            return self.get_semantic_index(name).remove(ids)
+        except Exception as e:
+            self.logger.error(f"Failed to remove from semantic index {name}: {str(e)}")
+            return 0
+    
+    def save_semantic_index(self, name: str) -> Optional[str]:
+        """Save the named index to HF_SEMANTIC_INDEX_DIR; returns its path"""
+        try:
+            path = index_path(self._index_dir(), name)
+            self.get_semantic_index(name).save(path)
+            return path
+        except Exception as e:
+            self.logger.error(f"Failed to save semantic index {name}: {str(e)}")
+            return None
+    
+    def search_semantic_index(self, name: str, query_code: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Search the named index; only the query is encoded"""
+        try:
+            index = self.get_semantic_index(name)
+            if not len(index):
+                return []
+            query_embedding = self._encode_for_search([query_code])
+            if query_embedding is None:
+                return []
+            return [
+                {
+                    'id': match['id'],
+                    'code': match['document'],
+                    'similarity_score': match['similarity_score'],
+                    'index': match['index']
+                }
+                for match in index.search(query_embedding[0], top_k)
+            ]
+        except Exception as e:
+            self.logger.error(f"Failed to search semantic index {name}: {str(e)}")
+            return []
+    
     def analyze_code_quality_advanced(self, code: str, language: str = 'python'):
         """Advanced code quality analysis using multiple models"""
         try:
@@ -265,10 +486,13 @@ class HuggingFaceService:
             return {'error': str(e)}
     
     def get_model_status(self):
-        """Get status of loaded models"""
+        """Get status of loaded models, their measured sizes and load/evict/hit events"""
+        loaded = self.registry.names()
         return {
-            'loaded_models': list(self.models.keys()),
-            'loaded_pipelines': list(self.pipelines.keys()),
+            'loaded_models': [name for name in loaded if name not in PIPELINE_NAMES],
+            'loaded_pipelines': [name for name in loaded if name in PIPELINE_NAMES],
+            'memory': self.registry.stats(),
+            'semantic_indexes': {name: len(index) for name, index in list(self.indexes.items())},
             'device': self.device,
             'token_configured': self.token is not None,
             'cuda_available': torch.cuda.is_available()
@@ -276,11 +500,7 @@ class HuggingFaceService:
     
     def clear_models(self):
         """Clear loaded models to free memory"""
-        self.models.clear()
-        self.tokenizers.clear()
-        self.pipelines.clear()
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
+        self.registry.clear()
         self.logger.info("Cleared all models from memory")
 
 # Global instance
@@ -0,0 +1,371 @@
+"""
+Durable local job queue for heavy analyses.
+
+Jobs are stored in SQLite so any HTTP worker can submit and poll them, and a
+pool of worker processes claims and runs them. No external broker is needed.
+"""
+import importlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from utils.json_utils import NumpyJSONEncoder
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+# Times a job may be claimed before a worker dying under it fails the job
+MAX_JOB_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    progress_message TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker_pid INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+class JobCancelled(Exception):
+    """Raised inside a running job when cancellation was requested"""
+
+class JobQueue:
+    """
+    SQLite-backed job store shared by HTTP workers and job worker processes
+    """
+
+    def __init__(self, db_path: str, result_ttl: float = 3600, max_attempts: int = MAX_JOB_ATTEMPTS):
+        self.db_path = db_path
+        self.result_ttl = result_ttl
+        self.max_attempts = max_attempts
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            # Databases created before attempts were counted
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+            if 'attempts' not in columns:
+                conn.execute('ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0')
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit mode; multi-statement updates use explicit BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> str:
+        """Queue a new job and return its id"""
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, kind, status, payload, created_at) VALUES (?, ?, ?, ?, ?)',
+                (job_id, kind, 'queued', json.dumps(payload, cls=NumpyJSONEncoder), time.time())
+            )
+        return job_id
+
+    def get(self, job_id: str, include_result: bool = False) -> Optional[Dict[str, Any]]:
+        """Return the job status (and optionally its result), or None if unknown or expired"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None or (row['expires_at'] is not None and row['expires_at'] < time.time()):
+            return None
+        return self._row_to_job(row, include_result)
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent jobs, optionally filtered by status"""
+        query = 'SELECT * FROM jobs WHERE (expires_at IS NULL OR expires_at >= ?)'
+        params = [time.time()]
+        if status:
+            query += ' AND status = ?'
+            params.append(status)
+        query += ' ORDER BY created_at DESC LIMIT ?'
+        params.append(limit)
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancel a job. Queued jobs are cancelled immediately, running jobs are
+        flagged and stop at their next progress report. Returns the new status.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            status = row['status']
+            if status == 'queued':
+                status = 'cancelled'
+                conn.execute(
+                    'UPDATE jobs SET status = ?, finished_at = ?, expires_at = ? WHERE id = ?',
+                    (status, now, now + self.result_ttl, job_id)
+                )
+            elif status == 'running':
+                conn.execute('UPDATE jobs SET cancel_requested = 1 WHERE id = ?', (job_id,))
+            conn.execute('COMMIT')
+        return status
+
+    def claim_next(self) -> Optional[Dict[str, Any]]:
+        """Atomically move the oldest queued job to running and return it"""
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, worker_pid = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                (time.time(), os.getpid(), row['id'])
+            )
+            conn.execute('COMMIT')
+        job = self._row_to_job(row)
+        job['attempts'] += 1
+        job['payload'] = json.loads(row['payload'])
+        return job
+
+    def update_progress(self, job_id: str, progress: float, message: str = '') -> bool:
+        """Record progress; returns True if cancellation has been requested"""
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET progress = ?, progress_message = ? WHERE id = ?',
+                (max(0.0, min(1.0, progress)), message, job_id)
+            )
+            row = conn.execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return bool(row and row['cancel_requested'])
+
+    def finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None):
+        """Store the outcome of a job and schedule its expiry"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, expires_at = ?, '
+                'progress = CASE WHEN ? = \'succeeded\' THEN 1 ELSE progress END WHERE id = ?',
+                (
+                    status,
+                    json.dumps(result, cls=NumpyJSONEncoder) if result is not None else None,
+                    error,
+                    now,
+                    now + self.result_ttl,
+                    status,
+                    job_id
+                )
+            )
+
+    def purge_expired(self) -> int:
+        """Delete finished jobs whose results have expired"""
+        with self._connect() as conn:
+            cursor = conn.execute('DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?', (time.time(),))
+        return cursor.rowcount
+
+    def requeue_orphaned(self) -> int:
+        """
+        Put running jobs back in the queue if the process running them has
+        died. A job that has already been claimed max_attempts times (e.g. one
+        that keeps crashing its worker) fails instead, and one whose cancel
+        was requested is cancelled. Returns the number of orphaned jobs.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute(
+                "SELECT id, worker_pid, attempts, cancel_requested FROM jobs WHERE status = 'running'"
+            ).fetchall()
+            orphaned = [row for row in rows if not _process_alive(row['worker_pid'])]
+            for row in orphaned:
+                if row['cancel_requested']:
+                    status, error = 'cancelled', None
+                elif row['attempts'] >= self.max_attempts:
+                    status, error = 'failed', f"Worker process died while running the job ({row['attempts']} attempts)"
+                else:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'queued', worker_pid = NULL, started_at = NULL WHERE id = ?",
+                        (row['id'],)
+                    )
+                    continue
+                conn.execute(
+                    'UPDATE jobs SET status = ?, error = ?, worker_pid = NULL, finished_at = ?, expires_at = ? '
+                    'WHERE id = ?',
+                    (status, error, now, now + self.result_ttl, row['id'])
+                )
+            conn.execute('COMMIT')
+        return len(orphaned)
+
+    def _row_to_job(self, row: sqlite3.Row, include_result: bool = False) -> Dict[str, Any]:
+        job = {
+            'job_id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'progress': row['progress'],
+            'progress_message': row['progress_message'],
+            'cancel_requested': bool(row['cancel_requested']),
+            'attempts': row['attempts'],
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+            'expires_at': row['expires_at']
+        }
+        if include_result and row['result'] is not None:
+            job['result'] = json.loads(row['result'])
+        return job
+
+def _process_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _worker_main(db_path: str, result_ttl: float, handlers_path: str, poll_interval: float):
+    """
+    Entry point of a job worker process. The handlers factory is imported once,
+    so any models it loads stay resident for every job this worker runs.
+    """
+    os.environ['JOB_WORKER_PROCESS'] = '1'
+    module_name, factory_name = handlers_path.split(':')
+    handlers = getattr(importlib.import_module(module_name), factory_name)()
+    queue = JobQueue(db_path, result_ttl)
+
+    while True:
+        job = queue.claim_next()
+        if job is None:
+            queue.purge_expired()
+            time.sleep(poll_interval)
+            continue
+
+        job_id = job['job_id']
+
+        def report_progress(progress: float, message: str = ''):
+            if queue.update_progress(job_id, progress, message):
+                raise JobCancelled()
+
+        handler = handlers.get(job['kind'])
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown job kind: {job['kind']}")
+            result = handler(job['payload'], report_progress)
+            queue.finish(job_id, 'succeeded', result=result)
+        except JobCancelled:
+            queue.finish(job_id, 'cancelled')
+        except Exception as e:
+            queue.finish(job_id, 'failed', error=str(e))
+
+class JobWorkerPool:
+    """
+    Pool of worker processes that run queued jobs
+    """
+
+    def __init__(self, db_path: str, handlers_path: str, workers: int = 2,
+                 result_ttl: float = 3600, poll_interval: float = 0.5):
+        """
+        Args:
+            db_path: SQLite database shared with the HTTP workers
+            handlers_path: ``module:function`` returning a dict of job kind -> handler.
+                  A handler is called as ``handler(payload, report_progress)``
+            workers: Number of worker processes
+            result_ttl: Seconds finished job results are kept
+            poll_interval: Seconds an idle worker waits between queue checks
+        """
+        self.db_path = db_path
+        self.handlers_path = handlers_path
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.processes = []
+        self._monitor = None
+        self._stopping = threading.Event()
+        # Spawned workers do not inherit the parent's model threads
+        self._context = multiprocessing.get_context('spawn')
+
+    def _spawn(self):
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self.db_path, self.result_ttl, self.handlers_path, self.poll_interval),
+            daemon=True
+        )
+        process.start()
+        return process
+
+    def start(self):
+        """Start the worker processes"""
+        JobQueue(self.db_path, self.result_ttl).requeue_orphaned()
+        self._stopping.clear()
+        for _ in range(self.workers):
+            self.processes.append(self._spawn())
+
+    def start_monitor(self, check_interval: float = 5):
+        """Restart workers that exit from a background thread, for pools embedded in another process"""
+        if self._monitor is not None:
+            return
+
+        def monitor():
+            while not self._stopping.wait(check_interval):
+                self.restart_dead()
+
+        self._monitor = threading.Thread(target=monitor, name='job-worker-monitor', daemon=True)
+        self._monitor.start()
+
+    def restart_dead(self) -> int:
+        """Replace worker processes that have exited; returns how many were restarted"""
+        restarted = 0
+        for index, process in enumerate(self.processes):
+            if not process.is_alive():
+                # Jobs the dead worker was running go back to the queue
+                JobQueue(self.db_path, self.result_ttl).requeue_orphaned()
+                self.processes[index] = self._spawn()
+                restarted += 1
+        return restarted
+
+    def stop(self, timeout: float = 5):
+        """Terminate the worker processes"""
+        self._stopping.set()
+        if self._monitor is not None:
+            self._monitor.join(timeout)
+            self._monitor = None
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join(timeout)
+        self.processes = []
+
+    def run_forever(self, check_interval: float = 5):
+        """Start the workers and restart any that exit"""
+        self.start()
+        try:
+            while True:
+                time.sleep(check_interval)
+                self.restart_dead()
+        finally:
+            self.stop()
@@ -0,0 +1,206 @@
+"""
+Single-pass construct counter for source code.
+
+Each language's comment and string syntax is compiled into one tokenizer
+regex. A scan walks the tokens once, skips strings and comments, and fills
+the counts of every construct CodeAnalyzer reports: decision keywords,
+function and class definitions, magic numbers and range() calls.
+"""
+import re
+from functools import lru_cache
+from typing import Dict
+
+# Decision keywords, named after their C/Python spelling; other spellings
+# (elsif, foreach, rescue, when, ...) are mapped onto these
+DECISION_CONSTRUCTS = ('if', 'elif', 'else', 'while', 'for', 'try', 'except', 'case', 'switch')
+CONSTRUCTS = DECISION_CONSTRUCTS + (
+    'catch', 'function_definitions', 'class_definitions', 'magic_numbers', 'range_calls'
+)
+
+_C_COMMENTS = r'//[^\n]*|/\*[\s\S]*?(?:\*/|\Z)'
+_HASH_COMMENTS = r'#[^\n]*'
+_DOUBLE_QUOTED = r'"(?:[^"\\\n]|\\.)*"?'
+_SINGLE_QUOTED = r"'(?:[^'\\\n]|\\.)*'?"
+_CHAR_LITERAL = r"'(?:[^'\\\n]|\\.)'"
+_BACKTICK = r'`(?:[^`\\]|\\[\s\S])*`?'
+_TRIPLE_QUOTED = r"'''[\s\S]*?(?:'''|\Z)|\"\"\"[\s\S]*?(?:\"\"\"|\Z)"
+
+_C_KEYWORDS = {
+    'if': 'if', 'else': 'else', 'while': 'while', 'for': 'for',
+    'try': 'try', 'catch': 'catch', 'case': 'case', 'switch': 'switch'
+}
+
+# Per-language syntax: comment and string patterns, keyword table, the
+# keywords that introduce a named function, and whether functions are
+# declared C-style as "Type name(...) {"
+LANGUAGE_SYNTAX = {
+    'python': {
+        'skip': [_HASH_COMMENTS, _TRIPLE_QUOTED, _DOUBLE_QUOTED, _SINGLE_QUOTED],
+        'keywords': {'if': 'if', 'elif': 'elif', 'else': 'else', 'while': 'while', 'for': 'for',
+                     'try': 'try', 'except': 'except'},
+        'function_keywords': {'def'}
+    },
+    'javascript': {
+        'skip': [_C_COMMENTS, _DOUBLE_QUOTED, _SINGLE_QUOTED, _BACKTICK],
+        'keywords': _C_KEYWORDS,
+        'function_keywords': {'function'}
+    },
+    'java': {
+        'skip': [_C_COMMENTS, _DOUBLE_QUOTED, _CHAR_LITERAL],
+        'keywords': _C_KEYWORDS,
+        'c_style_functions': True
+    },
+    'cpp': {
+        'skip': [_C_COMMENTS, _DOUBLE_QUOTED, _CHAR_LITERAL],
+        'keywords': _C_KEYWORDS,
+        'c_style_functions': True
+    },
+    'csharp': {
+        'skip': [_C_COMMENTS, _DOUBLE_QUOTED, _CHAR_LITERAL],
+        'keywords': {**_C_KEYWORDS, 'foreach': 'for'},
+        'c_style_functions': True
+    },
+    'php': {
+        'skip': [_C_COMMENTS, _HASH_COMMENTS, _DOUBLE_QUOTED, _SINGLE_QUOTED],
+        'keywords': {**_C_KEYWORDS, 'elseif': 'elif', 'foreach': 'for'},
+        'function_keywords': {'function'}
+    },
+    'ruby': {
+        'skip': [_HASH_COMMENTS, _DOUBLE_QUOTED, _SINGLE_QUOTED],
+        'keywords': {'if': 'if', 'unless': 'if', 'elsif': 'elif', 'else': 'else',
+                     'while': 'while', 'until': 'while', 'for': 'for', 'begin': 'try',
+                     'rescue': 'except', 'case': 'switch', 'when': 'case'},
+        'function_keywords': {'def'}
+    },
+    'go': {
+        'skip': [_C_COMMENTS, _DOUBLE_QUOTED, _CHAR_LITERAL, _BACKTICK],
+        'keywords': {'if': 'if', 'else': 'else', 'for': 'for', 'switch': 'switch',
+                     'select': 'switch', 'case': 'case'},
+        'function_keywords': {'func'},
+        'receiver_methods': True
+    },
+    'rust': {
+        'skip': [_C_COMMENTS, _DOUBLE_QUOTED, _CHAR_LITERAL],
+        'keywords': {'if': 'if', 'else': 'else', 'while': 'while', 'loop': 'while',
+                     'for': 'for', 'match': 'switch'},
+        'function_keywords': {'fn'}
+    },
+    'swift': {
+        'skip': [_C_COMMENTS, _DOUBLE_QUOTED],
+        'keywords': {**_C_KEYWORDS, 'guard': 'if', 'repeat': 'while', 'do': 'try'},
+        'function_keywords': {'func'}
+    },
+    'kotlin': {
+        'skip': [_C_COMMENTS, _DOUBLE_QUOTED, _CHAR_LITERAL],
+        'keywords': {**_C_KEYWORDS, 'when': 'switch'},
+        'function_keywords': {'fun'}
+    }
+}
+LANGUAGE_SYNTAX['typescript'] = LANGUAGE_SYNTAX['javascript']
+LANGUAGE_SYNTAX['c'] = LANGUAGE_SYNTAX['cpp']
+
+# Used for 'auto', 'unknown' and anything without its own table
+DEFAULT_SYNTAX = {
+    'skip': [_C_COMMENTS, _DOUBLE_QUOTED, _SINGLE_QUOTED],
+    'keywords': {**_C_KEYWORDS, 'elif': 'elif', 'except': 'except'},
+    'function_keywords': {'function', 'def'}
+}
+
+# Words that can precede "name(" without it being a declaration
+_NON_TYPE_WORDS = {'return', 'new', 'throw', 'else', 'case', 'goto', 'await', 'yield', 'delete', 'sizeof', 'typeof'}
+# Tokens that may follow the parameter list of a C-style declaration
+_SIGNATURE_SUFFIXES = {'{', 'throws', 'const', 'noexcept', 'override'}
+
+class KeywordScanner:
+    """
+    Counts constructs for one language in a single pass over the code
+    """
+
+    def __init__(self, language: str):
+        syntax = LANGUAGE_SYNTAX.get(language, DEFAULT_SYNTAX)
+        self.language = language
+        self.keywords = syntax['keywords']
+        self.function_keywords = syntax.get('function_keywords', set())
+        self.c_style_functions = syntax.get('c_style_functions', False)
+        self.receiver_methods = syntax.get('receiver_methods', False)
+        self.pattern = re.compile(
+            '(?P<skip>' + '|'.join(syntax['skip']) + ')'
+            r'|(?P<word>[A-Za-z_$][\w$]*)'
+            r'|(?P<number>\d[\w.]*)'
+            r'|(?P<punct>[(){};=,.])'
+        )
+
+    def scan(self, code: str) -> Dict[str, int]:
+        """
+        Return the count of every construct in CONSTRUCTS
+        """
+        counts = dict.fromkeys(CONSTRUCTS, 0)
+        keywords = self.keywords
+        prev = prev2 = None
+        prev_kind = prev2_kind = None
+        parens = []  # for each open '(', what it could be the parameter list of
+        expect = None  # what the next token completes, if anything
+
+        for match in self.pattern.finditer(code):
+            kind = match.lastgroup
+            if kind == 'skip':
+                continue
+            token = match.group()
+
+            pending, expect = expect, None
+            if pending == 'function_name' and kind == 'word':
+                counts['function_definitions'] += 1
+            elif pending == 'class_name' and kind == 'word':
+                counts['class_definitions'] += 1
+            elif pending == 'signature_end' and token in _SIGNATURE_SUFFIXES:
+                counts['function_definitions'] += 1
+            elif pending == 'method_name' and kind == 'word':
+                expect = 'method_call'
+            elif pending == 'method_call' and token == '(':
+                counts['function_definitions'] += 1
+
+            if kind == 'word':
+                construct = keywords.get(token)
+                if construct:
+                    counts[construct] += 1
+                elif token in self.function_keywords:
+                    expect = 'function_name'
+                elif token == 'class':
+                    expect = 'class_name'
+            elif kind == 'number':
+                if len(token) >= 2 and token[1].isdigit():
+                    counts['magic_numbers'] += 1
+            elif token == '(':
+                opened = None
+                if prev == 'range':
+                    counts['range_calls'] += 1
+                if (self.c_style_functions and prev_kind == 'word' and prev2_kind == 'word'
+                        and prev not in keywords and prev2 not in keywords
+                        and prev2 not in _NON_TYPE_WORDS):
+                    opened = 'signature'
+                elif self.receiver_methods and prev in self.function_keywords:
+                    opened = 'receiver'
+                parens.append(opened)
+            elif token == ')' and parens:
+                closed = parens.pop()
+                if closed == 'signature':
+                    expect = 'signature_end'
+                elif closed == 'receiver':
+                    expect = 'method_name'
+
+            prev2, prev2_kind = prev, prev_kind
+            prev, prev_kind = token, kind
+
+        return counts
+
+@lru_cache(maxsize=None)
+def _scanner_for(key: str) -> KeywordScanner:
+    return KeywordScanner(key)
+
+def get_scanner(language: str) -> KeywordScanner:
+    """
+    Compiled scanner for a language, built once per process. Unknown
+    languages share the 'default' scanner, so request input cannot grow
+    the cache beyond the known languages.
+    """
+    return _scanner_for(language if language in LANGUAGE_SYNTAX else 'default')
@@ -0,0 +1,212 @@
+"""
+Bounded-cost programming language detection.
+
+Only a fixed-size prefix and suffix of the code is examined, with every
+language feature compiled into a single regex, so detection cost does not
+grow with file size. Results are cached by a hash of the sampled text.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict
+
+# Characters examined at the start and end of the code
+SAMPLE_HEAD = 8192
+SAMPLE_TAIL = 2048
+
+# Stop scanning once the leader has this much evidence and this lead over the runner-up
+EARLY_STOP_SCORE = 24
+EARLY_STOP_RATIO = 3.0
+
+# Evidence at which a sole candidate is reported with full confidence
+CONFIDENT_SCORE = 8.0
+
+# (pattern, weight, languages credited). A feature shared by related
+# languages gives its full weight to the first language and half to the
+# rest, so e.g. TypeScript only wins with TypeScript-specific evidence.
+LANGUAGE_FEATURES = [
+    (r'<\?php', 10, ('php',)),
+    (r'System\.out\.print', 4, ('java',)),
+    (r'^[ \t]*import\s+java\.', 4, ('java',)),
+    (r'public\s+static\s+void\s+main', 3, ('java',)),
+    (r'^[ \t]*package\s+[\w.]+;', 3, ('java',)),
+    (r'@Override\b', 2, ('java', 'kotlin')),
+    (r'public\s+class\s+\w+', 2, ('java', 'csharp')),
+    (r'\bString\[\]', 2, ('java',)),
+
+    (r'using\s+System\b', 4, ('csharp',)),
+    (r'Console\.Write', 4, ('csharp',)),
+    (r'\{\s*get;\s*set;\s*\}', 4, ('csharp',)),
+    (r'^[ \t]*namespace\s+[\w.]+\s*$', 2, ('csharp',)),
+    (r'\bstring\[\]', 2, ('csharp',)),
+
+    (r'using\s+namespace\s+std\b', 4, ('cpp',)),
+    (r'\bstd::', 4, ('cpp',)),
+    (r'\bcout\s*<<|\bcin\s*>>', 4, ('cpp',)),
+    (r'\btemplate\s*<', 3, ('cpp',)),
+    (r'#include\s*<stdio\.h>|#include\s*<stdlib\.h>', 3, ('c',)),
+    (r'#include\s*[<"]', 3, ('cpp', 'c')),
+    (r'\bint\s+main\s*\(', 2, ('cpp', 'c')),
+    (r'\b(?:malloc|calloc|free)\s*\(', 2, ('c',)),
+    (r'\bprintf\s*\(', 2, ('c',)),
+
+    (r'^[ \t]*from\s+[\w.]+\s+import\s', 3, ('python',)),
+    (r'__name__\s*==\s*["\']__main__["\']', 3, ('python',)),
+    (r'^[ \t]*def\s+\w+\s*\(.*\)\s*(?:->\s*[\w\[\], .]+)?:', 3, ('python',)),
+    (r'^[ \t]*(?:elif\b.*|except\b.*|else|try|finally):\s*$', 2, ('python',)),
+    (r'^[ \t]*import\s+[\w.]+(?:\s+as\s+\w+)?\s*$', 2, ('python',)),
+    (r'^[ \t]*(?:if|for|while|with|class)\b[^{};\n]*:\s*$', 1, ('python',)),
+    (r'\bself\.\w+', 1, ('python',)),
+
+    (r'console\.log\s*\(', 3, ('javascript', 'typescript')),
+    (r'\brequire\s*\(\s*["\']', 3, ('javascript', 'typescript')),
+    (r'\bmodule\.exports\b|\bexport\s+default\b', 2, ('javascript', 'typescript')),
+    (r'\b(?:document|window)\.\w+', 2, ('javascript', 'typescript')),
+    (r'\bfunction\s*\w*\s*\([^)$]*\)\s*\{', 2, ('javascript', 'typescript')),
+    (r'\b(?:const|let)\s+\w+\s*=', 2, ('javascript', 'typescript')),
+    (r'\)\s*=>', 1, ('javascript', 'typescript')),
+    (r'\bexport\s+(?:interface|type)\s+\w+', 4, ('typescript',)),
+    (r'\w\s*\??:\s*(?:string|number|boolean|any|void|unknown)(?:\[\])?\s*[,)=;{]', 3, ('typescript',)),
+    (r'^[ \t]*interface\s+\w+\s*\{', 2, ('typescript',)),
+
+    (r'fmt\.Print', 4, ('go',)),
+    (r'^[ \t]*import\s+\($', 4, ('go',)),
+    (r'\bfunc\s+\(\s*\w+\s+\*?\w+\s*\)\s*\w+\s*\(', 4, ('go',)),
+    (r'^[ \t]*package\s+\w+\s*$', 3, ('go',)),
+    (r'\w\s*:=', 3, ('go',)),
+    (r'\bgo\s+func\b|\bchan\s+\w+|\bdefer\s+\w+', 3, ('go',)),
+    (r'\bfunc\s+\w+\s*\(', 2, ('go', 'swift')),
+
+    (r'\b(?:println|vec|format|macro_rules)!\s*[(\[{]', 4, ('rust',)),
+    (r'\blet\s+mut\b', 4, ('rust',)),
+    (r'\bpub\s+(?:fn|struct|enum|mod)\b', 4, ('rust',)),
+    (r'\bfn\s+\w+\s*[<(]', 4, ('rust',)),
+    (r'\bimpl(?:\s*<[^>\n]*>)?\s+\w+', 3, ('rust',)),
+    (r'^[ \t]*use\s+\w+(?:::\w+)+', 3, ('rust',)),
+    (r'&mut\s|&self\b', 3, ('rust',)),
+
+    (r'\battr_(?:reader|writer|accessor)\b', 4, ('ruby',)),
+    (r'\.each\s+do\b|\bdo\s*\|\w+', 4, ('ruby',)),
+    (r'\belsif\b', 4, ('ruby',)),
+    (r'^[ \t]*def\s+[\w.]+[?!]?\s*(?:\([^)]*\))?\s*$', 3, ('ruby',)),
+    (r'^[ \t]*end\s*$', 3, ('ruby',)),
+    (r'^[ \t]*require(?:_relative)?\s+["\']', 3, ('ruby',)),
+    (r'\bputs\s', 3, ('ruby',)),
+
+    (r'\bfunction\s+\w+\s*\(\s*\$', 4, ('php',)),
+    (r'^[ \t]*namespace\s+[\w\\]+;', 3, ('php',)),
+    (r'\$\w+\s*(?:=|->)', 2, ('php',)),
+    (r'\becho\s', 2, ('php',)),
+
+    (r'\bimport\s+(?:UIKit|Foundation|SwiftUI|Combine)\b', 5, ('swift',)),
+    (r'\b(?:guard|if)\s+let\b', 4, ('swift',)),
+    (r'@(?:IBOutlet|IBAction|State|Published)\b', 4, ('swift',)),
+    (r'\blet\s+\w+\s*:\s*\w+', 2, ('swift',)),
+
+    (r'\bfun\s+\w+\s*\(', 5, ('kotlin',)),
+    (r'\bdata\s+class\b', 4, ('kotlin',)),
+    (r'^[ \t]*import\s+(?:kotlin|android|kotlinx)\.', 4, ('kotlin',)),
+    (r'\bval\s+\w+\s*[:=]', 3, ('kotlin',)),
+    (r'\bwhen\s*\([^)]*\)\s*\{', 3, ('kotlin',)),
+    (r'^[ \t]*package\s+\w+(?:\.\w+)+\s*$', 3, ('kotlin',)),
+    (r'(?<!\.)\bprintln\s*\(', 2, ('kotlin',)),
+    (r'\bvar\s+\w+\s*:\s*\w+', 1, ('swift', 'kotlin', 'typescript'))
+]
+
+# Tie-break order
+LANGUAGES = (
+    'python', 'javascript', 'typescript', 'java', 'cpp', 'c', 'csharp',
+    'go', 'rust', 'ruby', 'php', 'swift', 'kotlin'
+)
+
+class LanguageDetector:
+    """
+    Scores languages from features found in a bounded sample of the code
+    """
+
+    def __init__(self, cache_size: int = 2048):
+        # Higher-weight features are tried first where alternatives overlap
+        ordered = sorted(enumerate(LANGUAGE_FEATURES), key=lambda item: -item[1][1])
+        self.pattern = re.compile(
+            '|'.join(f'(?P<f{index}>{pattern})' for index, (pattern, _, _) in ordered),
+            re.MULTILINE
+        )
+        self.features = {
+            f'f{index}': (weight, languages) for index, (_, weight, languages) in enumerate(LANGUAGE_FEATURES)
+        }
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def sample(self, code: str) -> str:
+        """Prefix and suffix of the code, cut at line boundaries"""
+        if len(code) <= SAMPLE_HEAD + SAMPLE_TAIL:
+            return code
+        head = code[:SAMPLE_HEAD]
+        head = head[:head.rfind('\n') + 1] or head
+        tail = code[-SAMPLE_TAIL:]
+        tail = tail[tail.find('\n') + 1:] or tail
+        return head + tail
+
+    def detect(self, code: str) -> Dict[str, Any]:
+        """
+        Detect the language of the code.
+        Returns {'language', 'confidence', 'scores'}; language is 'unknown'
+        (with confidence 0) when no feature matched.
+        """
+        sample = self.sample(code)
+        key = hashlib.blake2b(sample.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return dict(self._cache[key])
+
+        result = self._score(sample)
+
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return dict(result)
+
+    def _score(self, sample: str) -> Dict[str, Any]:
+        scores = dict.fromkeys(LANGUAGES, 0.0)
+        features = self.features
+
+        for match in self.pattern.finditer(sample):
+            weight, languages = features[match.lastgroup]
+            scores[languages[0]] += weight
+            for language in languages[1:]:
+                scores[language] += weight / 2
+
+            leader, runner_up = self._top_two(scores)
+            if scores[leader] >= EARLY_STOP_SCORE and scores[leader] >= EARLY_STOP_RATIO * scores[runner_up]:
+                break
+
+        leader, runner_up = self._top_two(scores)
+        best = scores[leader]
+        if best == 0:
+            return {'language': 'unknown', 'confidence': 0.0, 'scores': {}}
+
+        # Share of the evidence held by the leader, discounted while evidence is thin
+        lead = (best - scores[runner_up]) / best
+        evidence = min(1.0, best / CONFIDENT_SCORE)
+        confidence = round(evidence * (0.5 + 0.5 * lead), 3)
+
+        return {
+            'language': leader,
+            'confidence': confidence,
+            'scores': {language: score for language, score in scores.items() if score}
+        }
+
+    @staticmethod
+    def _top_two(scores: Dict[str, float]):
+        leader = runner_up = None
+        for language in LANGUAGES:
+            if leader is None or scores[language] > scores[leader]:
+                leader, runner_up = language, leader
+            elif runner_up is None or scores[language] > scores[runner_up]:
+                runner_up = language
+        return leader, runner_up
@@ -0,0 +1,196 @@
+"""
+Memory-budgeted registry of loaded models: the least recently used models
+are evicted once the loaded ones exceed the budget, and are loaded again
+the next time they are asked for
+"""
+import gc
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Iterable, List
+
+import torch
+
+def _module_bytes(module: torch.nn.Module) -> int:
+    """Bytes held by a module's parameters and buffers"""
+    tensors = list(module.parameters()) + list(module.buffers())
+    # Tied weights appear once per owner but occupy memory once
+    seen = {}
+    for tensor in tensors:
+        seen[tensor.data_ptr()] = tensor.numel() * tensor.element_size()
+    return sum(seen.values())
+
+def tensor_bytes(obj: Any) -> int:
+    """Bytes of model weights in obj: a module, a pipeline (its .model) or a tuple/list of those"""
+    if isinstance(obj, torch.nn.Module):
+        return _module_bytes(obj)
+    if isinstance(obj, (tuple, list)):
+        return sum(tensor_bytes(item) for item in obj)
+    model = getattr(obj, 'model', None)
+    if isinstance(model, torch.nn.Module):
+        return _module_bytes(model)
+    return 0
+
+def resident_bytes() -> int:
+    """Resident set size of this process (0 where /proc is not available)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+class ModelRegistry:
+    """
+    Loaded models by name, kept in least-recently-used order. Each entry
+    records its measured size: the bytes of its weights, or the growth of
+    the process's resident memory while loading when it has no torch
+    weights. Pinned models are never evicted.
+    """
+
+    def __init__(self, max_bytes: int, pinned: Iterable[str] = (), max_events: int = 200):
+        self.max_bytes = max_bytes
+        self.pinned = set(pinned)
+        self._entries = OrderedDict()  # name -> {'value', 'size_bytes', 'loaded_at', 'hits'}
+        self._loading = {}  # name -> Lock held while that model loads
+        self._events = deque(maxlen=max_events)
+        self._counts = {'load': 0, 'hit': 0, 'evict': 0}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def get(self, name: str, loader: Callable[[], Any]) -> Any:
+        """Model called name, loading it with loader() if it is not loaded"""
+        with self._lock:
+            value = self._hit(name)
+            if value is not None:
+                return value
+            load_lock = self._loading.setdefault(name, threading.Lock())
+
+        # One thread loads a given model; others asking for it wait here
+        with load_lock:
+            with self._lock:
+                value = self._hit(name)
+                if value is not None:
+                    return value
+
+            rss_before = resident_bytes()
+            started = time.monotonic()
+            try:
+                value = loader()
+            except Exception:
+                with self._lock:
+                    self._loading.pop(name, None)
+                raise
+            size = tensor_bytes(value) or max(0, resident_bytes() - rss_before)
+
+            with self._lock:
+                self._entries[name] = {'value': value, 'size_bytes': size, 'loaded_at': time.time(), 'hits': 0}
+                self._loading.pop(name, None)
+                self._record('load', name, size, seconds=round(time.monotonic() - started, 3))
+                evicted = self._evict_over_budget(keep=name)
+
+        if evicted:
+            self._release_memory()
+        return value
+
+    def _hit(self, name: str) -> Any:
+        entry = self._entries.get(name)
+        if entry is None:
+            return None
+        self._entries.move_to_end(name)
+        entry['hits'] += 1
+        self._record('hit', name, entry['size_bytes'])
+        return entry['value']
+
+    def _evict_over_budget(self, keep: str) -> List[str]:
+        """Evict least recently used, unpinned models until the loaded ones fit the budget"""
+        evicted = []
+        for name in list(self._entries):
+            if self.total_bytes() <= self.max_bytes:
+                break
+            if name == keep or name in self.pinned:
+                continue
+            self._remove(name, 'evict')
+            evicted.append(name)
+        if self.total_bytes() > self.max_bytes:
+            self.logger.warning(
+                f"Loaded models use {self.total_bytes()} bytes, over the {self.max_bytes} byte budget "
+                f"(pinned or just loaded models are not evicted)"
+            )
+        return evicted
+
+    def _remove(self, name: str, event: str):
+        entry = self._entries.pop(name)
+        self._record(event, name, entry['size_bytes'])
+
+    def _record(self, event: str, name: str, size_bytes: int, **details):
+        if event in self._counts:
+            self._counts[event] += 1
+        self._events.append({'event': event, 'model': name, 'size_bytes': size_bytes, 'time': time.time(), **details})
+        if event != 'hit':
+            self.logger.info(f"Model {event}: {name} ({size_bytes / 2 ** 20:.1f} MiB)")
+
+    @staticmethod
+    def _release_memory():
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def total_bytes(self) -> int:
+        return sum(entry['size_bytes'] for entry in self._entries.values())
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return name in self._entries
+
+    def names(self) -> List[str]:
+        """Loaded models, least recently used first"""
+        with self._lock:
+            return list(self._entries)
+
+    def pin(self, name: str):
+        """Never evict name (it may still be dropped by evict() or clear())"""
+        with self._lock:
+            self.pinned.add(name)
+
+    def unpin(self, name: str):
+        with self._lock:
+            self.pinned.discard(name)
+            self._evict_over_budget(keep=None)
+
+    def evict(self, name: str) -> bool:
+        """Drop one loaded model; it is loaded again the next time it is asked for"""
+        with self._lock:
+            if name not in self._entries:
+                return False
+            self._remove(name, 'evict')
+        self._release_memory()
+        return True
+
+    def clear(self):
+        """Drop every loaded model, pinned ones included"""
+        with self._lock:
+            for name in list(self._entries):
+                self._remove(name, 'clear')
+        self._release_memory()
+
+    def stats(self, recent_events: int = 20) -> Dict[str, Any]:
+        """Loaded models with their sizes, the budget, event counts and recent events"""
+        with self._lock:
+            return {
+                'max_bytes': self.max_bytes,
+                'total_bytes': self.total_bytes(),
+                'models': [
+                    {
+                        'name': name,
+                        'size_bytes': entry['size_bytes'],
+                        'hits': entry['hits'],
+                        'pinned': name in self.pinned,
+                        'loaded_at': entry['loaded_at']
+                    }
+                    for name, entry in self._entries.items()
+                ],
+                'counts': dict(self._counts),
+                'recent_events': list(self._events)[-recent_events:]
+            }
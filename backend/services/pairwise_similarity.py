@@ -0,0 +1,142 @@
+"""
+Pairwise similarity metrics that work on preprocessed snippets.
+
+These helpers only depend on the standard library and numpy so they can be
+shipped to worker processes without loading the transformer models held by
+SimilarityDetector.
+"""
+import difflib
+import numpy as np
+from typing import Dict, List, Any, Iterable, Tuple
+
+# Weights used to combine the individual metrics into one similarity score
+SIMILARITY_WEIGHTS = {
+    'semantic': 0.4,
+    'structural': 0.3,
+    'textual': 0.2,
+    'token': 0.1
+}
+
+def compare_lists(list1: List[str], list2: List[str]) -> float:
+    """
+    Compare two lists and return similarity score
+    """
+    if not list1 and not list2:
+        return 1.0
+    if not list1 or not list2:
+        return 0.0
+
+    set1 = set(list1)
+    set2 = set(list2)
+
+    intersection = len(set1.intersection(set2))
+    union = len(set1.union(set2))
+
+    return intersection / union if union > 0 else 0.0
+
+def compare_dicts(dict1: Dict, dict2: Dict) -> float:
+    """
+    Compare two dictionaries and return similarity score
+    """
+    if not dict1 and not dict2:
+        return 1.0
+    if not dict1 or not dict2:
+        return 0.0
+
+    all_keys = set(dict1.keys()).union(set(dict2.keys()))
+    if not all_keys:
+        return 1.0
+
+    similarities = []
+    for key in all_keys:
+        val1 = dict1.get(key, 0)
+        val2 = dict2.get(key, 0)
+
+        if val1 == 0 and val2 == 0:
+            similarities.append(1.0)
+        elif val1 == 0 or val2 == 0:
+            similarities.append(0.0)
+        else:
+            # Normalized similarity for numeric values
+            similarity = 1.0 - abs(val1 - val2) / max(val1, val2)
+            similarities.append(max(0.0, similarity))
+
+    return np.mean(similarities)
+
+def structural_similarity_from_features(features1: Dict[str, Any], features2: Dict[str, Any]) -> float:
+    """
+    Structural similarity between two sets of extracted structural features
+    """
+    similarity_scores = [
+        # Function signatures
+        compare_lists(features1['functions'], features2['functions']),
+        # Control flow patterns
+        compare_dicts(features1['control_flow'], features2['control_flow']),
+        # Variable patterns, with a lower weight
+        compare_lists(features1['variables'], features2['variables']) * 0.5
+    ]
+
+    return float(np.mean(similarity_scores))
+
+def token_similarity_from_tokens(tokens1: List[str], tokens2: List[str]) -> float:
+    """
+    Token-level similarity using sequence matching
+    """
+    if not tokens1 or not tokens2:
+        return 0.0
+
+    matcher = difflib.SequenceMatcher(None, tokens1, tokens2)
+    return matcher.ratio()
+
+def combine_scores(semantic: float, structural: float, textual: float, token: float) -> float:
+    """
+    Weighted combination of the individual similarity metrics
+    """
+    overall_similarity = (
+        SIMILARITY_WEIGHTS['semantic'] * semantic +
+        SIMILARITY_WEIGHTS['structural'] * structural +
+        SIMILARITY_WEIGHTS['textual'] * textual +
+        SIMILARITY_WEIGHTS['token'] * token
+    )
+    return float(min(overall_similarity, 1.0))
+
+def combine_breakdown(breakdown: Dict[str, float]) -> float:
+    """
+    combine_scores for a similarity breakdown dict
+    """
+    return combine_scores(
+        breakdown['semantic_similarity'], breakdown['structural_similarity'],
+        breakdown['textual_similarity'], breakdown['token_similarity']
+    )
+
+def score_pair_chunk(task: Tuple[List[Tuple[int, int]], Dict[int, Tuple[Dict[str, Any], List[str]]]]) -> List[Tuple[int, int, float, float]]:
+    """
+    Compute the structural and token metrics for a chunk of index pairs.
+
+    ``task`` is ``(pairs, snippets)`` where ``snippets`` maps an index to its
+    ``(structural_features, tokens)``. Returns ``(i, j, structural, token)``
+    tuples in the order of ``pairs``. Runs inside pool worker processes.
+    """
+    pairs, snippets = task
+    scores = []
+    for i, j in pairs:
+        features1, tokens1 = snippets[i]
+        features2, tokens2 = snippets[j]
+        scores.append((
+            i,
+            j,
+            structural_similarity_from_features(features1, features2),
+            token_similarity_from_tokens(tokens1, tokens2)
+        ))
+    return scores
+
+def chunk_pairs(pairs: Iterable[Tuple[int, int]], chunk_size: int) -> Iterable[List[Tuple[int, int]]]:
+    """Split an iterable of pairs into lists of at most ``chunk_size``"""
+    chunk = []
+    for pair in pairs:
+        chunk.append(pair)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,170 @@
+"""
+Single-pass structural analysis of Python source
+"""
+import ast
+from typing import List, Optional
+
+class PythonStructureVisitor(ast.NodeVisitor):
+    """
+    Collects everything CodeAnalyzer needs from a Python AST in one pass:
+    imports, functions, classes, assignments, control flow, cyclomatic
+    complexity and block nesting depth
+    """
+
+    def __init__(self):
+        self.imports = []
+        self.star_imports = 0
+        self.functions = []  # dicts with name, line span, argument count and docstring flag
+        self.classes = []
+        self.variables = []
+        self.control_flow = {'if_statements': 0, 'loops': 0, 'try_catch': 0, 'switches': 0}
+        self.decision_points = 0
+        self.max_depth = 0
+        self.recursive_functions = set()
+        self.has_module_docstring = False
+        self._depth = 0
+        self._function_stack = []
+
+    @property
+    def cyclomatic_complexity(self) -> int:
+        return 1 + self.decision_points
+
+    @property
+    def function_names(self) -> List[str]:
+        return [function['name'] for function in self.functions]
+
+    @property
+    def class_names(self) -> List[str]:
+        return [cls['name'] for cls in self.classes]
+
+    def visit_Module(self, node):
+        self.has_module_docstring = ast.get_docstring(node) is not None
+        self.generic_visit(node)
+
+    def _visit_block(self, node):
+        self._depth += 1
+        self.max_depth = max(self.max_depth, self._depth)
+        self.generic_visit(node)
+        self._depth -= 1
+
+    def visit_Import(self, node):
+        self.imports.extend(alias.name for alias in node.names)
+
+    def visit_ImportFrom(self, node):
+        if node.module:
+            self.imports.append(node.module)
+        self.star_imports += sum(1 for alias in node.names if alias.name == '*')
+
+    def _visit_function(self, node):
+        args = node.args
+        self.functions.append({
+            'name': node.name,
+            'lineno': node.lineno,
+            'end_lineno': getattr(node, 'end_lineno', node.lineno),
+            'arg_count': len(args.posonlyargs) + len(args.args) + len(args.kwonlyargs)
+                         + (args.vararg is not None) + (args.kwarg is not None),
+            'has_docstring': ast.get_docstring(node) is not None
+        })
+        self._function_stack.append(node.name)
+        self._visit_block(node)
+        self._function_stack.pop()
+
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+
+    def visit_ClassDef(self, node):
+        self.classes.append({'name': node.name, 'has_docstring': ast.get_docstring(node) is not None})
+        self._visit_block(node)
+
+    def visit_Call(self, node):
+        if self._function_stack and isinstance(node.func, ast.Name) and node.func.id == self._function_stack[-1]:
+            self.recursive_functions.add(node.func.id)
+        self.generic_visit(node)
+
+    def _collect_targets(self, target):
+        if isinstance(target, ast.Name):
+            self.variables.append(target.id)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for element in target.elts:
+                self._collect_targets(element)
+        elif isinstance(target, ast.Starred):
+            self._collect_targets(target.value)
+
+    def visit_Assign(self, node):
+        for target in node.targets:
+            self._collect_targets(target)
+        self.generic_visit(node)
+
+    def visit_AnnAssign(self, node):
+        self._collect_targets(node.target)
+        self.generic_visit(node)
+
+    def visit_If(self, node, is_elif=False):
+        self.control_flow['if_statements'] += 1
+        self.decision_points += 1
+        # An elif is stored as a nested If but sits at the same nesting level
+        if not is_elif:
+            self._depth += 1
+            self.max_depth = max(self.max_depth, self._depth)
+        self.visit(node.test)
+        for child in node.body:
+            self.visit(child)
+        if len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If) and node.orelse[0].col_offset == node.col_offset:
+            self.visit_If(node.orelse[0], is_elif=True)
+        else:
+            for child in node.orelse:
+                self.visit(child)
+        if not is_elif:
+            self._depth -= 1
+
+    def _visit_loop(self, node):
+        self.control_flow['loops'] += 1
+        self.decision_points += 1
+        self._visit_block(node)
+
+    visit_For = _visit_loop
+    visit_AsyncFor = _visit_loop
+    visit_While = _visit_loop
+
+    def _visit_try(self, node):
+        self.control_flow['try_catch'] += 1 + len(node.handlers)
+        self.decision_points += len(node.handlers)
+        self._visit_block(node)
+
+    visit_Try = _visit_try
+    visit_TryStar = _visit_try
+
+    def visit_With(self, node):
+        self._visit_block(node)
+
+    visit_AsyncWith = visit_With
+
+    def visit_Match(self, node):
+        self.control_flow['switches'] += 1 + len(node.cases)
+        self.decision_points += len(node.cases)
+        self._visit_block(node)
+
+    def visit_IfExp(self, node):
+        self.decision_points += 1
+        self.generic_visit(node)
+
+    def visit_BoolOp(self, node):
+        self.decision_points += len(node.values) - 1
+        self.generic_visit(node)
+
+    def visit_comprehension(self, node):
+        self.decision_points += 1 + len(node.ifs)
+        self.generic_visit(node)
+
+def parse_python_structure(code: str) -> Optional[PythonStructureVisitor]:
+    """
+    Parse Python code once and collect its structure, or None if it does not parse
+    """
+    try:
+        tree = ast.parse(code)
+        visitor = PythonStructureVisitor()
+        visitor.visit(tree)
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        # Deeply nested input can exhaust the parser's stack instead of failing cleanly
+        return None
+    return visitor
@@ -0,0 +1,79 @@
+"""
+Content-addressed cache for analysis endpoint responses
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from utils.json_utils import NumpyJSONEncoder
+from utils.sqlite_cache import SQLiteCache
+
+class ResultCache:
+    """
+    In-memory LRU cache of analysis results, optionally backed by a disk
+    cache shared between processes. Keys are hashes of everything the
+    result depends on, so a changed input, option, corpus fingerprint or
+    model version simply misses.
+    """
+
+    def __init__(self, max_entries: int = 1024, disk_path: Optional[str] = None, disk_max_entries: int = 20000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk = SQLiteCache(disk_path, max_entries=disk_max_entries) if disk_path else None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(endpoint: str, **parts: Any) -> str:
+        """Hash the endpoint name and every input the result depends on"""
+        material = json.dumps({'endpoint': endpoint, **parts}, sort_keys=True, cls=NumpyJSONEncoder)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached result, or None on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        value = self.disk.get(key) if self.disk else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, value)
+        return value
+
+    def set(self, key: str, value: Any):
+        """Cache a JSON-serializable result"""
+        with self._lock:
+            self._store(key, value)
+        if self.disk:
+            self.disk.set(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'disk_backed': self.disk is not None
+            }
+
+    def _store(self, key: str, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,168 @@
+"""
+Persistent vector index for semantic code search: entries are added and
+removed incrementally, searched with one matrix-vector product, and saved
+to / loaded from a single .npz file
+"""
+import json
+import os
+import re
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+INDEX_FORMAT_VERSION = 1
+_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+def index_path(directory: str, name: str) -> str:
+    """File of the index called name in directory"""
+    if not _NAME_PATTERN.match(name) or name.startswith('.'):
+        raise ValueError(f"Invalid index name: {name!r}")
+    return os.path.join(directory, f'{name}.npz')
+
+class SemanticIndex:
+    """
+    Unit-length embeddings keyed by entry id, with an optional document
+    (e.g. the code) per entry. Scores are cosine similarities.
+    """
+
+    def __init__(self, name: str, model: Optional[str] = None, dim: Optional[int] = None):
+        self.name = name
+        self.model = model
+        self.dim = dim
+        self._ids = []
+        self._documents = []
+        self._positions = {}  # id -> row
+        self._vectors = np.empty((0, dim or 0), dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, entry_id: Any) -> bool:
+        return entry_id in self._positions
+
+    @property
+    def ids(self) -> List[Any]:
+        with self._lock:
+            return list(self._ids)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+    def add(self, ids: Sequence[Any], embeddings: np.ndarray, documents: Optional[Sequence[Any]] = None):
+        """Add entries, replacing the vector and document of ids already in the index"""
+        embeddings = self._normalize(np.atleast_2d(embeddings))
+        if len(ids) != len(embeddings):
+            raise ValueError(f"{len(ids)} ids for {len(embeddings)} embeddings")
+        if documents is not None and len(documents) != len(ids):
+            raise ValueError(f"{len(documents)} documents for {len(ids)} ids")
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = embeddings.shape[1]
+                self._vectors = np.empty((0, self.dim), dtype=np.float32)
+            elif embeddings.shape[1] != self.dim:
+                raise ValueError(f"Embeddings have dimension {embeddings.shape[1]}, index {self.name} has {self.dim}")
+            new_rows = []
+            for i, entry_id in enumerate(ids):
+                document = documents[i] if documents is not None else None
+                position = self._positions.get(entry_id)
+                if position is not None:
+                    self._vectors[position] = embeddings[i]
+                    self._documents[position] = document
+                else:
+                    self._positions[entry_id] = len(self._ids)
+                    self._ids.append(entry_id)
+                    self._documents.append(document)
+                    new_rows.append(embeddings[i])
+            if new_rows:
+                # One concatenation per call keeps incremental adds cheap
+                self._vectors = np.vstack([self._vectors, np.asarray(new_rows, dtype=np.float32)])
+
+    def remove(self, ids: Iterable[Any]) -> int:
+        """Remove entries by id; returns how many were in the index"""
+        with self._lock:
+            drop = {self._positions[entry_id] for entry_id in ids if entry_id in self._positions}
+            if not drop:
+                return 0
+            keep = [row for row in range(len(self._ids)) if row not in drop]
+            self._ids = [self._ids[row] for row in keep]
+            self._documents = [self._documents[row] for row in keep]
+            self._vectors = self._vectors[keep]
+            self._positions = {entry_id: row for row, entry_id in enumerate(self._ids)}
+            return len(drop)
+
+    def vectors(self, ids: Sequence[Any]) -> Optional[np.ndarray]:
+        """Stored vectors of ids, one row each, or None if any id is missing"""
+        with self._lock:
+            if any(entry_id not in self._positions for entry_id in ids):
+                return None
+            return self._vectors[[self._positions[entry_id] for entry_id in ids]]
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Entries most similar to the query, best first"""
+        query = self._normalize(np.asarray(query_embedding).reshape(-1))
+        with self._lock:
+            if not self._ids or top_k <= 0:
+                return []
+            if query.shape[0] != self.dim:
+                raise ValueError(f"Query has dimension {query.shape[0]}, index {self.name} has {self.dim}")
+            scores = self._vectors @ query
+            k = min(top_k, len(scores))
+            # argpartition finds the top k in linear time; only those are sorted
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind='stable')]
+            return [
+                {
+                    'id': self._ids[row],
+                    'document': self._documents[row],
+                    'similarity_score': float(scores[row]),
+                    'index': int(row)
+                }
+                for row in top
+            ]
+
+    def save(self, path: str):
+        """Write the index to path atomically (a reader never sees a partial file)"""
+        with self._lock:
+            meta = json.dumps({
+                'version': INDEX_FORMAT_VERSION,
+                'name': self.name,
+                'model': self.model,
+                'dim': self.dim,
+                'ids': self._ids,
+                'documents': self._documents
+            })
+            vectors = self._vectors.copy()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, vectors=vectors, meta=np.array(meta))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> 'SemanticIndex':
+        """Read an index written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            vectors = data['vectors'].astype(np.float32)
+        if meta.get('version') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format version {meta.get('version')} in {path}")
+        index = cls(meta['name'], meta.get('model'), meta.get('dim'))
+        # JSON turns tuple ids into lists; ids are expected to be strings or numbers
+        index._ids = list(meta['ids'])
+        index._documents = list(meta['documents'])
+        index._positions = {entry_id: row for row, entry_id in enumerate(index._ids)}
+        index._vectors = vectors.reshape(len(index._ids), index.dim or 0)
+        return index
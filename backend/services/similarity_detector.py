@@ -1,5 +1,7 @@
 import numpy as np
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Tuple, Iterator, Optional, Iterable
+from concurrent.futures.process import BrokenProcessPool
+from sklearn.base import clone
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import re
@@ -9,8 +11,21 @@ import torch
 from sentence_transformers import SentenceTransformer
 import hashlib
 import json
-from .cohere_service import CohereService
+from contextlib import ExitStack
+from .canonicalizer import CanonicalCode, canonicalize
+from .cohere_service import CohereService, GenerationScope
+from .pairwise_similarity import (
+    compare_lists, compare_dicts, combine_scores, combine_breakdown, chunk_pairs, score_pair_chunk,
+    structural_similarity_from_features, token_similarity_from_tokens
+)
 from utils.json_utils import convert_numpy_types
+from utils.process_pool import (
+    get_process_pool, discard_process_pool, default_worker_count, process_pool_available
+)
+
+# Below this many pairs the pool's IPC overhead outweighs the parallel speedup
+PARALLEL_MIN_PAIRS = 64
+PAIR_CHUNK_SIZE = 256
 
 class SimilarityDetector:
     """
@@ -26,6 +41,7 @@ class SimilarityDetector:
         self.tokenizer = None
         self.model = None
         self.sentence_model = None
+        self.sentence_model_name = None
         self.cohere_service = CohereService()
         self.tfidf_vectorizer = TfidfVectorizer(
             ngram_range=(1, 3),
@@ -40,6 +56,9 @@ class SimilarityDetector:
         # In-memory database for demo purposes
         # In production, this would be a proper database
         self.code_database = []
+        # Running hash of the entries' contents, so cached results can be invalidated.
+        # Processes holding the same corpus agree on it, unlike a per-process counter
+        self.database_fingerprint = ''
         self._load_sample_database()
     
     def _initialize_models(self):
@@ -47,12 +66,14 @@ class SimilarityDetector:
         try:
             # Use better sentence transformer for code similarity
             self.sentence_model = SentenceTransformer('all-mpnet-base-v2')
+            self.sentence_model_name = 'all-mpnet-base-v2'
             print("Sentence transformer model loaded successfully")
         except Exception as e:
             print(f"Warning: Could not load sentence transformer model: {e}")
             try:
                 # Fallback to lighter model
                 self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
+                self.sentence_model_name = 'all-MiniLM-L6-v2'
                 print("Fallback sentence transformer model loaded")
             except Exception as e2:
                 print(f"Could not load any sentence transformer model: {e2}")
@@ -109,7 +130,19 @@ def binary_search(arr, target):
             }
         ]
         
-        self.code_database.extend(sample_codes)
+        for entry in sample_codes:
+            self._append_entry(entry)
+    
+    def _append_entry(self, entry: Dict[str, Any]):
+        """Add an entry to the database and fold its contents into the fingerprint"""
+        self.code_database.append(entry)
+        material = self.database_fingerprint + json.dumps(entry, sort_keys=True)
+        self.database_fingerprint = hashlib.sha256(material.encode('utf-8', 'surrogatepass')).hexdigest()
+    
+    @property
+    def model_version(self) -> str:
+        """Identifies the models whose output feeds the similarity scores"""
+        return f"{self.model_name}|{self.sentence_model_name or 'none'}"
     
     def find_similar_code(self, code: str, language: str, check_database: bool = True) -> Dict[str, Any]:
         """
@@ -133,8 +166,13 @@ def binary_search(arr, target):
         
         results['total_checked'] = len(candidates)
         
+        # The submitted code is canonicalized once for all candidates
+        canonical = canonicalize(code, language)
         for candidate in candidates:
-            similarity_score = self.calculate_similarity(code, candidate['code'], language)
+            breakdown = self._breakdown(
+                canonical, canonicalize(candidate['code'], candidate['language']), code, candidate['code'], language
+            )
+            similarity_score = combine_breakdown(breakdown)
             
             if similarity_score > 0.3:  # Lower threshold for reporting
                 match = {
@@ -144,7 +182,7 @@ def binary_search(arr, target):
                     'description': candidate.get('description', 'No description'),
                     'source': candidate.get('source', 'unknown'),
                     'language': candidate['language'],
-                    'similarity_breakdown': self.get_similarity_breakdown(code, candidate['code'], language)
+                    'similarity_breakdown': breakdown
                 }
                 results['matches'].append(match)
                 
@@ -168,32 +206,8 @@ def binary_search(arr, target):
         """
         Calculate overall similarity score between two code snippets
         """
-        # Normalize codes
-        norm_code1 = self.normalize_for_comparison(code1)
-        norm_code2 = self.normalize_for_comparison(code2)
-        
-        # Calculate different similarity metrics
-        semantic_sim = self.semantic_similarity(norm_code1, norm_code2)
-        structural_sim = self.structural_similarity(code1, code2, language)
-        textual_sim = self.textual_similarity(norm_code1, norm_code2)
-        token_sim = self.token_similarity(norm_code1, norm_code2)
-        
         # Weighted combination of similarities
-        weights = {
-            'semantic': 0.4,
-            'structural': 0.3,
-            'textual': 0.2,
-            'token': 0.1
-        }
-        
-        overall_similarity = (
-            weights['semantic'] * semantic_sim +
-            weights['structural'] * structural_sim +
-            weights['textual'] * textual_sim +
-            weights['token'] * token_sim
-        )
-        
-        return float(min(overall_similarity, 1.0))
+        return combine_breakdown(self.get_similarity_breakdown(code1, code2, language))
     
     def semantic_similarity(self, code1: str, code2: str) -> float:
         """
@@ -222,32 +236,16 @@ def binary_search(arr, target):
         features1 = self.extract_structural_features(code1, language)
         features2 = self.extract_structural_features(code2, language)
         
-        # Compare features
-        similarity_scores = []
-        
-        # Compare function signatures
-        func_sim = self.compare_lists(features1['functions'], features2['functions'])
-        similarity_scores.append(func_sim)
-        
-        # Compare control flow patterns
-        control_sim = self.compare_dicts(features1['control_flow'], features2['control_flow'])
-        similarity_scores.append(control_sim)
-        
-        # Compare variable patterns
-        var_sim = self.compare_lists(features1['variables'], features2['variables'])
-        similarity_scores.append(var_sim * 0.5)  # Lower weight for variables
-        
-        return np.mean(similarity_scores) if similarity_scores else 0.0
+        return structural_similarity_from_features(features1, features2)
     
     def textual_similarity(self, code1: str, code2: str) -> float:
         """
         Calculate textual similarity using TF-IDF
         """
+        return self._textual_similarity_from_tokens(self.tokenize_code(code1), self.tokenize_code(code2))
+    
+    def _textual_similarity_from_tokens(self, tokens1: List[str], tokens2: List[str]) -> float:
         try:
-            # Tokenize code into meaningful tokens
-            tokens1 = self.tokenize_code(code1)
-            tokens2 = self.tokenize_code(code2)
-            
             if not tokens1 or not tokens2:
                 return 0.0
             
@@ -272,12 +270,7 @@ def binary_search(arr, target):
         tokens1 = self.tokenize_code(code1)
         tokens2 = self.tokenize_code(code2)
         
-        if not tokens1 or not tokens2:
-            return 0.0
-        
-        # Use sequence matcher for token similarity
-        matcher = difflib.SequenceMatcher(None, tokens1, tokens2)
-        return matcher.ratio()
+        return token_similarity_from_tokens(tokens1, tokens2)
     
     def extract_structural_features(self, code: str, language: str) -> Dict[str, Any]:
         """
@@ -316,103 +309,46 @@ def binary_search(arr, target):
         
         return features
     
-    def tokenize_code(self, code: str) -> List[str]:
+    def tokenize_code(self, code: str, language: str = 'auto') -> List[str]:
         """
         Tokenize code into meaningful tokens
         """
-        # Remove comments and strings for better tokenization
-        cleaned_code = re.sub(r'#.*$', '', code, flags=re.MULTILINE)  # Python comments
-        cleaned_code = re.sub(r'//.*$', '', cleaned_code, flags=re.MULTILINE)  # JS/Java comments
-        cleaned_code = re.sub(r'/\*.*?\*/', '', cleaned_code, flags=re.DOTALL)  # Multi-line comments
-        cleaned_code = re.sub(r'["\'].*?["\']', 'STRING', cleaned_code)  # String literals
-        
-        # Tokenize using regex
-        tokens = re.findall(r'\b\w+\b|[{}();,]', cleaned_code)
-        
-        # Filter out common noise tokens
-        noise_tokens = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'}
-        meaningful_tokens = [token.lower() for token in tokens if token.lower() not in noise_tokens and len(token) > 1]
-        
-        return meaningful_tokens
+        return canonicalize(code, language).tokens
     
-    def normalize_for_comparison(self, code: str) -> str:
+    def normalize_for_comparison(self, code: str, language: str = 'auto') -> str:
         """
         Normalize code for better comparison
         """
-        # Remove excessive whitespace
-        normalized = re.sub(r'\s+', ' ', code)
-        
-        # Remove comments
-        normalized = re.sub(r'#.*$', '', normalized, flags=re.MULTILINE)
-        normalized = re.sub(r'//.*$', '', normalized, flags=re.MULTILINE)
-        normalized = re.sub(r'/\*.*?\*/', '', normalized, flags=re.DOTALL)
-        
-        # Normalize brackets and parentheses
-        normalized = re.sub(r'\s*([{}();\[\],])\s*', r'\1', normalized)
-        
-        return normalized.strip().lower()
+        return canonicalize(code, language).normalized
     
     def compare_lists(self, list1: List[str], list2: List[str]) -> float:
         """
         Compare two lists and return similarity score
         """
-        if not list1 and not list2:
-            return 1.0
-        if not list1 or not list2:
-            return 0.0
-        
-        set1 = set(list1)
-        set2 = set(list2)
-        
-        intersection = len(set1.intersection(set2))
-        union = len(set1.union(set2))
-        
-        return intersection / union if union > 0 else 0.0
+        return compare_lists(list1, list2)
     
     def compare_dicts(self, dict1: Dict, dict2: Dict) -> float:
         """
         Compare two dictionaries and return similarity score
         """
-        if not dict1 and not dict2:
-            return 1.0
-        if not dict1 or not dict2:
-            return 0.0
-        
-        all_keys = set(dict1.keys()).union(set(dict2.keys()))
-        if not all_keys:
-            return 1.0
-        
-        similarities = []
-        for key in all_keys:
-            val1 = dict1.get(key, 0)
-            val2 = dict2.get(key, 0)
-            
-            if val1 == 0 and val2 == 0:
-                similarities.append(1.0)
-            elif val1 == 0 or val2 == 0:
-                similarities.append(0.0)
-            else:
-                # Normalized similarity for numeric values
-                similarity = 1.0 - abs(val1 - val2) / max(val1, val2)
-                similarities.append(max(0.0, similarity))
-        
-        return np.mean(similarities)
+        return compare_dicts(dict1, dict2)
     
     def get_similarity_breakdown(self, code1: str, code2: str, language: str) -> Dict[str, float]:
         """
         Get detailed breakdown of similarity scores
         """
-        norm_code1 = self.normalize_for_comparison(code1)
-        norm_code2 = self.normalize_for_comparison(code2)
-        
-        breakdown = {
-            'semantic_similarity': self.semantic_similarity(norm_code1, norm_code2),
+        return self._breakdown(
+            canonicalize(code1, language), canonicalize(code2, language), code1, code2, language
+        )
+    
+    def _breakdown(self, canonical1: CanonicalCode, canonical2: CanonicalCode,
+                   code1: str, code2: str, language: str) -> Dict[str, float]:
+        return {
+            'semantic_similarity': self.semantic_similarity(canonical1.normalized, canonical2.normalized),
             'structural_similarity': self.structural_similarity(code1, code2, language),
-            'textual_similarity': self.textual_similarity(norm_code1, norm_code2),
-            'token_similarity': self.token_similarity(norm_code1, norm_code2)
+            'textual_similarity': self._textual_similarity_from_tokens(canonical1.tokens, canonical2.tokens),
+            'token_similarity': token_similarity_from_tokens(canonical1.tokens, canonical2.tokens)
         }
-        
-        return breakdown
     
     def detailed_comparison(self, code1: str, code2: str, language: str) -> Dict[str, Any]:
         """
@@ -439,7 +375,7 @@ def binary_search(arr, target):
         
         result = {
             'similarity_breakdown': breakdown,
-            'overall_similarity': self.calculate_similarity(code1, code2, language),
+            'overall_similarity': combine_breakdown(breakdown),
             'structural_comparison': {
                 'common_functions': list(common_functions),
                 'different_functions': different_functions,
@@ -459,6 +395,198 @@ def binary_search(arr, target):
         
         return convert_numpy_types(result)
     
+    def prepare_snippets(self, codes: List[str], language: str) -> List[Dict[str, Any]]:
+        """
+        Preprocess each snippet once for all-pairs comparison
+        """
+        prepared = []
+        for code in codes:
+            canonical = canonicalize(code, language)
+            prepared.append({
+                'normalized': canonical.normalized,
+                'tokens': canonical.tokens,
+                'features': self.extract_structural_features(code, language)
+            })
+        return prepared
+
+    def semantic_embeddings(self, normalized_codes: List[str]) -> Optional[np.ndarray]:
+        """
+        L2-normalized sentence embeddings for a batch of snippets, from one encode call
+        """
+        if not self.sentence_model or not normalized_codes:
+            return None
+
+        try:
+            embeddings = np.asarray(self.sentence_model.encode(normalized_codes), dtype=np.float64)
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            return embeddings / norms
+        except Exception as e:
+            print(f"Error in semantic embeddings: {e}")
+            return None
+
+    def ngram_counts(self, token_lists: List[List[str]]):
+        """
+        Raw n-gram counts of a batch of token lists, one row each, using the
+        pairwise TF-IDF analyzer with no feature cap (or None if no snippet has
+        any n-gram)
+        """
+        if not any(token_lists):
+            return None
+
+        try:
+            counter = clone(self.tfidf_vectorizer).set_params(max_features=None, use_idf=False, norm=None)
+            return counter.fit_transform([' '.join(tokens) for tokens in token_lists]).tocsr().astype(np.float64)
+        except ValueError:
+            # Empty vocabulary: every snippet is made of one-character tokens
+            return None
+
+    def textual_pair_scores(self, token_lists: List[List[str]], pairs: List[Tuple[int, int]]) -> np.ndarray:
+        """
+        TF-IDF cosine similarity of each pair, equal to textual_similarity on
+        the two snippets alone: IDF comes from the pair, not the batch, so a
+        pair scores the same in /api/compare, batch analysis and cohort sweeps.
+        Counts are gathered once per batch; pairs whose combined n-grams exceed
+        the vectorizer's max_features are refitted like textual_similarity.
+        """
+        scores = np.zeros(len(pairs))
+        counts = self.ngram_counts(token_lists)
+        if counts is None or not pairs:
+            return scores
+
+        present = (counts > 0).astype(np.float64)
+        squares = counts.multiply(counts).tocsr()
+        square_sums = np.asarray(squares.sum(axis=1)).ravel()
+        distinct = np.diff(counts.indptr)
+        # Smoothed IDF of a term in both snippets is 1; in only one of them:
+        one_doc_idf = 1.0 + (np.log(3 / 2) if self.tfidf_vectorizer.smooth_idf else np.log(2))
+        max_features = self.tfidf_vectorizer.max_features
+
+        for start in range(0, len(pairs), 10000):
+            chunk = pairs[start:start + 10000]
+            left = np.array([i for i, _ in chunk])
+            right = np.array([j for _, j in chunk])
+            dot = np.asarray(counts[left].multiply(counts[right]).sum(axis=1)).ravel()
+            shared = np.asarray(present[left].multiply(present[right]).sum(axis=1)).ravel()
+            left_shared = np.asarray(squares[left].multiply(present[right]).sum(axis=1)).ravel()
+            right_shared = np.asarray(squares[right].multiply(present[left]).sum(axis=1)).ravel()
+            left_norm = np.sqrt(left_shared + one_doc_idf ** 2 * (square_sums[left] - left_shared))
+            right_norm = np.sqrt(right_shared + one_doc_idf ** 2 * (square_sums[right] - right_shared))
+            norms = left_norm * right_norm
+            chunk_scores = np.divide(dot, norms, out=np.zeros_like(dot), where=norms > 0)
+
+            if max_features is not None:
+                for k in np.flatnonzero(distinct[left] + distinct[right] - shared > max_features):
+                    chunk_scores[k] = self._textual_similarity_from_tokens(token_lists[left[k]], token_lists[right[k]])
+            scores[start:start + len(chunk)] = chunk_scores
+
+        return np.clip(scores, 0.0, 1.0)
+
+    def semantic_similarity_matrix(self, normalized_codes: List[str]) -> np.ndarray:
+        """
+        Semantic similarity of every snippet against every other
+        """
+        n = len(normalized_codes)
+        embeddings = self.semantic_embeddings(normalized_codes)
+        if embeddings is None:
+            return np.zeros((n, n))
+        return np.clip(embeddings @ embeddings.T, 0.0, None)
+
+    def iter_pairwise_similarities(self, codes: List[str], language: str = 'auto',
+                                   pairs: Optional[Iterable[Tuple[int, int]]] = None,
+                                   workers: Optional[int] = None,
+                                   include_breakdown: bool = False,
+                                   prepared: Optional[List[Dict[str, Any]]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Score pairs of snippets with the same weights as calculate_similarity.
+
+        Every snippet is preprocessed once (or ``prepared`` is reused), semantic
+        similarities come from batched vector products, TF-IDF similarities from
+        n-gram counts gathered once (with per-pair IDF, so scores match
+        calculate_similarity), and the structural and token metrics are spread across a persistent process pool.
+        Defaults to all n(n-1)/2 pairs; rows are yielded in pair order as they
+        are computed.
+        """
+        if prepared is None:
+            prepared = self.prepare_snippets(codes, language)
+
+        if pairs is None:
+            n = len(prepared)
+            semantic = self.semantic_similarity_matrix([p['normalized'] for p in prepared])
+            pairs = [(i, j) for i in range(n) for j in range(i + 1, n)]
+            semantic_scores = {pair: semantic[pair] for pair in pairs}
+            textual_scores = dict(zip(pairs, self.textual_pair_scores([p['tokens'] for p in prepared], pairs)))
+        else:
+            # Only the requested pairs are scored, keeping the cost linear in len(pairs)
+            pairs = list(pairs)
+            semantic_scores, textual_scores = self._vector_pair_scores(prepared, pairs)
+
+        workers = workers or default_worker_count()
+        tasks = []
+        for chunk in chunk_pairs(pairs, PAIR_CHUNK_SIZE):
+            indices = {index for pair in chunk for index in pair}
+            snippets = {index: (prepared[index]['features'], prepared[index]['tokens']) for index in indices}
+            tasks.append((chunk, snippets))
+
+        for chunk_scores in self._score_pair_tasks(tasks, workers, parallel=len(pairs) >= PARALLEL_MIN_PAIRS):
+            for i, j, structural_sim, token_sim in chunk_scores:
+                semantic_sim = float(semantic_scores[(i, j)])
+                textual_sim = float(textual_scores[(i, j)])
+                row = {
+                    'code1_index': i,
+                    'code2_index': j,
+                    'similarity_score': combine_scores(semantic_sim, structural_sim, textual_sim, token_sim)
+                }
+                if include_breakdown:
+                    row['similarity_breakdown'] = {
+                        'semantic_similarity': semantic_sim,
+                        'structural_similarity': structural_sim,
+                        'textual_similarity': textual_sim,
+                        'token_similarity': token_sim
+                    }
+                yield row
+
+    def _vector_pair_scores(self, prepared: List[Dict[str, Any]], pairs: List[Tuple[int, int]]) -> Tuple[Dict, Dict]:
+        """
+        Semantic and TF-IDF similarities for an explicit list of pairs
+        """
+        semantic_scores = dict.fromkeys(pairs, 0.0)
+        textual_scores = dict.fromkeys(pairs, 0.0)
+        if not pairs:
+            return semantic_scores, textual_scores
+
+        left = np.array([i for i, _ in pairs])
+        right = np.array([j for _, j in pairs])
+
+        embeddings = self.semantic_embeddings([p['normalized'] for p in prepared])
+        if embeddings is not None:
+            values = np.clip(np.einsum('ij,ij->i', embeddings[left], embeddings[right]), 0.0, None)
+            semantic_scores = dict(zip(pairs, values))
+
+        textual_scores = dict(zip(pairs, self.textual_pair_scores([p['tokens'] for p in prepared], pairs)))
+
+        return semantic_scores, textual_scores
+
+    def _score_pair_tasks(self, tasks: List[Tuple], workers: int, parallel: bool) -> Iterator[List[Tuple]]:
+        """
+        Run score_pair_chunk over the tasks, in the process pool when worthwhile.
+        Falls back to scoring in-process if the pool is unavailable.
+        """
+        completed = 0
+        if parallel and workers > 1 and process_pool_available():
+            try:
+                pool = get_process_pool(workers)
+                for chunk_scores in pool.map(score_pair_chunk, tasks):
+                    completed += 1
+                    yield chunk_scores
+                return
+            except (BrokenProcessPool, OSError) as e:
+                print(f"Process pool unavailable, scoring pairs in-process: {e}")
+                discard_process_pool(workers)
+
+        for task in tasks[completed:]:
+            yield score_pair_chunk(task)
+
     def add_to_database(self, code: str, language: str, description: str = '', source: str = 'user'):
         """
         Add code snippet to the comparison database
@@ -477,12 +605,18 @@ def binary_search(arr, target):
             if existing.get('hash') == new_entry['hash']:
                 return False  # Duplicate found
         
-        self.code_database.append(new_entry)
+        self._append_entry(new_entry)
+        
+        # Embed the new entry now so Cohere searches only embed the query
+        if self.cohere_service.is_available():
+            self.cohere_service.index_documents([code])
         return True
     
-    def find_similar_code_with_cohere(self, code: str, language: str, check_database: bool = True) -> Dict[str, Any]:
+    def find_similar_code_with_cohere(self, code: str, language: str, check_database: bool = True,
+                                      scope: Optional[GenerationScope] = None) -> Dict[str, Any]:
         """
-        Enhanced similarity detection using Cohere API for better semantic understanding
+        Enhanced similarity detection using Cohere API for better semantic understanding.
+        scope shares generate calls with the rest of the request.
         """
         results = {
             'matches': [],
@@ -494,10 +628,14 @@ def binary_search(arr, target):
             'code_intent': None
         }
         
-        # Get Cohere analysis first
+        # Get Cohere analysis first; both calls run concurrently
         if self.cohere_service.is_available():
-            results['cohere_analysis'] = self.cohere_service.analyze_code_intent(code)
-            results['code_intent'] = self.cohere_service.classify_code_type(code)
+            with ExitStack() as stack:
+                if scope is None:
+                    scope = stack.enter_context(self.cohere_service.generation_scope())
+                self.cohere_service.prefetch_code_insights(code, scope, ('intent', 'classification'))
+                results['cohere_analysis'] = self.cohere_service.analyze_code_intent(code, scope)
+                results['code_intent'] = self.cohere_service.classify_code_type(code, scope)
         
         if not check_database or not self.code_database:
             return results
@@ -510,42 +648,53 @@ def binary_search(arr, target):
         results['total_checked'] = len(candidates)
         
         # Use Cohere for semantic similarity if available
+        cohere_matches = None
         if self.cohere_service.is_available():
             db_codes = [candidate['code'] for candidate in candidates]
             cohere_matches = self.cohere_service.find_similar_code_semantic(code, db_codes, top_k=10)
-            
-            if cohere_matches:
-                for match in cohere_matches:
-                    candidate = candidates[match['index']]
-                    
-                    # Combine Cohere similarity with traditional methods
-                    traditional_score = self.calculate_similarity(code, candidate['code'], language)
-                    cohere_score = match['similarity']
-                    
-                    # Weighted combination (60% Cohere, 40% traditional)
-                    combined_score = 0.6 * cohere_score + 0.4 * traditional_score
+        
+        if cohere_matches is not None:
+            canonical = canonicalize(code, language)
+            for match in cohere_matches:
+                candidate = candidates[match['index']]
+                
+                # Combine Cohere similarity with traditional methods
+                breakdown = self._breakdown(
+                    canonical, canonicalize(candidate['code'], candidate['language']),
+                    code, candidate['code'], language
+                )
+                traditional_score = combine_breakdown(breakdown)
+                cohere_score = match['similarity']
+                
+                # Weighted combination (60% Cohere, 40% traditional)
+                combined_score = 0.6 * cohere_score + 0.4 * traditional_score
+                
+                if combined_score > 0.3:
+                    match_result = {
+                        'id': candidate['id'],
+                        'similarity_score': combined_score,
+                        'cohere_similarity': cohere_score,
+                        'traditional_similarity': traditional_score,
+                        'code_snippet': candidate['code'][:200] + '...' if len(candidate['code']) > 200 else candidate['code'],
+                        'description': candidate.get('description', 'No description'),
+                        'source': candidate.get('source', 'unknown'),
+                        'language': candidate['language'],
+                        'similarity_breakdown': breakdown,
+                        'enhanced_with_cohere': True
+                    }
+                    results['matches'].append(match_result)
                     
-                    if combined_score > 0.3:
-                        match_result = {
-                            'id': candidate['id'],
-                            'similarity_score': combined_score,
-                            'cohere_similarity': cohere_score,
-                            'traditional_similarity': traditional_score,
-                            'code_snippet': candidate['code'][:200] + '...' if len(candidate['code']) > 200 else candidate['code'],
-                            'description': candidate.get('description', 'No description'),
-                            'source': candidate.get('source', 'unknown'),
-                            'language': candidate['language'],
-                            'similarity_breakdown': self.get_similarity_breakdown(code, candidate['code'], language),
-                            'enhanced_with_cohere': True
-                        }
-                        results['matches'].append(match_result)
-                        
-                        if combined_score > results['highest_similarity']:
-                            results['highest_similarity'] = combined_score
+                    if combined_score > results['highest_similarity']:
+                        results['highest_similarity'] = combined_score
         
         else:
-            # Fallback to traditional method if Cohere is not available
-            return self.find_similar_code(code, language, check_database)
+            # Fallback to traditional method if Cohere is not available, failed
+            # or its circuit breaker is open
+            fallback = self.find_similar_code(code, language, check_database)
+            fallback['cohere_analysis'] = results['cohere_analysis']
+            fallback['code_intent'] = results['code_intent']
+            fallback['fallback_used'] = True
+            return fallback
         
         # Sort matches by similarity score
         results['matches'].sort(key=lambda x: x['similarity_score'], reverse=True)
@@ -562,28 +711,33 @@ def binary_search(arr, target):
         
         return results
     
-    def get_cohere_code_analysis(self, code: str) -> Dict[str, Any]:
+    def get_cohere_code_analysis(self, code: str, scope: Optional[GenerationScope] = None) -> Dict[str, Any]:
         """
-        Get comprehensive code analysis using Cohere
+        Get comprehensive code analysis using Cohere.
+        The three analyses run concurrently; scope shares them with the rest of the request.
         """
         if not self.cohere_service.is_available():
             return {'error': 'Cohere service not available'}
         
         analysis = {}
-        
-        # Get code intent analysis
-        intent = self.cohere_service.analyze_code_intent(code)
-        if intent:
-            analysis['intent_analysis'] = intent
-        
-        # Get pattern detection
-        patterns = self.cohere_service.detect_code_patterns(code)
-        if patterns:
-            analysis['pattern_analysis'] = patterns
-        
-        # Get code classification
-        classification = self.cohere_service.classify_code_type(code)
-        if classification:
-            analysis['classification'] = classification
+        with ExitStack() as stack:
+            if scope is None:
+                scope = stack.enter_context(self.cohere_service.generation_scope())
+            self.cohere_service.prefetch_code_insights(code, scope)
+            
+            # Get code intent analysis
+            intent = self.cohere_service.analyze_code_intent(code, scope)
+            if intent:
+                analysis['intent_analysis'] = intent
+            
+            # Get pattern detection
+            patterns = self.cohere_service.detect_code_patterns(code, scope)
+            if patterns:
+                analysis['pattern_analysis'] = patterns
+            
+            # Get code classification
+            classification = self.cohere_service.classify_code_type(code, scope)
+            if classification:
+                analysis['classification'] = classification
         
         return analysis
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Command-line cohort sweep: compare every submission of an assignment
+against every other and report clusters of suspiciously similar code.
+
+Usage:
+    python sweep_cohort.py submissions/ --language python --template starter.py
+"""
+import argparse
+import json
+import os
+import sys
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.similarity_detector import SimilarityDetector
+from services.cohort_sweep import CohortSweep
+from utils.validators import allowed_file
+from utils.json_utils import convert_numpy_types
+
+def collect_submissions(paths):
+    """Read every supported source file under the given files and directories"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names if allowed_file(name))
+        else:
+            files.append(path)
+
+    submissions = []
+    for file_path in sorted(files):
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            submissions.append({'id': file_path, 'code': f.read()})
+    return submissions
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep a cohort of submissions for plagiarism')
+    parser.add_argument('paths', nargs='+', help='Submission files or directories')
+    parser.add_argument('--language', default='auto', help='Programming language of the submissions')
+    parser.add_argument('--threshold', type=float, default=0.7, help='Similarity score at which a pair is flagged')
+    parser.add_argument('--template', action='append', default=[], help='Starter code file to ignore (repeatable)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for pair scoring')
+    parser.add_argument('--output', help='Write the full JSON result to this file')
+    args = parser.parse_args()
+
+    submissions = collect_submissions(args.paths)
+    if len(submissions) < 2:
+        print("Need at least two submissions to sweep")
+        return 1
+
+    templates = []
+    for template_path in args.template:
+        with open(template_path, 'r', encoding='utf-8', errors='replace') as f:
+            templates.append(f.read())
+
+    print(f"Sweeping {len(submissions)} submissions...")
+    sweep = CohortSweep(SimilarityDetector(), threshold=args.threshold)
+    result = convert_numpy_types(sweep.run(submissions, args.language, template_codes=templates, workers=args.workers))
+
+    stats = result['statistics']
+    print(f"Scored {stats['candidate_pairs']} of {stats['total_pairs']} pairs "
+          f"({stats['pruned_ratio'] * 100:.1f}% pruned), {stats['flagged_pairs']} flagged")
+
+    for number, cluster in enumerate(result['clusters'], 1):
+        print(f"\nCluster {number}: {cluster['size']} submissions, "
+              f"max similarity {cluster['max_similarity'] * 100:.1f}%")
+        for member in cluster['members']:
+            print(f"  {member}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nFull results written to {args.output}")
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
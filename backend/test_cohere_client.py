@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Test the Cohere HTTP client's retries, deadline and bulk embedding against
+a local fake Cohere server (no API key or network needed)
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+class FakeCohere(BaseHTTPRequestHandler):
+    """
+    Answers POST /v1/embed with one-number embeddings (the text parsed as a
+    float). Responses queued in `script` as (status, headers) are sent
+    first, one per request, before requests succeed again.
+    """
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    script = []
+    requests = []
+    in_flight = 0
+    peak_in_flight = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])) or b'{}')
+        if self.path != '/v1/embed':
+            return self._reply(404, {'message': f'no fake for {self.path}'})
+        with FakeCohere.lock:
+            FakeCohere.requests.append(time.monotonic())
+            scripted = FakeCohere.script.pop(0) if FakeCohere.script else None
+        if scripted is not None:
+            status, headers = scripted
+            return self._reply(status, {'message': 'scripted failure'}, headers)
+        texts = body['texts']
+        with FakeCohere.lock:
+            FakeCohere.in_flight += 1
+            FakeCohere.peak_in_flight = max(FakeCohere.peak_in_flight, FakeCohere.in_flight)
+        try:
+            # Later batches answer sooner, so responses arrive out of order
+            time.sleep(0.05 / (1 + float(texts[0]) / 96))
+            self._reply(200, {'id': 'fake', 'embeddings': [[float(text)] for text in texts]})
+        finally:
+            with FakeCohere.lock:
+                FakeCohere.in_flight -= 1
+
+def start_fake_cohere():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeCohere)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+_server = start_fake_cohere()
+_data_dir = tempfile.mkdtemp()
+os.environ.update({
+    'COHERE_API_KEY': 'test-key',
+    'COHERE_API_URL': f'http://127.0.0.1:{_server.server_port}',
+    'COHERE_EMBEDDING_STORE_PATH': os.path.join(_data_dir, 'embeddings.sqlite3'),
+    'COHERE_GENERATION_CACHE_PATH': '',
+    'COHERE_REQUESTS_PER_MINUTE': '60000',
+    'COHERE_RATE_LIMIT_BURST': '8',
+    # Scripted failures must not open the circuit breaker between tests
+    'COHERE_BREAKER_MIN_CALLS': '100000'
+})
+
+from services import cohere_service
+from services.cohere_service import CohereRequestError, CohereService
+from services.cohere_async import AsyncCohereService
+from utils.circuit_breaker import CircuitBreaker
+
+# Keep backoff short; Retry-After still sets a floor on the delay
+cohere_service.RETRY_BACKOFF_BASE = 0.01
+
+def reset(script=()):
+    with FakeCohere.lock:
+        FakeCohere.script = list(script)
+        FakeCohere.requests = []
+        FakeCohere.peak_in_flight = 0
+
+def test_retry_after_is_honoured():
+    reset([(429, {'Retry-After': '1'})])
+    started = time.monotonic()
+    embeddings = CohereService().embed_bulk(['1', '2'])
+    assert embeddings.tolist() == [[1.0], [2.0]]
+    assert len(FakeCohere.requests) == 2
+    assert FakeCohere.requests[1] - FakeCohere.requests[0] >= 1.0
+    assert time.monotonic() - started >= 1.0
+
+def test_server_errors_are_retried():
+    reset([(500, {}), (502, {}), (503, {})])
+    embeddings = CohereService().embed_bulk(['7'])
+    assert embeddings.tolist() == [[7.0]]
+    assert len(FakeCohere.requests) == 4
+
+def test_client_errors_are_not_retried():
+    reset([(400, {})])
+    try:
+        CohereService().embed_bulk(['1'])
+    except CohereRequestError as e:
+        assert e.status == 400
+    else:
+        raise AssertionError('400 should raise CohereRequestError')
+    assert len(FakeCohere.requests) == 1
+
+def test_deadline_stops_retries():
+    reset([(503, {'Retry-After': '2'})] * 100)
+    service = CohereService()
+    service.call_deadline = 1.0
+    started = time.monotonic()
+    try:
+        service.embed_bulk(['1'])
+    except CohereRequestError as e:
+        assert e.status == 503
+    else:
+        raise AssertionError('a call past its deadline should raise CohereRequestError')
+    # Waiting out Retry-After would pass the deadline, so the call gives up at once
+    assert time.monotonic() - started < 1.0
+    assert len(FakeCohere.requests) == 1
+
+def test_bulk_embeddings_keep_input_order():
+    reset([(503, {}), (429, {})])
+    texts = [str(i) for i in range(1000)]
+    embeddings = CohereService().embed_bulk(texts)
+    assert embeddings[:, 0].tolist() == [float(text) for text in texts]
+    # 11 batches of at most 96 texts, plus the two retried requests
+    assert len(FakeCohere.requests) == 13
+
+def test_rate_limiting_is_not_a_breaker_failure():
+    reset([(429, {}), (429, {}), (503, {})])
+    service = CohereService()
+    service.breaker = CircuitBreaker('cohere-test', min_calls=100000)
+    service.embed_bulk(['1'])
+    assert service.breaker.snapshot()['recent_calls'] == 4
+    assert service.breaker.snapshot()['recent_failures'] == 1
+
+    reset([(429, {}), (503, {})])
+
+    async def embed():
+        async with AsyncCohereService() as async_service:
+            async_service.breaker = CircuitBreaker('cohere-async-test', min_calls=100000)
+            await async_service.embed_bulk(['1'])
+            return async_service.breaker.snapshot()
+
+    snapshot = asyncio.run(embed())
+    assert snapshot['recent_calls'] == 3
+    assert snapshot['recent_failures'] == 1
+
+def test_async_bulk_embeddings_keep_input_order():
+    reset([(429, {'Retry-After': '0.2'}), (500, {})])
+
+    async def embed(texts):
+        async with AsyncCohereService(concurrency=8) as service:
+            return await service.embed_bulk(texts)
+
+    texts = [str(i) for i in range(1000)]
+    embeddings = asyncio.run(embed(texts))
+    assert embeddings[:, 0].tolist() == [float(text) for text in texts]
+    assert len(FakeCohere.requests) == 13
+
+def test_burst_lets_batches_run_concurrently():
+    reset()
+    service = CohereService()
+    service.rate_limiter = cohere_service.get_rate_limiter('cohere:burst-test', 1.0, capacity=4)
+    started = time.monotonic()
+    service.embed_bulk([str(i) for i in range(4 * 96)])
+    # Four batches fit in the burst: they start together instead of a second apart
+    assert FakeCohere.peak_in_flight > 1
+    assert time.monotonic() - started < 1.0
+
+if __name__ == '__main__':
+    print("🧪 Testing the Cohere client against a fake Cohere server\n")
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"   ✅ {name}")
+    _server.shutdown()
@@ -0,0 +1,144 @@
+"""
+Circuit breaker for calls to external services.
+
+Outcomes of recent calls (failed or not, and how long they took) are kept
+in a sliding window. When too many of them failed or were slow the breaker
+opens and callers skip the service; after a cool-down one probe call is let
+through and its outcome closes the breaker or opens it again.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Dict
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the breaker is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_in:.1f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+class CircuitBreaker:
+    """
+    Opens when, among the last `window` calls (and at least `min_calls`),
+    the share of failures reaches `failure_rate` or the share of calls
+    slower than `slow_call_seconds` reaches `slow_call_rate`
+    """
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 5, failure_rate: float = 0.5,
+                 slow_call_seconds: float = 5.0, slow_call_rate: float = 0.8, open_seconds: float = 30.0):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)  # (failed, slow) of recent calls
+        self._opened_at = 0.0
+        self._probing = False
+        self._opened_count = 0
+        self._rejected_count = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go ahead now. In the half-open state only one
+        probe call at a time is allowed; its outcome must be recorded.
+        """
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self._rejected_count += 1
+            return False
+
+    def is_open(self) -> bool:
+        """True while calls are being refused (a probe may still be due)"""
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self._opened_at < self.open_seconds
+
+    def retry_in(self) -> float:
+        """Seconds until the next probe call is allowed"""
+        with self._lock:
+            return self._retry_in()
+
+    def _retry_in(self) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+
+    def record(self, duration: float, failed: bool = False):
+        """Record the outcome of an allowed call"""
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if failed or slow:
+                    self._open()
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                return
+            self._outcomes.append((failed, slow))
+            if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+                failures = sum(1 for outcome in self._outcomes if outcome[0])
+                slow_calls = sum(1 for outcome in self._outcomes if outcome[1])
+                if (failures >= self.failure_rate * len(self._outcomes)
+                        or slow_calls >= self.slow_call_rate * len(self._outcomes)):
+                    self._open()
+
+    def release(self):
+        """Give back an allowed call whose outcome is unknown (e.g. it was cancelled)"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._opened_count += 1
+        self._outcomes.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """State and recent statistics, for health output"""
+        with self._lock:
+            calls = len(self._outcomes)
+            snapshot = {
+                'state': self.state,
+                'recent_calls': calls,
+                'recent_failures': sum(1 for outcome in self._outcomes if outcome[0]),
+                'recent_slow_calls': sum(1 for outcome in self._outcomes if outcome[1]),
+                'times_opened': self._opened_count,
+                'rejected_calls': self._rejected_count
+            }
+            if self.state == OPEN:
+                snapshot['retry_in'] = round(self._retry_in(), 1)
+            return snapshot
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(name: str, **settings: Any) -> CircuitBreaker:
+    """Process-wide breaker for a service; settings apply when it is first created"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, **settings)
+        return breaker
+
+def circuit_breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of every breaker created in this process"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
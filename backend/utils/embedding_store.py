@@ -0,0 +1,112 @@
+"""
+Local vector store for text embeddings, persisted in SQLite.
+
+Vectors are keyed by (model, input_type, content hash), so a text is sent to
+an embedding API once per model and input type and every later lookup is
+served from disk (and then from memory). Safe to share between processes.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    input_type TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (model, input_type, content_hash)
+);
+"""
+
+# SQLite's default limit on host parameters per statement is 999
+_LOOKUP_BATCH = 500
+
+def content_hash(text: str) -> str:
+    """Stable key for a text"""
+    return hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+class EmbeddingStore:
+    """
+    float32 embedding vectors by (model, input_type, text). With no path the
+    store only lives in memory.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or None
+        self._memory = {}  # (model, input_type, content hash) -> vector
+        self._lock = threading.Lock()
+        if self.path:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, model: str, input_type: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Stored vector for each text, None where there is none"""
+        hashes = [content_hash(text) for text in texts]
+        with self._lock:
+            found = {h: self._memory.get((model, input_type, h)) for h in hashes}
+        missing = [h for h, vector in found.items() if vector is None]
+
+        if missing and self.path:
+            loaded = self._load(model, input_type, missing)
+            with self._lock:
+                for h, vector in loaded.items():
+                    self._memory[(model, input_type, h)] = vector
+            found.update(loaded)
+        return [found[h] for h in hashes]
+
+    def put_many(self, model: str, input_type: str, texts: List[str], vectors: np.ndarray):
+        """Store one vector per text"""
+        rows = []
+        now = time.time()
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                h = content_hash(text)
+                vector = np.asarray(vector, dtype=np.float32)
+                self._memory[(model, input_type, h)] = vector
+                rows.append((model, input_type, h, vector.tobytes(), now))
+        if rows and self.path:
+            with self._connect() as conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO embeddings (model, input_type, content_hash, vector, created_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    rows
+                )
+
+    def __len__(self) -> int:
+        if not self.path:
+            return len(self._memory)
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+    def _load(self, model: str, input_type: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        loaded = {}
+        with self._connect() as conn:
+            for start in range(0, len(hashes), _LOOKUP_BATCH):
+                batch = hashes[start:start + _LOOKUP_BATCH]
+                rows: List[Tuple[str, bytes]] = conn.execute(
+                    'SELECT content_hash, vector FROM embeddings WHERE model = ? AND input_type = ? '
+                    f"AND content_hash IN ({', '.join('?' * len(batch))})",
+                    (model, input_type, *batch)
+                ).fetchall()
+                for h, blob in rows:
+                    loaded[h] = np.frombuffer(blob, dtype=np.float32)
+        return loaded
@@ -0,0 +1,107 @@
+"""
+Shared HTTP sessions with keep-alive connection pools for external APIs
+"""
+import threading
+from typing import Any, Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+class PooledSession(requests.Session):
+    """
+    requests.Session whose connections are kept alive and reused across
+    requests and threads, counting requests for pool metrics
+    """
+
+    def __init__(self, name: str, pool_maxsize: int):
+        super().__init__()
+        self.name = name
+        self.pool_maxsize = pool_maxsize
+        # Without pool_block, bursts past pool_maxsize open extra connections
+        # that are closed after use instead of waiting for a free one
+        self.adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+        # Pools whose connections report new connections and requests, so reuse
+        # is measured without reading the pool manager's internals
+        self.adapter.poolmanager.pool_classes_by_scheme = {
+            'http': self._counting_pool(HTTPConnectionPool, HTTPConnection, 'http'),
+            'https': self._counting_pool(HTTPSConnectionPool, HTTPSConnection, 'https')
+        }
+        self.mount('https://', self.adapter)
+        self.mount('http://', self.adapter)
+        self._requests_sent = 0
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._hosts = {}  # scheme://host:port -> {'requests', 'connections_opened', 'connections_reused'}
+        self._lock = threading.Lock()
+
+    def _counting_pool(self, pool_cls, connection_cls, scheme: str):
+        session = self
+
+        class CountingConnection(connection_cls):
+            def connect(self):
+                super().connect()
+                session._count(f"{scheme}://{self.host}:{self.port}", 'connections_opened')
+
+            def request(self, *args, **kwargs):
+                origin = f"{scheme}://{self.host}:{self.port}"
+                session._count(origin, 'requests')
+                # An open socket means the request goes out on a kept-alive connection
+                if self.sock is not None:
+                    session._count(origin, 'connections_reused')
+                return super().request(*args, **kwargs)
+
+        class CountingPool(pool_cls):
+            ConnectionCls = CountingConnection
+
+        return CountingPool
+
+    def _count(self, origin: str, counter: str):
+        with self._lock:
+            host = self._hosts.setdefault(origin, {'requests': 0, 'connections_opened': 0, 'connections_reused': 0})
+            host[counter] += 1
+
+    def request(self, *args, **kwargs):
+        with self._lock:
+            self._requests_sent += 1
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        try:
+            return super().request(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests sent, and connections opened and reused per host"""
+        with self._lock:
+            hosts = {origin: dict(counts) for origin, counts in self._hosts.items()}
+            return {
+                'pool_maxsize': self.pool_maxsize,
+                'requests_sent': self._requests_sent,
+                'in_flight': self._in_flight,
+                'peak_in_flight': self._peak_in_flight,
+                'hosts': hosts
+            }
+
+_sessions: Dict[Tuple[str, int], PooledSession] = {}
+_sessions_lock = threading.Lock()
+
+def get_http_session(name: str, pool_maxsize: int = 10) -> PooledSession:
+    """
+    Process-wide session for a name (e.g. an API), shared by every client
+    so TLS connections are set up once and then reused
+    """
+    key = (name, pool_maxsize)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = PooledSession(name, pool_maxsize)
+        return session
+
+def http_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Metrics of every shared session created in this process"""
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+    return {f"{session.name}:{session.pool_maxsize}": session.stats() for session in sessions}
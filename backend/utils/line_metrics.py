@@ -0,0 +1,168 @@
+"""
+Vectorized per-line metrics for source code.
+
+The code is viewed as one NumPy array of code points and every per-line
+property (length, indentation, blank and comment flags, substring hits) is
+derived with array operations over it, so line-based metrics cost a few
+passes in C instead of a Python loop with strip() calls per line.
+"""
+from typing import Iterable
+
+import numpy as np
+
+# Lookup tables of the code points str.strip() and str.split() treat as
+# whitespace: a bytes.translate table for ASCII code, and a NumPy table
+# whose last entry is False and absorbs every larger code point
+_ASCII_WHITESPACE = bytes(chr(code).isspace() for code in range(256))
+_WHITESPACE_TABLE = np.array([chr(code).isspace() for code in range(0x3001)] + [False])
+
+class LineMetrics:
+    """
+    Per-line arrays for a code string, with lines split on '\\n' exactly
+    like code.split('\\n')
+    """
+
+    def __init__(self, code: str):
+        # One byte per character for ASCII code, one code point per 4 bytes otherwise
+        if code.isascii():
+            data = code.encode('ascii')
+            chars = np.frombuffer(data, dtype=np.uint8)
+            space = np.frombuffer(data.translate(_ASCII_WHITESPACE), dtype=bool)
+        else:
+            chars = np.frombuffer(code.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+            space = np.take(_WHITESPACE_TABLE, chars, mode='clip')
+        self._code = code
+        self._chars = chars
+        self._space = space
+        # Two trailing zeros so lookups one past the end of the code are safe
+        self._padded = np.append(chars, np.zeros(2, dtype=chars.dtype))
+
+        newlines = np.flatnonzero(chars == 10)
+        self.starts = np.concatenate(([0], newlines + 1))
+        self.ends = np.concatenate((newlines, [len(chars)]))
+        self.count = len(self.starts)
+        self.length = self.ends - self.starts
+
+        # First and last character of every run of non-whitespace ("word")
+        filled = np.zeros(len(chars) + 2, dtype=np.int8)
+        filled[1:-1] = ~space
+        edges = np.diff(filled)
+        self._word_starts = np.flatnonzero(edges == 1)
+        self._word_ends = np.flatnonzero(edges == -1) - 1
+
+        first = np.append(self._word_starts, len(chars))[np.searchsorted(self._word_starts, self.starts)]
+        last = np.concatenate(([-1], self._word_ends))[np.searchsorted(self._word_ends, self.ends)]
+        self.blank = first >= self.ends
+        self.first_pos = np.where(self.blank, self.ends, first)
+        self.last_pos = np.where(self.blank, self.starts - 1, last)
+        # Same as len(line) - len(line.lstrip()), i.e. the full length for blank lines
+        self.indentation = self.first_pos - self.starts
+
+        self.first_char = np.where(self.blank, 0, self._padded[self.first_pos])
+        self.last_char = np.where(self.blank, 0, self._padded[self.last_pos])
+
+    @property
+    def non_empty(self) -> int:
+        """Number of lines with something other than whitespace"""
+        return self.count - int(self.blank.sum())
+
+    def occurrences(self, text: str) -> np.ndarray:
+        """Start positions of every (possibly overlapping) occurrence of text"""
+        chars = self._chars
+        span = len(chars) - len(text) + 1
+        if not text or span <= 0 or max(map(ord, text)) > np.iinfo(chars.dtype).max:
+            return np.empty(0, dtype=np.int64)
+        # Candidates from the first character, narrowed by each following one
+        positions = np.flatnonzero(chars[:span] == ord(text[0]))
+        for offset, char in enumerate(text[1:], 1):
+            positions = positions[chars[positions + offset] == ord(char)]
+        return positions
+
+    def contains(self, *texts: str) -> np.ndarray:
+        """Per-line flag: the line contains any of the texts (none may span lines)"""
+        hits = np.zeros(self.count, dtype=bool)
+        for text in texts:
+            positions = self.occurrences(text)
+            hits |= np.searchsorted(positions, self.ends) > np.searchsorted(positions, self.starts)
+        return hits
+
+    def starts_with(self, text: str) -> np.ndarray:
+        """Per-line flag: the stripped line starts with text"""
+        flags = ~self.blank & (self.first_char == ord(text[0]))
+        if not flags.any():
+            return flags
+        for offset, char in enumerate(text[1:], 1):
+            flags &= self._padded[self.first_pos + offset] == ord(char)
+        return flags
+
+    def ends_with_any(self, chars: Iterable[str]) -> np.ndarray:
+        """Per-line flag: the stripped line ends with one of the single characters"""
+        return ~self.blank & np.isin(self.last_char, [ord(char) for char in chars])
+
+    def comment_line_count(self) -> int:
+        """
+        Lines starting with '#' or '//', lines opening a '/*' comment and the
+        lines inside one, up to and including the line with its '*/'
+        """
+        single = self.starts_with('#') | self.starts_with('//')
+        opener = ~single & self.contains('/*')
+        closer = self.contains('*/')
+        inside = ~single & ~opener  # counted only while a block comment is open
+        inside_before = np.concatenate(([0], np.cumsum(inside)))
+
+        count = int(single.sum() + opener.sum())
+        # Only lines that open or close a block can change the state
+        block_start = None
+        for line in np.flatnonzero(opener | (inside & closer)):
+            if opener[line]:
+                if block_start is None and not closer[line]:
+                    block_start = line + 1
+            elif block_start is not None:
+                count += int(inside_before[line + 1] - inside_before[block_start])
+                block_start = None
+        if block_start is not None:
+            count += int(inside_before[self.count] - inside_before[block_start])
+        return count
+
+    def space_groups(self, width: int = 4) -> np.ndarray:
+        """
+        Per-line count of non-overlapping runs of `width` spaces inside the
+        stripped line, i.e. line.strip().count(' ' * width)
+        """
+        # Whitespace between two words on the same line, long enough to hold a group
+        gap_starts = self._word_ends[:-1] + 1
+        gap_ends = self._word_starts[1:]
+        lines = np.searchsorted(self.starts, gap_starts, side='right') - 1
+        inner = (gap_ends - gap_starts >= width) & (gap_ends < self.ends[lines])
+        gap_starts, gap_ends, lines = gap_starts[inner], gap_ends[inner], lines[inner]
+
+        groups = (gap_ends - gap_starts) // width
+        # Gaps mixing spaces with tabs or other whitespace are counted exactly
+        others = np.flatnonzero(self._space & (self._chars != 32))
+        mixed = np.flatnonzero(np.searchsorted(others, gap_ends) > np.searchsorted(others, gap_starts))
+        for gap in mixed:
+            groups[gap] = self._code.count(' ' * width, gap_starts[gap], gap_ends[gap])
+        return np.bincount(lines, weights=groups, minlength=self.count).astype(np.int64)
+
+    def assignment_name_lengths(self) -> np.ndarray:
+        """
+        Per-line length of the last word before the first '=', i.e.
+        len(line.split('=')[0].split()[-1]); 0 when there is no such word
+        and -1 for lines without '='
+        """
+        equals = np.append(self.occurrences('='), len(self._chars))
+        first_equal = equals[np.searchsorted(equals, self.starts)]
+        has_equal = first_equal < self.ends
+        if not has_equal.any():
+            return np.full(self.count, -1)
+
+        # Last non-whitespace character before the '=' and the start of its word
+        before = first_equal - 1
+        word_end = np.where(
+            (before >= 0) & ~self._space[np.clip(before, 0, None)],
+            before,
+            np.concatenate(([-1], self._word_ends))[np.searchsorted(self._word_ends, first_equal)]
+        )
+        word_start = self._word_starts[np.searchsorted(self._word_starts, word_end, side='right') - 1]
+        lengths = np.where(word_end >= self.starts, word_end - word_start + 1, 0)
+        return np.where(has_equal, lengths, -1)
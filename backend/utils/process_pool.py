@@ -0,0 +1,59 @@
+"""
+Shared process pool utilities for CPU-bound analysis work
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Workers are spawned rather than forked: the parent holds torch and
+# sentence-transformer threads that a forked child would inherit mid-state.
+# Spawned workers import only the modules their tasks need, never the models.
+_mp_context = multiprocessing.get_context('spawn')
+
+def default_worker_count() -> int:
+    """Number of worker processes to use when none is configured"""
+    return max(1, os.cpu_count() or 1)
+
+def process_pool_available() -> bool:
+    """
+    False inside daemonic processes (e.g. job queue workers), which are not
+    allowed to start the pool's worker processes
+    """
+    return not multiprocessing.current_process().daemon
+
+def get_process_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Return a persistent process pool with the given number of workers.
+    Pools are created on first use and reused for the lifetime of the process.
+    """
+    workers = workers or default_worker_count()
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context)
+            _pools[workers] = pool
+        return pool
+
+def discard_process_pool(workers: Optional[int] = None):
+    """Drop a pool (e.g. after a worker crashed) so the next call recreates it"""
+    workers = workers or default_worker_count()
+    with _pools_lock:
+        pool = _pools.pop(workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_process_pools():
+    """Shut down every pool created by this module"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+atexit.register(shutdown_process_pools)
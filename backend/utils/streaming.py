@@ -0,0 +1,54 @@
+"""
+Streaming response helpers for long-running endpoints (NDJSON and Server-Sent Events)
+"""
+import json
+from typing import Any, Dict, Iterator, Optional
+from flask import Response, stream_with_context
+from utils.json_utils import NumpyJSONEncoder
+
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream'
+}
+
+def get_stream_format(request, data: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """
+    Determine the requested streaming format, if any.
+    Checks the ``stream`` query argument, then the ``stream`` body field,
+    then the Accept header. Returns 'ndjson', 'sse' or None.
+    """
+    requested = request.args.get('stream') or (data or {}).get('stream')
+    if isinstance(requested, str) and requested.lower() in STREAM_FORMATS:
+        return requested.lower()
+
+    accept = request.headers.get('Accept', '')
+    for stream_format, mimetype in STREAM_FORMATS.items():
+        if mimetype in accept:
+            return stream_format
+
+    return None
+
+def format_record(record: Dict[str, Any], stream_format: str) -> str:
+    """Serialize one record for the given streaming format"""
+    payload = json.dumps(record, cls=NumpyJSONEncoder)
+    if stream_format == 'sse':
+        return f"event: {record.get('type', 'message')}\ndata: {payload}\n\n"
+    return payload + '\n'
+
+def stream_records(records: Iterator[Dict[str, Any]], stream_format: str) -> Response:
+    """
+    Build a streaming response that emits each record as soon as it is produced.
+    An exception raised by the generator is reported as a final 'error' record.
+    """
+    def generate():
+        try:
+            for record in records:
+                yield format_record(record, stream_format)
+        except Exception as e:
+            yield format_record({'type': 'error', 'error': str(e)}, stream_format)
+
+    response = Response(stream_with_context(generate()), mimetype=STREAM_FORMATS[stream_format])
+    # Stop reverse proxies from buffering the stream
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,35 @@
+"""
+Linear-time text checks used in place of backtracking regexes such as
+'a.*b.*c', which can take quadratic or worse time on adversarial input
+"""
+
+def contains_in_order(text: str, *parts: str) -> bool:
+    """
+    True if some line of text contains the parts in this order, like
+    re.search('a.*b.*c', text) with escaped parts but in linear time.
+    Taking the earliest match of each part on a line is always optimal,
+    so every line is scanned at most once.
+    """
+    first, rest = parts[0], parts[1:]
+    position = 0
+    while True:
+        start = text.find(first, position)
+        if start == -1:
+            return False
+        line_end = text.find('\n', start)
+        if line_end == -1:
+            line_end = len(text)
+
+        cursor = start + len(first)
+        for part in rest:
+            found = text.find(part, cursor, line_end)
+            if found == -1:
+                break
+            cursor = found + len(part)
+        else:
+            return True
+        position = line_end + 1
+
+def contains_any(text: str, *substrings: str) -> bool:
+    """True if text contains any of the substrings"""
+    return any(substring in text for substring in substrings)